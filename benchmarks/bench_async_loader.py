@@ -0,0 +1,115 @@
+"""
+Бенчмарк пропускной способности записи в staging: DataLoader (SQLAlchemy,
+INSERT ... ON CONFLICT) против AsyncLoadPipeline (asyncpg, COPY + конвейер
+clean -> load).
+
+Нужна тестовая БД: таблицы staging.bench_loader_* создаются и удаляются.
+Без BENCH_DB_URL или без установленного asyncpg бенчмарк пропускается.
+
+Использование:
+    BENCH_DB_URL=postgresql://... python benchmarks/bench_async_loader.py [строк] [таблиц]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_ROWS = 50_000
+DEFAULT_TABLES = 4
+
+
+def make_frame(rows, seed):
+    """Синтетический лист: даты, суммы, флаги и текст строками, как из Sheets."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'дата': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        'сумма': rng.integers(100, 10_000, rows).astype(str),
+        'оплачено': rng.choice(['TRUE', 'FALSE'], rows),
+        'клиент': [f"Клиент {i}" for i in rng.integers(0, rows // 10 + 1, rows)],
+        'комментарий': rng.choice(['', 'абонемент', 'разовое', 'пробное'], rows),
+        'source_row_id': np.arange(2, rows + 2),
+    }).astype({'дата': str})
+
+
+def drop_tables(engine, tables):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        for table in tables:
+            conn.execute(text(f"DROP TABLE IF EXISTS staging.{table} CASCADE"))
+
+
+def run_sync(engine, frames):
+    from src.etl.loader import DataLoader
+    from src.etl.parallel_loader import prepare_frame
+
+    loader = DataLoader(engine)
+    started = time.perf_counter()
+    for table, df in frames.items():
+        loader.write_staging(prepare_frame(df.copy(), table), table, table)
+    return time.perf_counter() - started
+
+
+def run_async(db_url, engine, frames):
+    from src.etl.async_loader import AsyncDataLoader, AsyncLoadPipeline, SourceItem
+    from src.etl.loader import DataLoader
+    from src.etl.parallel_loader import LoadTask
+
+    def read_task(item):
+        return LoadTask(item.source_name, item.target_table, frames[item.target_table].copy())
+
+    pipeline = AsyncLoadPipeline(AsyncDataLoader(db_url, DataLoader(engine)), read_task)
+    items = [SourceItem(table, table) for table in frames]
+    started = time.perf_counter()
+    results = pipeline.run(items)
+    elapsed = time.perf_counter() - started
+    failed = [r for r in results if not r.ok]
+    if failed:
+        raise RuntimeError('; '.join(f"{r.target_table}: {r.error}" for r in failed))
+    return elapsed
+
+
+def main():
+    db_url = os.environ.get('BENCH_DB_URL')
+    if not db_url:
+        print("⏭️ BENCH_DB_URL не задан, бенчмарк пропущен")
+        return 0
+    try:
+        import asyncpg  # noqa: F401
+    except ImportError:
+        print("⏭️ asyncpg не установлен, бенчмарк пропущен")
+        return 0
+
+    from sqlalchemy import create_engine
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    tables = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TABLES
+    frames = {f"bench_loader_{i}": make_frame(rows, seed=i) for i in range(tables)}
+    total = rows * tables
+
+    engine = create_engine(db_url)
+    print(f"⏱️ Бенчмарк записи в staging: {tables} таблиц x {rows} строк")
+    try:
+        timings = {}
+        for name, run in (('sqlalchemy', lambda: run_sync(engine, frames)),
+                          ('asyncpg', lambda: run_async(db_url, engine, frames))):
+            drop_tables(engine, frames)
+            timings[name] = run()
+            print(f"   {name:<12} {timings[name]:7.2f} с, {total / timings[name]:10.0f} строк/с")
+    finally:
+        drop_tables(engine, frames)
+        engine.dispose()
+
+    speedup = timings['sqlalchemy'] / timings['asyncpg']
+    status = '✅' if speedup > 1 else '❌'
+    print(f"   {status} Ускорение asyncpg: x{speedup:.2f}")
+    return 0 if speedup > 1 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Бенчмарк разрешения клиентов (src/etl/entity_resolution.py).
+
+На синтетических данных измеряет стадии одного инкрементального запуска:
+нормализацию и ключи новых клиентов, ключи упоминаний в продажах и
+сопоставление соединением по индексу ключей (как LINK_SQL, но в pandas)
+при фиксированной базе существующих клиентов. Время на строку должно
+оставаться примерно постоянным при росте числа новых строк — без
+попарных сравнений стоимость линейна.
+
+Использование:
+    python benchmarks/bench_entity_resolution.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+EXISTING_CLIENTS = 100_000
+NEW_ROWS = [10_000, 20_000, 40_000, 80_000]
+# Допустимый рост времени на строку между наименьшим и наибольшим объемом
+MAX_PER_ROW_GROWTH = 1.5
+
+FIRST_NAMES = ['Маша', 'Саша', 'Петя', 'Ваня', 'Аня', 'Лиза', 'Миша', 'Соня', 'Артём', 'Ева']
+SURNAMES = ['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Фёдоров']
+
+
+def letters(n):
+    """Уникальный буквенный суффикс: из имени цифры при нормализации удаляются."""
+    word = ''
+    while True:
+        n, d = divmod(n, 32)
+        word += chr(ord('а') + d)
+        if not n:
+            return word
+
+
+def make_clients(rows, offset, rng):
+    import numpy as np
+    import pandas as pd
+
+    phones = [f"8 (9{n // 10_000_000 % 100:02d}) {n // 10_000 % 1000:03d}-{n % 10_000:04d}"
+              for n in range(offset, offset + rows)]
+    surnames = rng.choice(SURNAMES, rows)
+    return pd.DataFrame({
+        'id': np.arange(offset, offset + rows),
+        'mobilnyy': phones,
+        'imya_rebenka': rng.choice(FIRST_NAMES, rows),
+        'data_rozhdeniya_rebenka': None,
+        'instruktor': rng.choice(['Алмаз', 'Ирина', None], rows),
+        'klient': [
+            f"{s}а {n} {letters(i)}"
+            for s, n, i in zip(surnames, rng.choice(FIRST_NAMES, rows), range(offset, offset + rows))
+        ],
+        'imya_vzroslogo': None,
+        'familiya_vzroslogo': surnames,
+    })
+
+
+def build_index(clients_df, pk_offset=0):
+    """Индекс ключей блокировки (key_hash -> client_pk), как core.client_keys."""
+    from src.etl.entity_resolution import client_keys, prepare_clients
+
+    clients = prepare_clients(clients_df)
+    clients['client_pk'] = range(pk_offset, pk_offset + len(clients))
+    keys = client_keys(clients).merge(clients[['client_id', 'client_pk']], on='client_id')
+    return keys[['key_hash', 'client_pk']]
+
+
+def match(mentions, index):
+    """Соединение упоминаний с индексом; ключ принимается при ровно одном клиенте."""
+    candidates = index[index['key_hash'].isin(mentions['key_hash'])]
+    counts = candidates.groupby('key_hash')['client_pk'].agg(['min', 'count'])
+    unique = counts[counts['count'] == 1]['min'].rename('client_pk')
+    return mentions.join(unique, on='key_hash', how='inner')
+
+
+def run_increment(index, new_clients, sales):
+    import pandas as pd
+
+    from src.etl.entity_resolution import mention_keys
+
+    started = time.perf_counter()
+    new_index = build_index(new_clients, pk_offset=len(index))
+    index = pd.concat([index, new_index], ignore_index=True)
+    sales = sales.assign(key_hash=mention_keys(sales['klient']))
+    linked = match(sales[sales['key_hash'].notna()], index)
+    return time.perf_counter() - started, len(linked)
+
+
+def main():
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(42)
+    base = make_clients(EXISTING_CLIENTS, 0, rng)
+    index = build_index(base)
+
+    print(f"⏱️ Бенчмарк разрешения клиентов (база: {EXISTING_CLIENTS} клиентов, {len(index)} ключей)")
+    per_row = {}
+    for rows in NEW_ROWS:
+        new_clients = make_clients(rows, EXISTING_CLIENTS, rng)
+        # Продажи ссылаются на случайных клиентов базы и новых клиентов
+        pool = pd.concat([base['klient'], new_clients['klient']], ignore_index=True)
+        sales = pd.DataFrame({'id': np.arange(rows), 'klient': rng.choice(pool.to_numpy(), rows)})
+
+        elapsed, linked = run_increment(index, new_clients, sales)
+        per_row[rows] = elapsed / (2 * rows) * 1e6
+        print(f"   {rows:>7} новых клиентов + {rows:>7} продаж: {elapsed:6.2f} с, "
+              f"{per_row[rows]:6.1f} мкс/строку, привязано {linked}")
+
+    growth = per_row[NEW_ROWS[-1]] / per_row[NEW_ROWS[0]]
+    status = '✅' if growth <= MAX_PER_ROW_GROWTH else '❌'
+    print(f"   {status} Рост времени на строку x{growth:.2f} при росте объема "
+          f"x{NEW_ROWS[-1] // NEW_ROWS[0]} (допустимо x{MAX_PER_ROW_GROWTH})")
+    return 0 if status == '✅' else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
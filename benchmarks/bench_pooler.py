@@ -0,0 +1,168 @@
+"""
+Бенчмарк round trips записи в staging: обычный режим против pooler mode
+(ETL_DB_POOLER, см. DataLoader).
+
+Соединения идут через локальный TCP-прокси, который задерживает каждый
+пакет на половину RTT в обе стороны — так локальный Postgres ведет себя
+как Supabase через WAN. Для каждой таблицы печатаются round trips
+(RoundTripCounter) и время записи.
+
+Нужна тестовая БД: таблица staging.bench_pooler создается и удаляется;
+контрольные точки пишутся, если применена миграция 05 (etl.etl_checkpoints).
+Без BENCH_DB_URL бенчмарк пропускается.
+
+Использование:
+    BENCH_DB_URL=postgresql://... python benchmarks/bench_pooler.py [rtt_мс] [строк] [таблиц]
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_RTT_MS = 40
+DEFAULT_ROWS = 5_000
+DEFAULT_TABLES = 5
+TABLE = 'bench_pooler'
+
+
+class LatencyProxy:
+    """TCP-прокси с задержкой rtt/2 на каждый пакет в каждую сторону."""
+
+    def __init__(self, upstream_host, upstream_port, rtt_ms):
+        self.upstream = (upstream_host, upstream_port)
+        self.delay = rtt_ms / 2000
+        self.port = None
+        self._loop = asyncio.new_event_loop()
+
+    def start(self):
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._serve(), self._loop).result()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = server.sockets[0].getsockname()[1]
+
+    async def _handle(self, client_reader, client_writer):
+        upstream_reader, upstream_writer = await asyncio.open_connection(*self.upstream)
+        await asyncio.gather(
+            self._pipe(client_reader, upstream_writer),
+            self._pipe(upstream_reader, client_writer),
+            return_exceptions=True,
+        )
+
+    async def _pipe(self, reader, writer):
+        try:
+            while data := await reader.read(65536):
+                await asyncio.sleep(self.delay)
+                writer.write(data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+def make_frame(rows, seed):
+    import numpy as np
+    import pandas as pd
+
+    from src.etl.loader import add_row_hashes
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'klient': [f"Клиент {i}" for i in rng.integers(0, rows, rows)],
+        'summa': rng.integers(100, 10_000, rows),
+        'kommentariy': rng.choice(['абонемент', 'разовое', None], rows),
+        'source_row_id': np.arange(2, rows + 2),
+    })
+    return add_row_hashes(df)
+
+
+def run_mode(db_url, pooler, frames):
+    from sqlalchemy import text
+
+    from src.core.checkpoints import CheckpointStore
+    from src.db import RoundTripCounter, get_db_engine
+    from src.etl.loader import DataLoader
+
+    engine = get_db_engine({'SUPABASE_DB_URL': db_url, 'DB_POOLER': pooler})
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS staging.{TABLE}"))
+            has_checkpoints = conn.execute(text("SELECT to_regclass('etl.etl_checkpoints')")).scalar() is not None
+
+        loader = DataLoader(engine, pooler_mode=pooler)
+        # Первая запись создает таблицу - в замер не входит
+        loader.write_staging(frames[0].head(1), TABLE, TABLE)
+
+        store = CheckpointStore(engine) if has_checkpoints else None
+        run_id = store.start_run(f"bench_pooler_{'on' if pooler else 'off'}") if store else None
+
+        trips, elapsed = [], []
+        for df in frames:
+            checkpoint = store.checkpoint(run_id, TABLE, TABLE) if store else None
+            loader.reset_catalog_cache()
+            with RoundTripCounter(engine) as counter:
+                started = time.perf_counter()
+                loader.write_staging(df, TABLE, TABLE, checkpoint)
+                elapsed.append(time.perf_counter() - started)
+            trips.append(counter.count)
+            if store:
+                # Следующая таблица запуска - новая контрольная точка
+                with engine.begin() as conn:
+                    conn.execute(text("DELETE FROM etl.etl_checkpoints WHERE run_id = :run_id"), {'run_id': run_id})
+
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS staging.{TABLE}"))
+            if store:
+                conn.execute(text("DELETE FROM etl.etl_runs WHERE run_id = :run_id"), {'run_id': run_id})
+        return sum(trips) / len(trips), sum(elapsed) / len(elapsed)
+    finally:
+        engine.dispose()
+
+
+def main():
+    db_url = os.environ.get('BENCH_DB_URL')
+    if not db_url:
+        print("⏭️ BENCH_DB_URL не задан, бенчмарк пропущен")
+        return 0
+
+    from sqlalchemy.engine import make_url
+
+    from src.core.constants import DB_BATCH_SIZE
+
+    rtt_ms = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RTT_MS
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ROWS
+    tables = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_TABLES
+
+    url = make_url(db_url)
+    proxy = LatencyProxy(url.host or 'localhost', url.port or 5432, rtt_ms).start()
+    proxied_url = url.set(host='127.0.0.1', port=proxy.port).render_as_string(hide_password=False)
+    frames = [make_frame(rows, seed=i) for i in range(tables)]
+
+    print(f"⏱️ Round trips записи в staging (RTT {rtt_ms:.0f} мс, {rows} строк = "
+          f"{-(-rows // DB_BATCH_SIZE)} чанков на таблицу, {tables} таблиц)")
+    try:
+        results = {}
+        for name, pooler in (('обычный', False), ('pooler', True)):
+            results[name] = run_mode(proxied_url, pooler, frames)
+            trips, seconds = results[name]
+            print(f"   {name:<10} {trips:6.1f} round trips/таблицу, {seconds:6.2f} с/таблицу")
+    finally:
+        proxy.stop()
+
+    before, after = results['обычный'][0], results['pooler'][0]
+    status = '✅' if after < before else '❌'
+    print(f"   {status} pooler mode: x{before / after:.1f} меньше round trips, "
+          f"x{results['обычный'][1] / results['pooler'][1]:.1f} быстрее")
+    return 0 if after < before else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Бенчмарк очистки одной большой таблицы на нескольких ядрах (src/etl/row_shards.py).
+
+На синтетической таблице в духе trainings_hst сравнивает prepare_frame в
+одном процессе с prepare_frame_sharded на 1..N процессах: время, ускорение
+и совпадение результата (DataFrame целиком, включая row_hash) с
+однопроцессным путем.
+
+Использование:
+    python benchmarks/bench_row_shards.py [строк]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_ROWS = 400_000
+
+TRAINERS = ['Алмаз', 'Ирина', 'Мария', 'Ольга', 'Денис']
+TYPES = ['Групповая', 'Индивидуальная', 'Пробная', 'Сплит']
+
+
+def make_trainings(rows, rng):
+    """Как trainings_hst после чтения листа: все значения - строки, с пустыми ячейками."""
+    import numpy as np
+    import pandas as pd
+
+    days = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 2000, rows), unit='D')
+    dates = days.strftime('%d.%m.%Y').to_numpy(dtype=object)
+    dates[rng.random(rows) < 0.02] = ''
+    # В первой половине таблицы часов нет совсем - в блоке колонка целиком пустая
+    hours = np.where(np.arange(rows) < rows // 2, None, rng.integers(1, 4, rows).astype(str))
+    price = np.array([f"{v:,}".replace(',', ' ') for v in rng.integers(500, 5000, rows)], dtype=object)
+    price[rng.random(rows) < 0.05] = '-'
+    return pd.DataFrame({
+        'source_row_id': np.arange(2, rows + 2),
+        'data': dates,
+        'sotrudnik': rng.choice(TRAINERS, rows),
+        'klient': [f"Клиент {n}" for n in rng.integers(0, 20_000, rows)],
+        'tip': rng.choice(TYPES, rows),
+        'stoimost': price,
+        'chasy': hours,
+        'zamena': rng.choice(['TRUE', 'FALSE', ''], rows),
+        'kommentariy': rng.choice(['', 'перенос', 'болеет', None], rows),
+    })
+
+
+def main():
+    from concurrent.futures import ProcessPoolExecutor
+
+    import numpy as np
+    import pandas as pd
+
+    from src.etl.parallel_loader import prepare_frame
+    from src.etl.row_shards import prepare_frame_sharded
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    cores = os.cpu_count() or 1
+    df = make_trainings(rows, np.random.default_rng(42))
+
+    print(f"⏱️ Бенчмарк очистки trainings_hst по блокам строк ({rows} строк, {cores} ядер)")
+    started = time.perf_counter()
+    expected = prepare_frame(df.copy(), 'trainings_hst')
+    baseline = time.perf_counter() - started
+    print(f"   prepare_frame, 1 процесс: {baseline:6.2f} с")
+
+    identical = True
+    for workers in sorted({cores} | {2 ** i for i in range(cores.bit_length()) if 2 ** i < cores}):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Прогрев: процессы пула стартуют до замера
+            list(pool.map(abs, range(workers)))
+            started = time.perf_counter()
+            result = prepare_frame_sharded(df.copy(), 'trainings_hst', None, pool, workers)
+            elapsed = time.perf_counter() - started
+        try:
+            pd.testing.assert_frame_equal(result, expected)
+            same = '='
+        except AssertionError as e:
+            identical, same = False, f"≠ ({str(e).splitlines()[0]})"
+        print(f"   {workers:>2} процесс(ов) по блокам: {elapsed:6.2f} с, "
+              f"ускорение x{baseline / elapsed:4.2f}, результат {same}")
+
+    status = '✅' if identical else '❌'
+    print(f"   {status} Результат {'совпадает' if identical else 'не совпадает'} с однопроцессной очисткой")
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
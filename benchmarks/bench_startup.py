@@ -0,0 +1,86 @@
+"""
+Бенчмарк времени старта CLI (python -X importtime).
+
+Проверяет, что --help и легкие scope не тянут pandas/SQLAlchemy/gspread
+и укладываются в бюджет по времени импорта.
+
+Использование:
+    python benchmarks/bench_startup.py
+"""
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Бюджет суммарного времени импортов проекта и stdlib (без site), мс
+IMPORT_BUDGETS_MS = {
+    'help': 30,
+    'references': 60,
+}
+
+COMMANDS = {
+    'help': ['main.py', '--help'],
+    'references': ['main.py', '--scope', 'references'],
+}
+
+# Для команд выше эти модули не должны импортироваться вовсе
+HEAVY_MODULES = ['pandas', 'sqlalchemy', 'gspread', 'oauth2client', 'psycopg2', 'pydantic']
+
+
+def parse_importtime(stderr):
+    """
+    Разбирает вывод -X importtime.
+
+    Returns:
+        tuple: (top-level модуль -> cumulative время в мкс, множество всех импортированных модулей)
+    """
+    top_level = {}
+    imported = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        imported.add(name.strip())
+        # Вложенные импорты сдвинуты отступом и уже учтены в cumulative родителя
+        if name.startswith('  '):
+            continue
+        top_level[name.strip()] = int(cumulative_us.strip())
+    return top_level, imported
+
+
+def measure(args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    top_level, imported = parse_importtime(proc.stderr)
+    # site и его .pth-хуки зависят от окружения, а не от проекта
+    import_ms = sum(us for mod, us in top_level.items() if mod != 'site') / 1000
+    heavy = [m for m in HEAVY_MODULES if m in imported]
+    return wall_ms, import_ms, heavy
+
+
+def main():
+    print("⏱️ Бенчмарк старта CLI")
+    failed = False
+    for name, args in COMMANDS.items():
+        wall_ms, import_ms, heavy = measure(args)
+        budget = IMPORT_BUDGETS_MS[name]
+        status = '✅' if import_ms <= budget and not heavy else '❌'
+        print(f"   {status} {name:<12} импорты: {import_ms:7.1f} мс (бюджет {budget} мс), "
+              f"процесс: {wall_ms:7.1f} мс")
+        if heavy:
+            print(f"      ❌ Импортированы тяжелые модули: {', '.join(heavy)}")
+        failed = failed or status == '❌'
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
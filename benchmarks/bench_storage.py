@@ -0,0 +1,86 @@
+"""
+Бенчмарк загрузки в staging на встроенном бэкенде DuckDB (src/etl/storage.py).
+
+Без Postgres и Google Sheets: синтетические таблицы в духе trainings_hst
+проходят обычный путь ParallelLoadExecutor (очистка, хеши, вставка чанками
+с контрольными точками) в файл DuckDB со схемой final_schema_duckdb.sql.
+Замеряются первая загрузка, повторная (все строки - дубликаты, ON CONFLICT
+DO NOTHING) и dry-run план, проверяется число строк в staging.
+
+Использование:
+    python benchmarks/bench_storage.py [строк] [таблиц]
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_ROWS = 100_000
+DEFAULT_TABLES = 2
+
+
+def main():
+    import numpy as np
+    from sqlalchemy import text
+
+    from benchmarks.bench_row_shards import make_trainings
+    from src.core.checkpoints import CheckpointStore
+    from src.core.planner import DiffPlanner
+    from src.db import get_db_engine
+    from src.etl.loader import DataLoader
+    from src.etl.parallel_loader import LoadTask, ParallelLoadExecutor, prepare_frame
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    tables = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TABLES
+    frames = {
+        f"trainings_bench_{i}": make_trainings(rows, np.random.default_rng(i)) for i in range(1, tables + 1)
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = get_db_engine({'SUPABASE_DB_URL': f"duckdb:///{tmp}/planeta.duckdb"})
+        loader = DataLoader(engine)
+        print(f"⏱️ Бенчмарк staging на {loader.backend.name} ({tables} табл. x {rows} строк)")
+
+        started = time.perf_counter()
+        loader.backend.apply_schema(engine)
+        print(f"   Схема {loader.backend.schema_file}: {time.perf_counter() - started:6.2f} с")
+
+        checkpoints = CheckpointStore(engine)
+        ok = True
+        for attempt in ('первая загрузка', 'повторная загрузка'):
+            run_id = checkpoints.start_run('bench_storage')
+            tasks = [
+                LoadTask(name, name, df.copy(), checkpoints.checkpoint(run_id, name, name))
+                for name, df in frames.items()
+            ]
+            started = time.perf_counter()
+            results = ParallelLoadExecutor(loader).run(tasks)
+            elapsed = time.perf_counter() - started
+            checkpoints.finish_run(run_id, [r.error for r in results if not r.ok])
+            inserted = sum(r.rows_loaded for r in results)
+            ok = ok and all(r.ok for r in results)
+            print(f"   {attempt}: {elapsed:6.2f} с, {rows * tables / elapsed:9.0f} строк/с, новых строк {inserted}")
+
+        name, df = next(iter(frames.items()))
+        started = time.perf_counter()
+        plan = DiffPlanner(engine, loader.backend).plan_table(prepare_frame(df.copy(), name), name, name)
+        print(f"   План {name}: {time.perf_counter() - started:6.2f} с, "
+              f"новых {plan.new}, без изменений {plan.unchanged}")
+
+        with engine.connect() as conn:
+            stored = sum(
+                conn.execute(text(f"SELECT COUNT(*) FROM staging.{name}")).scalar() for name in frames
+            )
+        engine.dispose()
+
+    ok = ok and stored == rows * tables and plan.new == 0
+    status = '✅' if ok else '❌'
+    print(f"   {status} В staging {stored} строк (ожидалось {rows * tables}), повтор без дубликатов")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
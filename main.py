@@ -1,23 +1,91 @@
-from src.pipelines.current_sync import run_current_sync
-from src.pipelines.historical_sync import run_historical_sync
-from src.pipelines.references_sync import run_references_sync
+import argparse
+import importlib
+import sys
+
+# Пайплайны импортируются лениво: pandas, SQLAlchemy и gspread
+# подтягиваются только для тех scope, которым они нужны
+SCOPE_RUNNERS = {
+    'current': 'src.pipelines.current_sync:run_current_sync',
+    'historical': 'src.pipelines.historical_sync:run_historical_sync',
+    'references': 'src.pipelines.references_sync:run_references_sync',
+    # После загрузки staging: клиенты -> core.clients, client_id в продажах и тренировках
+    'clients': 'src.pipelines.clients_sync:run_clients_sync',
+}
+
+
+def _load_runner(path):
+    module_name, func_name = path.split(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
 
 def main():
-    import argparse
     parser = argparse.ArgumentParser(description='ETL Runner')
-    parser.add_argument('--scope', choices=['current', 'historical', 'references', 'all'], 
-                        required=True, help='Scope of sync')
-    
+    parser.add_argument('--scope', choices=['current', 'historical', 'references', 'clients', 'all'],
+                        help='Scope of sync')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Run as a long-lived scheduler with per-source intervals')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the last unfinished run from its last committed chunk')
+    parser.add_argument('--plan', action='store_true',
+                        help='Dry run: fetch, clean and hash, then report per-table changes without writing')
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help='With --plan: read raw frames from a saved snapshot instead of Google Sheets')
+    parser.add_argument('--save-snapshot', metavar='DIR',
+                        help='With --plan: save the raw frames that were read as a snapshot')
+    parser.add_argument('--replay-spool', action='store_true',
+                        help='Load batches spooled locally while the database was unavailable')
+    parser.add_argument('--enqueue', action='store_true',
+                        help='Put the sources of --scope into the etl.jobs work queue')
+    parser.add_argument('--worker', action='store_true',
+                        help='Process jobs from the etl.jobs work queue (sources of --scope, default all)')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help='With --worker: number of worker processes on this host')
+    parser.add_argument('--drain', action='store_true',
+                        help='With --worker: exit when no jobs are available')
+    parser.add_argument('--serve-api', action='store_true',
+                        help='Serve cached analytics aggregates (JSON/CSV) over local HTTP')
+    parser.add_argument('--port', type=int,
+                        help='With --serve-api: HTTP port (default 8088)')
+
     args = parser.parse_args()
-    
-    if args.scope in ['current', 'all']:
-        run_current_sync()
-    
-    if args.scope in ['historical', 'all']:
-        run_historical_sync()
-        
-    if args.scope in ['references', 'all']:
-        run_references_sync()
+
+    if args.daemon:
+        from src.core.scheduler import run_daemon
+        run_daemon(args.scope or 'all')
+        return
+
+    if args.serve_api:
+        _load_runner('src.api.analytics:run_api')(args.port)
+        return
+
+    if args.enqueue:
+        if args.scope is None:
+            parser.error('--enqueue requires --scope')
+        _load_runner('src.core.worker:enqueue_sources')(args.scope)
+        if not args.worker:
+            return
+
+    if args.worker:
+        _load_runner('src.core.worker:run_workers')(args.workers, args.scope or 'all', args.drain)
+        return
+
+    if args.plan:
+        if args.scope is None:
+            parser.error('--plan requires --scope')
+        run_plan = _load_runner('src.core.planner:run_plan')
+        sys.exit(run_plan(args.scope, args.snapshot, args.save_snapshot))
+
+    if args.replay_spool:
+        _load_runner('src.etl.spool:run_replay')()
+        if args.scope is None:
+            return
+
+    if args.scope is None:
+        parser.error('--scope is required unless --daemon, --worker, --serve-api or --replay-spool is used')
+
+    for scope, runner in SCOPE_RUNNERS.items():
+        if args.scope in [scope, 'all']:
+            _load_runner(runner)(resume=args.resume)
 
 if __name__ == '__main__':
     main()
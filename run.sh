@@ -1,6 +1,6 @@
 #!/bin/bash
 # Универсальный скрипт запуска ETL
-# Использование: ./run.sh [current|historical|references|all|test]
+# Использование: ./run.sh [current|historical|references|clients|all|test|bench|maintenance|export]
 
 set -e
 
@@ -23,22 +23,41 @@ source venv/bin/activate
 SCOPE="${1:-current}"
 
 case "$SCOPE" in
-    current|historical|references|all)
+    current|historical|references|clients|all)
         echo "🚀 Запуск ETL: --scope $SCOPE"
-        python main.py --scope "$SCOPE"
+        python main.py --scope "$SCOPE" "${@:2}"
         ;;
     test)
         echo "🧪 Запуск тестов..."
         python -m pytest -v
         ;;
+    maintenance)
+        echo "🧹 Компакция staging таблиц..."
+        python -m src.utils.compact_staging
+        ;;
+    export)
+        echo "📦 Выгрузка core.* в Parquet/DuckDB..."
+        python -m src.utils.export_core "${@:2}"
+        ;;
+    bench)
+        echo "⏱️ Запуск бенчмарков..."
+        for bench in benchmarks/bench_*.py; do
+            python "$bench"
+        done
+        ;;
     *)
-        echo "Использование: ./run.sh [current|historical|references|all|test]"
+        echo "Использование: ./run.sh [current|historical|references|clients|all|test|bench|maintenance|export]"
         echo ""
         echo "  current     - Текущие данные (по умолчанию)"
         echo "  historical  - Исторические данные"
         echo "  references  - Справочники"
+        echo "  clients     - Разрешение клиентов (core.clients, client_id в продажах/тренировках)"
         echo "  all         - Все источники"
+        echo "                (доп. флаги передаются в main.py, напр. ./run.sh all --resume)"
         echo "  test        - Запуск тестов"
+        echo "  bench       - Запуск бенчмарков (benchmarks/bench_*.py)"
+        echo "  maintenance - Компакция staging (старые версии, дубликаты, VACUUM ANALYZE)"
+        echo "  export      - Выгрузка core.* в Parquet (по месяцам) и DuckDB для аналитиков"
         exit 1
         ;;
 esac
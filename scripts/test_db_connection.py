@@ -41,7 +41,7 @@ def test_connection():
             port = '6543'
             print("ℹ️  Обнаружен порт 6543 (Transaction Pooler).")
             print("   ⚠️  Внимание: Для выполнения миграций (создания таблиц) рекомендуется использовать порт 5432 (Session Mode).")
-            print("   Для работы ETL скриптов порт 6543 подходит отлично.")
+            print("   Для работы ETL скриптов порт 6543 подходит отлично (ETL_DB_POOLER=auto включит pooler mode).")
         elif ':5432' in db_url:
             print("ℹ️  Обнаружен порт 5432 (Session Mode / Direct).")
             print("   ✅ Отлично подходит для создания таблиц (DDL).")
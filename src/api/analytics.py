@@ -0,0 +1,351 @@
+"""
+Локальный HTTP API аналитических агрегатов (main.py --serve-api).
+
+Выручка, тренировки и расходы по периоду (day/week/month/quarter/year) и
+измерению (тренер, продукт, категория...) из core.* и представления
+analytics.* в JSON или CSV:
+
+    GET /api/revenue?period=month&by=trainer&from=2025-01-01&to=2025-07-01
+    GET /api/trainings?period=week&format=csv
+    GET /api/monthly_revenue
+
+Ответы кешируются в процессе (src/api/cache.py). Версии таблиц core
+(etl.table_versions, миграция 10) опрашиваются одним запросом раз в
+ANALYTICS_VERSION_POLL_SECONDS: изменение таблицы сбрасывает только
+зависящие от нее ответы, а ETag ответа строится из версий его таблиц,
+поэтому If-None-Match с тем же ETag обслуживается без обращения к БД.
+"""
+import csv
+import hashlib
+import io
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from src.api.cache import CacheEntry, ResponseCache
+from src.core.constants import (
+    ANALYTICS_API_HOST,
+    ANALYTICS_API_PORT,
+    ANALYTICS_VERSION_POLL_SECONDS,
+)
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+PERIODS = ('day', 'week', 'month', 'quarter', 'year')
+
+VERSIONS_SQL = "SELECT table_name, version FROM etl.table_versions"
+
+
+@dataclass(frozen=True)
+class Report:
+    """Агрегат по таблице: меры по периоду и (опционально) одному измерению."""
+    table: str
+    date_column: str
+    measures: Tuple[Tuple[str, str], ...]   # (имя колонки ответа, SQL выражение)
+    dimensions: Dict[str, str] = field(default_factory=dict)  # параметр by -> колонка
+    where: str = 'TRUE'
+
+    @property
+    def tables(self) -> Tuple[str, ...]:
+        return (self.table,)
+
+    def sql(self, by: Optional[str]) -> str:
+        """SQL агрегата; period, from и to - параметры, колонки - только из описания отчета."""
+        columns = [f"DATE_TRUNC(:period, {self.date_column})::DATE AS period"]
+        group_by = ['1']
+        if by is not None:
+            columns.append(f"{self.dimensions[by]} AS {by}")
+            group_by.append('2')
+        columns.extend(f"{expression} AS {name}" for name, expression in self.measures)
+        return f"""
+            SELECT {', '.join(columns)}
+            FROM {self.table}
+            WHERE {self.where}
+              AND (CAST(:date_from AS date) IS NULL OR {self.date_column} >= :date_from)
+              AND (CAST(:date_to AS date) IS NULL OR {self.date_column} < :date_to)
+            GROUP BY {', '.join(group_by)}
+            ORDER BY {', '.join(group_by)}
+        """
+
+
+@dataclass(frozen=True)
+class ViewReport:
+    """Готовое представление схемы analytics."""
+    view: str
+    tables: Tuple[str, ...]   # Таблицы, из которых строится представление
+
+
+REPORTS = {
+    'revenue': Report(
+        'core.sales', 'sale_date',
+        (('revenue', 'SUM(amount)'), ('sales_count', 'COUNT(*)')),
+        {
+            'product': 'product_name', 'trainer': 'trainer_name', 'admin': 'admin_name',
+            'payment_type': 'payment_type', 'source': 'source',
+        },
+        where="validation_status = 'valid'",
+    ),
+    'trainings': Report(
+        'core.trainings', 'training_date',
+        (('trainings', 'COUNT(*)'), ('clients', 'COUNT(DISTINCT client_id)')),
+        {'trainer': 'trainer_name', 'status': 'status', 'source': 'source'},
+    ),
+    'expenses': Report(
+        'core.expenses', 'expense_date',
+        (('expenses', 'SUM(amount)'), ('expenses_count', 'COUNT(*)')),
+        {'category': 'category', 'source': 'source'},
+        where="validation_status = 'valid'",
+    ),
+}
+
+VIEWS = {
+    'monthly_revenue': ViewReport('analytics.monthly_revenue', ('core.sales',)),
+}
+
+
+class BadRequest(ValueError):
+    """Неверные параметры запроса (HTTP 400)."""
+
+
+@dataclass(frozen=True)
+class Query:
+    """Разобранный запрос к отчету."""
+    report: str
+    period: str = 'month'
+    by: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    format: str = 'json'
+
+    @property
+    def key(self) -> str:
+        return f"{self.report}|{self.period}|{self.by}|{self.date_from}|{self.date_to}|{self.format}"
+
+
+def parse_query(report: str, params: Dict[str, List[str]], accept: str = '') -> Query:
+    """Проверяет параметры запроса: все, что попадает в SQL, выбирается из белых списков."""
+    if report not in REPORTS and report not in VIEWS:
+        raise BadRequest(f"неизвестный отчет {report}, доступны: {', '.join([*REPORTS, *VIEWS])}")
+
+    def param(name: str) -> Optional[str]:
+        values = params.get(name)
+        return values[-1] if values else None
+
+    fmt = param('format') or ('csv' if 'text/csv' in accept else 'json')
+    if fmt not in ('json', 'csv'):
+        raise BadRequest("format: json или csv")
+    if report in VIEWS:
+        return Query(report, format=fmt)
+
+    period = param('period') or 'month'
+    if period not in PERIODS:
+        raise BadRequest(f"period: {', '.join(PERIODS)}")
+    by = param('by')
+    if by is not None and by not in REPORTS[report].dimensions:
+        raise BadRequest(f"by для {report}: {', '.join(REPORTS[report].dimensions)}")
+    try:
+        date_from = date.fromisoformat(param('from')) if param('from') else None
+        date_to = date.fromisoformat(param('to')) if param('to') else None
+    except ValueError:
+        raise BadRequest("from / to: дата YYYY-MM-DD")
+    return Query(report, period, by, date_from, date_to, fmt)
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def render_body(query: Query, columns: List[str], rows: List[tuple]) -> Tuple[bytes, str]:
+    """Тело ответа и Content-Type."""
+    if query.format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return buffer.getvalue().encode('utf-8'), 'text/csv; charset=utf-8'
+
+    payload = {
+        'report': query.report,
+        'period': query.period if query.report in REPORTS else None,
+        'by': query.by,
+        'from': query.date_from,
+        'to': query.date_to,
+        'rows': [dict(zip(columns, row)) for row in rows],
+    }
+    body = json.dumps(payload, ensure_ascii=False, default=_json_default)
+    return body.encode('utf-8'), 'application/json; charset=utf-8'
+
+
+class AnalyticsService:
+    """Отчеты с кешем и отслеживанием версий таблиц."""
+
+    def __init__(self, engine: Engine, cache: Optional[ResponseCache] = None,
+                 poll_seconds: float = ANALYTICS_VERSION_POLL_SECONDS):
+        self.engine = engine
+        self.cache = cache or ResponseCache()
+        self.poll_seconds = poll_seconds
+        # None - версии неизвестны (нет миграции 10): кеш живет только TTL, без ETag
+        self.versions: Optional[Dict[str, int]] = None
+        self._stop = threading.Event()
+        self._poller: Optional[threading.Thread] = None
+
+    def refresh_versions(self) -> None:
+        """Перечитывает etl.table_versions и сбрасывает ответы по изменившимся таблицам."""
+        try:
+            with self.engine.connect() as conn:
+                versions = {name: version for name, version in conn.execute(text(VERSIONS_SQL))}
+        except Exception as e:
+            if self.versions is not None or self._poller is None:
+                logger.warning(f"⚠️ Версии таблиц недоступны (миграция 10?), кеш только по TTL, без ETag: {e}")
+            self.versions = None
+            return
+
+        previous = self.versions or {}
+        changed = {t for t in set(previous) | set(versions) if previous.get(t) != versions.get(t)}
+        self.versions = versions
+        if changed and previous:
+            dropped = self.cache.invalidate(changed)
+            logger.info(f"🔄 Изменены {', '.join(sorted(changed))}: сброшено ответов {dropped}")
+
+    def start(self) -> None:
+        self.refresh_versions()
+        self._poller = threading.Thread(target=self._poll, name='table-versions', daemon=True)
+        self._poller.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join()
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            self.refresh_versions()
+
+    def etag(self, query: Query) -> Optional[str]:
+        """ETag по параметрам и версиям таблиц отчета (без запроса к БД)."""
+        versions = self.versions
+        if versions is None:
+            return None
+        tables = (REPORTS.get(query.report) or VIEWS[query.report]).tables
+        state = query.key + '|' + ','.join(f"{t}={versions.get(t, 0)}" for t in tables)
+        return '"' + hashlib.md5(state.encode('utf-8')).hexdigest() + '"'
+
+    def fetch(self, query: Query, etag: Optional[str]) -> CacheEntry:
+        """Ответ из кеша или из БД."""
+        # Без версий таблиц запись кеша живет только TTL
+        tag = etag or ''
+        entry = self.cache.get(query.key, tag)
+        if entry is not None:
+            return entry
+
+        started = time.perf_counter()
+        if query.report in VIEWS:
+            report = VIEWS[query.report]
+            sql, params = f"SELECT * FROM {report.view}", {}
+        else:
+            report = REPORTS[query.report]
+            sql = report.sql(query.by)
+            params = {'period': query.period, 'date_from': query.date_from, 'date_to': query.date_to}
+        with self.engine.connect() as conn:
+            result = conn.execute(text(sql), params)
+            columns, rows = list(result.keys()), [tuple(r) for r in result]
+        body, content_type = render_body(query, columns, rows)
+        logger.debug(f"📊 {query.key}: {len(rows)} строк за {time.perf_counter() - started:.3f}с")
+
+        entry = CacheEntry(tag, body, content_type, report.tables, time.monotonic())
+        self.cache.put(query.key, entry)
+        return entry
+
+
+def make_handler(service: AnalyticsService):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/health':
+                self._send_json(200, {'cache': service.cache.stats(), 'versions': service.versions})
+                return
+            if not url.path.startswith('/api/'):
+                self._send_json(404, {'error': 'не найдено'})
+                return
+
+            try:
+                query = parse_query(url.path[len('/api/'):], parse_qs(url.query), self.headers.get('Accept', ''))
+            except BadRequest as e:
+                self._send_json(400, {'error': str(e)})
+                return
+
+            etag = service.etag(query)
+            if_none_match = [t.strip() for t in (self.headers.get('If-None-Match') or '').split(',')]
+            if etag is not None and (etag in if_none_match or '*' in if_none_match):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+            try:
+                entry = service.fetch(query, etag)
+            except Exception as e:
+                logger.error(f"❌ Ошибка отчета {query.key}: {e}")
+                self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', entry.content_type)
+            self.send_header('Content-Length', str(len(entry.body)))
+            if etag is not None:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(entry.body)
+
+        def _send_json(self, status: int, payload: Dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"🌐 {self.address_string()} {format % args}")
+
+    return Handler
+
+
+def run_api(port: Optional[int] = None, host: str = ANALYTICS_API_HOST) -> None:
+    """Точка входа main.py --serve-api."""
+    from src.config import load_config
+    from src.db import get_db_engine
+
+    config = load_config()
+    if not config.get('SUPABASE_DB_URL'):
+        print("❌ Ошибка: Нет подключения к БД")
+        return
+
+    engine = get_db_engine(config)
+    service = AnalyticsService(engine)
+    service.start()
+    server = ThreadingHTTPServer((host, port or ANALYTICS_API_PORT), make_handler(service))
+    logger.info(f"🚀 Аналитический API: http://{host}:{server.server_port}/api/<{'|'.join([*REPORTS, *VIEWS])}>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("🛑 Остановка API...")
+    finally:
+        server.server_close()
+        service.stop()
+        engine.dispose()
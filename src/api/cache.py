@@ -0,0 +1,77 @@
+"""
+Кеш ответов аналитического API.
+
+LRU с TTL и ограничением по числу записей. Запись помнит таблицы, из
+которых построен ответ, и их версии (etl.table_versions): при смене версии
+таблицы сбрасываются только зависящие от нее записи.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from src.core.constants import ANALYTICS_CACHE_MAX_ENTRIES, ANALYTICS_CACHE_TTL_SECONDS
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """Готовый ответ и версии таблиц, по которым он посчитан."""
+    etag: str
+    body: bytes
+    content_type: str
+    tables: Tuple[str, ...]
+    created_at: float
+
+
+class ResponseCache:
+    """Потокобезопасный LRU-кеш с TTL."""
+
+    def __init__(self, max_entries: int = ANALYTICS_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = ANALYTICS_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, etag: str) -> Optional[CacheEntry]:
+        """Запись, если она посчитана по тем же версиям таблиц (etag) и не устарела."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.etag != etag or time.monotonic() - entry.created_at > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tables: Iterable[str]) -> int:
+        """Удаляет ответы, построенные по любой из таблиц. Возвращает число удаленных."""
+        changed = set(tables)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if changed.intersection(entry.tables)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
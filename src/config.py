@@ -1,11 +1,12 @@
 """Type-safe configuration management using Pydantic."""
-import os
-import json
 from pathlib import Path
 from typing import Dict, Any, Optional
+from urllib.parse import urlparse
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from src.core.constants import METRICS_HTTP_PORT, SUPABASE_POOLER_PORT
+
 
 class AppConfig(BaseSettings):
     """Application configuration with validation."""
@@ -13,7 +14,7 @@ class AppConfig(BaseSettings):
     # Database
     supabase_db_url: str = Field(
         ..., 
-        description="PostgreSQL/Supabase database connection URL"
+        description="PostgreSQL/Supabase database connection URL, or duckdb:///<file> for the embedded backend"
     )
     
     # Google Sheets
@@ -22,6 +23,28 @@ class AppConfig(BaseSettings):
         description="Path to Google Sheets service account JSON file"
     )
     
+    # Staging write path: sqlalchemy (default) or asyncpg (COPY + pipelined fetch/clean/load)
+    etl_db_driver: str = Field(
+        'sqlalchemy',
+        description="Database driver for staging writes (ETL_DB_DRIVER)"
+    )
+    
+    # Round-trip-minimizing mode for the Supabase transaction pooler: auto (port 6543), on, off
+    etl_db_pooler: str = Field(
+        'auto',
+        description="Transaction pooler DB mode (ETL_DB_POOLER)"
+    )
+    
+    # Prometheus endpoint of --daemon (0 disables it) and optional text-format file written after each run
+    etl_metrics_port: int = Field(
+        METRICS_HTTP_PORT,
+        description="HTTP port for /metrics in daemon mode (ETL_METRICS_PORT)"
+    )
+    etl_metrics_file: Optional[str] = Field(
+        None,
+        description="Prometheus text-format file written after each run (ETL_METRICS_FILE)"
+    )
+    
     # Sources (loaded separately from JSON)
     _sources: Dict[str, Any] = {}
     
@@ -36,8 +59,24 @@ class AppConfig(BaseSettings):
     @classmethod
     def validate_db_url(cls, v: str) -> str:
         """Validate database URL format."""
-        if not v.startswith(('postgres://', 'postgresql://')):
-            raise ValueError('Database URL must start with postgres:// or postgresql://')
+        if not v.startswith(('postgres://', 'postgresql://', 'duckdb:///')):
+            raise ValueError('Database URL must start with postgres://, postgresql:// or duckdb:///')
+        return v
+    
+    @field_validator('etl_db_driver')
+    @classmethod
+    def validate_db_driver(cls, v: str) -> str:
+        """Validate staging write driver."""
+        if v not in ('sqlalchemy', 'asyncpg'):
+            raise ValueError('ETL_DB_DRIVER must be sqlalchemy or asyncpg')
+        return v
+    
+    @field_validator('etl_db_pooler')
+    @classmethod
+    def validate_db_pooler(cls, v: str) -> str:
+        """Validate pooler mode switch."""
+        if v not in ('auto', 'on', 'off'):
+            raise ValueError('ETL_DB_POOLER must be auto, on or off')
         return v
     
     @field_validator('google_sheets_credentials_file')
@@ -57,26 +96,12 @@ class AppConfig(BaseSettings):
         return v
     
     def load_sources(self) -> Dict[str, Any]:
-        """Load sources configuration from JSON file."""
+        """Load sources configuration from the compiled manifest (src/sources.json)."""
         if self._sources:
             return self._sources
         
-        # Try src/sources.json first (new location)
-        sources_path = Path(__file__).parent / 'sources.json'
-        
-        # Fallback to secrets/sources.json (old location)
-        if not sources_path.exists():
-            sources_path = Path(__file__).parent.parent / 'secrets' / 'sources.json'
-        
-        if sources_path.exists():
-            with open(sources_path, 'r', encoding='utf-8') as f:
-                sources_data = json.load(f)
-                # Filter out comments (keys starting with '_')
-                self._sources = {
-                    k: v for k, v in sources_data.items()
-                    if not k.startswith('_') and isinstance(v, dict)
-                }
-        
+        from src.core.manifest import load_manifest
+        self._sources = load_manifest().fetch_options()
         return self._sources
     
     @property
@@ -84,37 +109,55 @@ class AppConfig(BaseSettings):
         """Get sources configuration."""
         return self.load_sources()
 
+    @property
+    def db_pooler_mode(self) -> bool:
+        """Whether to use pooler mode; 'auto' turns it on for the transaction pooler port."""
+        if self.etl_db_pooler == 'auto':
+            return urlparse(self.supabase_db_url).port == SUPABASE_POOLER_PORT
+        return self.etl_db_pooler == 'on'
+
 
 # Singleton instance
 _config: Optional[AppConfig] = None
 
 
+_config_dict: Optional[dict] = None
+
+
 def load_config() -> dict:
     """
     Load and return configuration (backward compatible with old dict interface).
+
+    The dict is built once per process; treat it as read-only.
     
     Returns:
         dict: Configuration dictionary with keys:
             - SUPABASE_DB_URL
             - GOOGLE_SHEETS_CREDENTIALS_FILE
             - SOURCES
+            - DB_DRIVER
+            - DB_POOLER (bool, transaction pooler mode)
+            - METRICS_PORT (daemon /metrics port, 0 - off)
+            - METRICS_FILE (Prometheus text-format file or None)
+            - MANIFEST (compiled src.core.manifest.Manifest)
     """
-    global _config
+    global _config_dict
     
-    if _config is None:
-        # Try loading from secrets/.env first
-        env_path = Path(__file__).parent.parent / 'secrets' / '.env'
-        if env_path.exists():
-            _config = AppConfig(_env_file=str(env_path))
-        else:
-            _config = AppConfig()
-    
-    # Return dict for backward compatibility
-    return {
-        'SUPABASE_DB_URL': _config.supabase_db_url,
-        'GOOGLE_SHEETS_CREDENTIALS_FILE': _config.google_sheets_credentials_file,
-        'SOURCES': _config.sources,
-    }
+    if _config_dict is None:
+        from src.core.manifest import load_manifest
+
+        config = get_config()
+        _config_dict = {
+            'SUPABASE_DB_URL': config.supabase_db_url,
+            'GOOGLE_SHEETS_CREDENTIALS_FILE': config.google_sheets_credentials_file,
+            'SOURCES': config.sources,
+            'DB_DRIVER': config.etl_db_driver,
+            'DB_POOLER': config.db_pooler_mode,
+            'METRICS_PORT': config.etl_metrics_port,
+            'METRICS_FILE': config.etl_metrics_file,
+            'MANIFEST': load_manifest(),
+        }
+    return _config_dict
 
 
 def get_config() -> AppConfig:
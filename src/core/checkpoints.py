@@ -0,0 +1,187 @@
+"""
+Контрольные точки запусков ETL (etl.etl_runs / etl.etl_checkpoints).
+
+Для каждого запуска пайплайна хранится статус, а для каждой таблицы —
+сколько строк подготовленного DataFrame уже закоммичено. Чанк вставки и
+продвижение контрольной точки коммитятся в одной транзакции, поэтому
+после падения (--resume) загрузка продолжается с последней границы чанка,
+а полностью загруженные источники не перечитываются из Sheets вовсе.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy import column, func, literal_column, table, text, update
+from sqlalchemy.engine import Engine
+
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+RUN_RUNNING = 'running'
+RUN_COMPLETED = 'completed'
+RUN_FAILED = 'failed'
+
+# Для сборки UPDATE в одном выражении со вставкой чанка (DataLoader, pooler mode)
+etl_checkpoints = table(
+    'etl_checkpoints',
+    column('run_id'), column('target_table'), column('rows_committed'), column('chunks_committed'),
+    column('boundary_hash'), column('status'), column('updated_at'),
+    schema='etl',
+)
+
+
+@dataclass
+class TableCheckpoint:
+    """Прогресс загрузки одной таблицы в рамках запуска."""
+    run_id: int
+    target_table: str
+    source_name: str
+    rows_committed: int = 0
+    boundary_hash: Optional[str] = None   # row_hash последней закоммиченной строки
+    completed: bool = False
+
+    def resume_offset(self, row_hashes: List[str]) -> int:
+        """
+        С какой строки продолжать вставку.
+
+        Граница принимается, только если строка перед ней совпадает по хешу:
+        если лист изменился между запусками, таблица грузится с начала
+        (повторные строки отсечет ON CONFLICT DO NOTHING).
+        """
+        offset = self.rows_committed
+        if offset <= 0:
+            return 0
+        if offset <= len(row_hashes) and row_hashes[offset - 1] == self.boundary_hash:
+            return offset
+        logger.warning(
+            f"⚠️ {self.target_table}: данные изменились с прошлого запуска, "
+            f"контрольная точка ({offset} строк) сброшена"
+        )
+        self.rows_committed = 0
+        self.boundary_hash = None
+        return 0
+
+    def save_statement(self, rows_committed: int, boundary_hash: str, completed: bool):
+        """UPDATE контрольной точки (с RETURNING, чтобы его можно было вложить в CTE)."""
+        return update(etl_checkpoints).where(
+            etl_checkpoints.c.run_id == self.run_id,
+            etl_checkpoints.c.target_table == self.target_table,
+        ).values(
+            rows_committed=rows_committed,
+            boundary_hash=boundary_hash,
+            chunks_committed=etl_checkpoints.c.chunks_committed + 1,
+            status=RUN_COMPLETED if completed else RUN_RUNNING,
+            updated_at=func.now(),
+        ).returning(literal_column('1'))
+
+    def save(self, conn, rows_committed: int, boundary_hash: str, completed: bool) -> None:
+        """Записывает контрольную точку в транзакции вставленного чанка."""
+        conn.execute(self.save_statement(rows_committed, boundary_hash, completed))
+
+    async def save_async(self, conn, rows_committed: int, boundary_hash: str, completed: bool) -> None:
+        """То же, что save, для соединения asyncpg (AsyncDataLoader)."""
+        await conn.execute("""
+            UPDATE etl.etl_checkpoints
+            SET rows_committed = $1,
+                boundary_hash = $2,
+                chunks_committed = chunks_committed + 1,
+                status = $3,
+                updated_at = NOW()
+            WHERE run_id = $4 AND target_table = $5
+        """, rows_committed, boundary_hash, RUN_COMPLETED if completed else RUN_RUNNING,
+            self.run_id, self.target_table)
+
+    def advance(self, rows_committed: int, boundary_hash: str, completed: bool) -> None:
+        """Обновляет состояние в памяти после коммита транзакции чанка."""
+        self.rows_committed = rows_committed
+        self.boundary_hash = boundary_hash
+        self.completed = completed
+
+
+class CheckpointStore:
+    """Состояние запусков пайплайнов в схеме etl."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def start_run(self, pipeline: str, resume: bool = False) -> int:
+        """
+        Начинает запуск пайплайна и возвращает его run_id.
+
+        При resume продолжается последний незавершенный запуск этого
+        пайплайна (если он есть), иначе создается новый.
+        """
+        with self.engine.begin() as conn:
+            if resume:
+                row = conn.execute(text("""
+                    SELECT run_id FROM etl.etl_runs
+                    WHERE pipeline = :pipeline AND status <> :completed
+                    ORDER BY run_id DESC
+                    LIMIT 1
+                """), {'pipeline': pipeline, 'completed': RUN_COMPLETED}).fetchone()
+                if row is not None:
+                    conn.execute(text("""
+                        UPDATE etl.etl_runs
+                        SET status = :running, resumed_at = NOW(), error = NULL
+                        WHERE run_id = :run_id
+                    """), {'running': RUN_RUNNING, 'run_id': row[0]})
+                    logger.info(f"🔁 Продолжаем запуск #{row[0]} ({pipeline})")
+                    return row[0]
+                logger.info(f"ℹ️ Незавершенных запусков {pipeline} нет, начинаем новый")
+
+            run_id = conn.execute(text("""
+                INSERT INTO etl.etl_runs (pipeline, status)
+                VALUES (:pipeline, :running)
+                RETURNING run_id
+            """), {'pipeline': pipeline, 'running': RUN_RUNNING}).scalar()
+        return run_id
+
+    def table_checkpoints(self, run_id: int) -> Dict[str, TableCheckpoint]:
+        """Контрольные точки таблиц запуска (target_table -> checkpoint)."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT target_table, source_name, rows_committed, boundary_hash, status
+                FROM etl.etl_checkpoints
+                WHERE run_id = :run_id
+            """), {'run_id': run_id}).fetchall()
+        return {
+            r[0]: TableCheckpoint(run_id, r[0], r[1], r[2], r[3], r[4] == RUN_COMPLETED)
+            for r in rows
+        }
+
+    def checkpoint(self, run_id: int, target_table: str, source_name: str) -> TableCheckpoint:
+        """Возвращает контрольную точку таблицы, создавая ее при первом обращении."""
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO etl.etl_checkpoints (run_id, target_table, source_name)
+                VALUES (:run_id, :target_table, :source_name)
+                ON CONFLICT (run_id, target_table) DO NOTHING
+            """), {'run_id': run_id, 'target_table': target_table, 'source_name': source_name})
+        return self.table_checkpoints(run_id)[target_table]
+
+    def mark_completed(self, checkpoint: TableCheckpoint) -> None:
+        """Отмечает таблицу загруженной (например, когда новых строк нет)."""
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                UPDATE etl.etl_checkpoints
+                SET status = :completed, updated_at = NOW()
+                WHERE run_id = :run_id AND target_table = :target_table
+            """), {
+                'completed': RUN_COMPLETED,
+                'run_id': checkpoint.run_id,
+                'target_table': checkpoint.target_table,
+            })
+        checkpoint.completed = True
+
+    def finish_run(self, run_id: int, errors: List[str]) -> None:
+        """Закрывает запуск: completed, если ошибок нет, иначе failed."""
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                UPDATE etl.etl_runs
+                SET status = :status, finished_at = NOW(), error = :error
+                WHERE run_id = :run_id
+            """), {
+                'status': RUN_FAILED if errors else RUN_COMPLETED,
+                'error': '; '.join(errors) or None,
+                'run_id': run_id,
+            })
@@ -4,6 +4,50 @@
 DB_BATCH_SIZE = 1000
 DB_CONNECTION_POOL_SIZE = 5
 DB_MAX_OVERFLOW = 10
+ASYNC_PIPELINE_QUEUE_SIZE = 2  # Подготовленных таблиц в очереди между стадиями (ETL_DB_DRIVER=asyncpg)
+SUPABASE_POOLER_PORT = 6543    # Transaction pooler: ETL_DB_POOLER=auto включает pooler mode
+DB_POOL_RECYCLE_SECONDS = 300  # В pooler mode вместо pre-ping (лишний round trip на каждое соединение)
+DDL_LOCK_TIMEOUT_MS = 5000     # Ожидание блокировки для ALTER TABLE ADD COLUMN
+COMPACTION_BATCH_SIZE = 5000   # Строк на одну транзакцию DELETE при компакции
+ROW_SHARD_MIN_ROWS = 20000     # Строк на блок при очистке одной таблицы на нескольких ядрах
+
+# Партиционированные по году staging таблицы: таблица -> колонка даты.
+# Уникальный ключ дедупликации у них (row_hash, <колонка даты>).
+PARTITIONED_TABLES = {
+    'sales_hst': 'data',
+    'trainings_hst': 'data',
+}
+# Партиционированные по году таблицы core: таблица -> колонка даты
+CORE_PARTITIONED_TABLES = {
+    'sales': 'sale_date',
+}
+
+# Разрешение клиентов (src/etl/entity_resolution.py): откуда берутся клиенты
+# (в этом порядке - более поздние данные обновляют поля клиента) и где
+# по колонке klient проставляется client_id
+CLIENT_SOURCE_TABLES = ('clients_hst', 'clients_cur')
+CLIENT_LINK_TABLES = ('sales_hst', 'sales_cur', 'trainings_hst')
+CLIENT_RESOLUTION_BATCH_SIZE = 10000  # Новых строк staging на одну транзакцию
+# Таблицы состояния разрешения (миграция 06); без них шаг пропускается
+CLIENT_RESOLUTION_TABLES = ('core.client_keys', 'etl.resolution_watermarks', 'etl.client_link_pending')
+
+# Статистика справочников (src/etl/reference_stats.py):
+# таблица staging -> {колонка: статистика в references_stats.json}
+REFERENCE_STATS_COLUMNS = {
+    'sales_hst': {
+        'trener': 'trainers',
+        'admin': 'admins',
+        'produkt': 'products',
+        'tip': 'types',
+        'kategoriya': 'categories',
+    },
+    'trainings_hst': {
+        'sotrudnik': 'trainers',
+        'tip': 'types',
+        'kategoriya': 'categories',
+    },
+}
+REFERENCE_STATS_BATCH_SIZE = 50000  # Новых строк staging на одну транзакцию
 
 # Data Processing
 DATE_FORMAT = '%d.%m.%Y'
@@ -14,11 +58,75 @@ DEFAULT_ENCODING = 'utf-8'
 LOG_FORMAT = '%(asctime)s | %(levelname)-8s | %(name)s | %(message)s'
 LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 LOG_FILE_PREFIX = 'etl_'
+LOG_RATE_LIMIT_COUNT = 20      # WARNING с одной строки кода за окно
+LOG_RATE_LIMIT_WINDOW = 60     # секунды
+
+# Кеш скомпилированного манифеста sources.json (src/core/manifest.py)
+MANIFEST_CACHE_DIR = '.cache'
+
+# Local spool (отложенные загрузки при недоступной БД)
+SPOOL_DIR_NAME = 'spool'
+SPOOL_QUARANTINE_DIR_NAME = 'quarantine'  # Батчи спула, которые не загружаются из-за самих данных
+# SQLSTATE ошибок связи: класс 08 и остановка сервера (admin/crash shutdown, cannot connect now)
+CONNECTION_SQLSTATE_CLASS = '08'
+SERVER_SHUTDOWN_SQLSTATES = ('57P01', '57P02', '57P03')
+# Временные ошибки сервера: батч спула не в карантин, а ждет следующего replay
+# (serialization_failure, deadlock_detected, lock_not_available, query_canceled)
+TRANSIENT_SQLSTATES = ('40001', '40P01', '55P03', '57014')
 
 # Timeouts
 SHEETS_READ_TIMEOUT = 30
 DB_QUERY_TIMEOUT = 60
 
+# Google Sheets API quota (60 read requests / minute / user)
+SHEETS_READS_PER_MINUTE = 60
+SHEETS_QUOTA_SAFETY = 0.9       # Запас, чтобы не упираться в окно квоты
+SHEETS_BURST_SIZE = 5
+SHEETS_MIN_RATE_FRACTION = 0.1  # Нижняя граница адаптивной скорости
+SHEETS_MAX_RETRIES = 6
+SHEETS_BACKOFF_BASE = 1.0       # секунды
+SHEETS_BACKOFF_MAX = 64.0       # секунды
+
+# Daemon mode (интервалы по умолчанию; переопределяются interval_minutes в sources.json)
+DAEMON_CURRENT_INTERVAL_MINUTES = 5
+DAEMON_HISTORICAL_INTERVAL_MINUTES = 24 * 60
+DAEMON_CLIENTS_INTERVAL_MINUTES = 30
+DAEMON_TICK_SECONDS = 10
+
+# Очередь задач (src/core/job_queue.py, режим --worker)
+JOB_VISIBILITY_TIMEOUT_SECONDS = 15 * 60  # Аренда задачи; воркер продлевает ее, пока работает
+JOB_HEARTBEAT_SECONDS = 60
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BASE_SECONDS = 60     # Задержка повтора: base * 2^(попытка - 1)
+JOB_MAX_RUNNING_PER_SPREADSHEET = 2  # Одновременных задач на одну таблицу Google
+JOB_POLL_SECONDS = 5            # Пауза воркера, когда задач нет
+
+# Метрики (src/core/metrics.py)
+METRICS_HTTP_HOST = '127.0.0.1'
+METRICS_HTTP_PORT = 9108        # /metrics в режиме --daemon (ETL_METRICS_PORT, 0 - выключить)
+METRICS_LATENCY_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)  # секунды, стадии запуска
+
+# Аналитический API (src/api/analytics.py, main.py --serve-api)
+ANALYTICS_API_HOST = '127.0.0.1'
+ANALYTICS_API_PORT = 8088
+ANALYTICS_CACHE_TTL_SECONDS = 300      # Даже без изменений таблиц ответ пересчитывается не реже
+ANALYTICS_CACHE_MAX_ENTRIES = 256      # Дальше вытесняются давно не запрошенные ответы
+ANALYTICS_VERSION_POLL_SECONDS = 2     # Опрос etl.table_versions (один запрос на все таблицы)
+
+# Выгрузка core.* для аналитиков (src/etl/parquet_export.py): таблица -> колонка месяца партиции
+EXPORT_TABLES = {
+    'core.sales': 'sale_date',
+    'core.trainings': 'training_date',
+    'core.expenses': 'expense_date',
+    'core.clients': 'created_at',
+}
+EXPORT_DIR = 'export'
+EXPORT_NUMERIC_SCALE = 10      # Знаков после запятой для numeric без (p, s): decimal128(38, 10)
+EXPORT_DUCKDB_FILE = 'planeta.duckdb'  # Не core.duckdb: имя каталога совпало бы со схемой core
+
+# Append-only sources
+WATERMARK_TAIL_ROWS = 20        # Сколько последних строк проверяется хешем
+
 # Column keywords
 NUMERIC_KEYWORDS = [
     'stoimost', 'summa', 'kolichestvo', 'bonus',
@@ -1,54 +1,317 @@
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+import pandas as pd
 import sqlalchemy
 from src.etl.loader import DataLoader
-from src.etl.data_cleaner import clean_dataframe
+from src.etl.parallel_loader import LoadResult, LoadTask, ParallelLoadExecutor, prepare_frame
+from src.etl.spool import LoadSpool, replay_spool
+from src.etl.async_loader import AsyncDataLoader, AsyncLoadPipeline, SourceItem
+from src.core.checkpoints import CheckpointStore, TableCheckpoint
+from src.core.manifest import CleaningPlan, load_manifest
+from src.core.metrics import get_metrics
+from src.core.planner import DiffPlanner, TablePlan, load_snapshot, save_snapshot
 from src.core.sheets_processor import SheetsProcessor
+from src.core.rate_limiter import get_sheets_rate_limiter
+from src.core.watermarks import WatermarkStore
 from src.logger import get_logger
 
 class ETLPipeline(ABC):
-    """Базовый класс для ETL пайплайнов."""
+    """
+    Базовый класс для ETL пайплайнов.
+
+    Источники пайплайна, целевые таблицы и маппинги колонок берутся из
+    скомпилированного манифеста (sources.json, поле pipeline).
+    """
     
     def __init__(self, config: Dict, engine: sqlalchemy.Engine):
         self.config = config
         self.engine = engine
-        self.loader = DataLoader(engine)
-        self.sheets_processor = SheetsProcessor(config)
+        self.manifest = config.get('MANIFEST') or load_manifest()
+        self.loader = DataLoader(engine, LoadSpool(), pooler_mode=config.get('DB_POOLER', False))
+        self.sheets_processor = SheetsProcessor(config, WatermarkStore(engine))
+        self.checkpoints = CheckpointStore(engine)
         self.logger = get_logger(self.__class__.__name__)
+        # Ошибки последнего run(), включая ошибки чтения (их нет среди LoadResult)
+        self.last_errors: List[str] = []
+        self.metrics = get_metrics()
+        self.metrics.watch_engine(engine)
+        # Метрики каждого запуска пишутся в etl.metrics; --daemon отдает их по HTTP
+        self.write_metrics = True
     
+    @property
     @abstractmethod
+    def pipeline_name(self) -> str:
+        """Значение поля pipeline в sources.json."""
+
     def get_source_mapping(self) -> Dict[str, str]:
         """Возвращает маппинг source_name -> target_table."""
-        pass
+        return self.manifest.source_mapping(self.pipeline_name)
     
-    @abstractmethod
     def get_column_mappings(self) -> Dict[str, Dict[str, str]]:
         """Возвращает маппинг колонок для каждой таблицы."""
-        pass
+        return self.manifest.column_mappings(self.pipeline_name)
     
-    def run(self):
-        """Запускает пайплайн."""
+    def run(self, source_names: Optional[List[str]] = None, resume: bool = False) -> List[LoadResult]:
+        """
+        Запускает пайплайн.
+
+        Сначала загружается локальный спул (если есть), затем читаются все
+        листы (последовательно, под общим ограничителем квоты), после чего
+        таблицы очищаются и загружаются параллельно (с ETL_DB_DRIVER=asyncpg
+        чтение, очистка и запись идут перекрывающимся конвейером). Прогресс
+        фиксируется в etl.etl_runs / etl.etl_checkpoints; если БД недоступна,
+        запуск идет без контрольных точек, а подготовленные данные уходят в спул.
+
+        Args:
+            source_names: Ограничить запуск этими источниками (None - все)
+            resume: Продолжить последний незавершенный запуск: загруженные
+                источники пропускаются, остальные продолжаются с последнего чанка
+        """
         self.logger.info(f"🚀 Запуск {self.__class__.__name__}")
         
         sources = self.config.get('SOURCES', {})
         source_mapping = self.get_source_mapping()
-        
-        for source_name, target_table in source_mapping.items():
-            if source_name in sources:
-                self._process_source(
-                    sources[source_name],
-                    source_name,
-                    target_table
-                )
+        self.loader.reset_catalog_cache()
+        metrics_before = self.metrics.snapshot()
+        self._replay_spool()
+
+        try:
+            run_id = self.checkpoints.start_run(self.__class__.__name__, resume)
+            done = {t for t, cp in self.checkpoints.table_checkpoints(run_id).items() if cp.completed}
+        except Exception as e:
+            self.logger.warning(f"⚠️ Контрольные точки недоступны, запуск без них: {e}")
+            run_id, done = None, set()
+
+        items = [
+            SourceItem(source_name, target_table)
+            for source_name, target_table in source_mapping.items()
+            if (source_names is None or source_name in source_names) and source_name in sources
+        ]
+        tasks: List[LoadTask] = []
+        errors: List[str] = []
+        self._plan_fetches(item.source_name for item in items if item.target_table not in done)
+
+        def read_task(item: SourceItem) -> Optional[LoadTask]:
+            task = self._read_task(item, run_id, done, errors)
+            if task is not None:
+                tasks.append(task)
+            return task
+
+        try:
+            if self.config.get('DB_DRIVER') == 'asyncpg' and not self.loader.backend.embedded:
+                # Чтение, очистка и запись перекрываются в одном конвейере (COPY asyncpg - только Postgres)
+                async_loader = AsyncDataLoader(self.config['SUPABASE_DB_URL'], self.loader)
+                results = AsyncLoadPipeline(async_loader, read_task).run(items)
+            else:
+                for item in items:
+                    read_task(item)
+                results = ParallelLoadExecutor(self.loader).run(tasks)
+        except Exception as e:
+            self.last_errors = errors + [f"{type(e).__name__}: {e}"]
+            self._finish_run(run_id, self.last_errors)
+            self._publish_metrics(run_id, metrics_before)
+            raise
+
+        # Водяные знаки append-only источников двигаем только после успешной загрузки
+        # (отложенные в спул данные тоже считаются сохраненными)
+        checkpoints = {t.target_table: t.checkpoint for t in tasks}
+        for result in results:
+            self._record_result(result)
+            if result.ok:
+                self.sheets_processor.commit_watermarks(result.target_table)
+                if result.rows_spooled:
+                    self._mark_completed(checkpoints.get(result.target_table))
+            else:
+                errors.append(f"{result.target_table}: {result.error}")
+
+        self._finish_run(run_id, errors)
+        self.last_errors = errors
+        if errors:
+            self.logger.error(f"❌ Запуск #{run_id} завершен с ошибками, продолжить: --resume")
+
+        stats = get_sheets_rate_limiter().stats()
+        self.logger.info(
+            f"📈 Sheets API: {stats['requests']} запросов, 429: {stats['throttled']}, "
+            f"повторов: {stats['retries']}, ожидание квоты: {stats['wait_seconds']:.1f}с "
+            f"(макс {stats['max_wait_seconds']:.1f}с), backoff: {stats['backoff_seconds']:.1f}с"
+        )
+        self._publish_metrics(run_id, metrics_before)
+        return results
+
+    def plan(
+        self,
+        source_names: Optional[List[str]] = None,
+        snapshot_dir: Optional[Path] = None,
+        save_snapshot_dir: Optional[Path] = None
+    ) -> List[TablePlan]:
+        """
+        Dry-run: читает, очищает и хеширует источники и сравнивает их со
+        staging без записи (см. src/core/planner.py). Append-only источники
+        читаются целиком, без водяного знака: план и снимок покрывают весь
+        лист, а не только строки после последней загрузки.
+
+        Args:
+            source_names: Ограничить план этими источниками (None - все)
+            snapshot_dir: Брать сырые кадры из снимка вместо Google Sheets
+            save_snapshot_dir: Сохранить прочитанные сырые кадры как снимок
+        """
+        sources = self.config.get('SOURCES', {})
+        planner = DiffPlanner(self.engine, self.loader.backend)
+        if snapshot_dir is None:
+            self._plan_fetches(
+                name for name in self.get_source_mapping()
+                if name in sources and (source_names is None or name in source_names)
+            )
+
+        plans = []
+        for source_name, target_table in self.get_source_mapping().items():
+            if source_names is not None and source_name not in source_names:
+                continue
+            if source_name not in sources:
+                continue
+
+            if snapshot_dir is not None:
+                df = load_snapshot(snapshot_dir, target_table)
+            else:
+                df = self._read_source(dict(sources[source_name], mode='full'), source_name, target_table)
+            if df is None:
+                plans.append(TablePlan(source_name, target_table, error='ошибка чтения'))
+                continue
+            if save_snapshot_dir is not None:
+                save_snapshot(df, save_snapshot_dir, target_table)
+            if df.empty:
+                plans.append(TablePlan(source_name, target_table))
+                continue
+
+            try:
+                prepared = prepare_frame(df.copy(), target_table, self._cleaning_plan(source_name))
+                plans.append(planner.plan_table(prepared, target_table, source_name))
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка планирования {target_table}: {e}")
+                plans.append(TablePlan(source_name, target_table, rows=len(df), error=f"{type(e).__name__}: {e}"))
+        return plans
+
+    def _read_task(
+        self, item: SourceItem, run_id: Optional[int], done: Set[str], errors: List[str]
+    ) -> Optional[LoadTask]:
+        """Читает источник и возвращает задачу загрузки (None - грузить нечего)."""
+        if item.target_table in done:
+            self.logger.info(f"⏩ {item.source_name}: уже загружен в запуске #{run_id}, пропуск")
+            return None
+
+        started = time.perf_counter()
+        df = self._read_source(
+            self.config['SOURCES'][item.source_name],
+            item.source_name,
+            item.target_table
+        )
+        if df is not None:
+            self.metrics.observe('etl_stage_duration_seconds', time.perf_counter() - started,
+                                 stage='fetch', source=item.source_name)
+            self.metrics.inc('etl_rows_fetched_total', len(df), source=item.source_name)
+        checkpoint = self._table_checkpoint(run_id, item.target_table, item.source_name)
+        if df is None:
+            errors.append(f"{item.source_name}: ошибка чтения")
+            return None
+        if df.empty:
+            self._mark_completed(checkpoint)
+            self.metrics.set('etl_last_success_timestamp_seconds', time.time(), table=item.target_table)
+            return None
+        return LoadTask(
+            item.source_name, item.target_table, df, checkpoint, self._cleaning_plan(item.source_name)
+        )
+
+    def _plan_fetches(self, source_names: Iterable[str]) -> None:
+        """Сетка листов всех таблиц запуска одним запросом метаданных на таблицу."""
+        source_configs = [self.config['SOURCES'][name] for name in source_names]
+        if not source_configs:
+            return
+        try:
+            self.sheets_processor.plan_fetches(source_configs)
+        except Exception as e:
+            # Метаданные будут запрошены при чтении каждой таблицы
+            self.logger.warning(f"⚠️ Не удалось прочитать сетку листов: {e}")
+
+    def _record_result(self, result: LoadResult) -> None:
+        """Строки и время стадий очистки и записи одной таблицы."""
+        source = result.source_name
+        self.metrics.inc('etl_rows_cleaned_total', result.rows_cleaned, source=source)
+        self.metrics.inc('etl_rows_inserted_total', result.rows_loaded, source=source)
+        self.metrics.inc('etl_rows_spooled_total', result.rows_spooled, source=source)
+        if result.clean_seconds:
+            self.metrics.observe('etl_stage_duration_seconds', result.clean_seconds, stage='clean', source=source)
+        if result.load_seconds:
+            self.metrics.observe('etl_stage_duration_seconds', result.load_seconds, stage='load', source=source)
+        if result.ok:
+            self.metrics.set('etl_last_success_timestamp_seconds', time.time(), table=result.target_table)
+
+    def _publish_metrics(self, run_id: Optional[int], since: Dict) -> None:
+        """Метрики запуска: в etl.metrics (кроме --daemon) и в файл ETL_METRICS_FILE."""
+        if self.write_metrics:
+            try:
+                self.metrics.write_run(self.engine, run_id, self.pipeline_name, since)
+            except Exception as e:
+                self.logger.warning(f"⚠️ Метрики запуска не записаны в etl.metrics: {e}")
+        metrics_file = self.config.get('METRICS_FILE')
+        if metrics_file:
+            try:
+                self.metrics.write_file(metrics_file)
+            except OSError as e:
+                self.logger.warning(f"⚠️ Не удалось записать метрики в {metrics_file}: {e}")
+
+    def _replay_spool(self) -> None:
+        """Догружает отложенные батчи до новых данных, чтобы сохранить порядок версий."""
+        if not self.loader.spool.pending():
+            return
+        try:
+            replay_spool(self.loader, self.loader.spool)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Спул не загружен, новые данные таблиц из спула тоже будут отложены: {e}")
+
+    def _table_checkpoint(self, run_id: Optional[int], target_table: str, source_name: str) -> Optional[TableCheckpoint]:
+        if run_id is None:
+            return None
+        try:
+            return self.checkpoints.checkpoint(run_id, target_table, source_name)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Не удалось создать контрольную точку {target_table}: {e}")
+            return None
+
+    def _mark_completed(self, checkpoint: Optional[TableCheckpoint]) -> None:
+        if checkpoint is None:
+            return
+        try:
+            self.checkpoints.mark_completed(checkpoint)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Не удалось обновить контрольную точку {checkpoint.target_table}: {e}")
+
+    def _finish_run(self, run_id: Optional[int], errors: List[str]) -> None:
+        if run_id is None:
+            return
+        try:
+            self.checkpoints.finish_run(run_id, errors)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Не удалось сохранить статус запуска #{run_id}: {e}")
     
-    def _process_source(self, source_config: Dict, source_name: str, target_table: str):
-        """Обрабатывает один источник данных."""
-        df = self.sheets_processor.read_and_transform(
+    def _read_source(self, source_config: Dict, source_name: str, target_table: str) -> Optional[pd.DataFrame]:
+        """Читает один источник данных (без очистки и загрузки)."""
+        spec = self.manifest.get(source_name)
+        if spec is not None and spec.rename == 'positional':
+            # Лист без стабильных заголовков: колонки по позиции (col_1, col_2...), без маппинга
+            df = self.sheets_processor.read_and_transform(source_config, target_table, None)
+            if df is not None and not df.empty:
+                data_columns = [c for c in df.columns if c != 'source_row_id']
+                df = df.rename(columns={c: f"col_{i}" for i, c in enumerate(data_columns, 1)})
+            return df
+
+        return self.sheets_processor.read_and_transform(
             source_config,
             target_table,
             self.get_column_mappings().get(target_table, {})
         )
-        
-        if df is not None and not df.empty:
-            df_cleaned = clean_dataframe(df, target_table)
-            self.loader.load_staging(df_cleaned, target_table, source_name)
+
+    def _cleaning_plan(self, source_name: str) -> Optional[CleaningPlan]:
+        spec = self.manifest.get(source_name)
+        return spec.cleaning if spec is not None else None
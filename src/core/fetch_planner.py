@@ -0,0 +1,140 @@
+"""
+Планировщик чтения листов Google Sheets по метаданным сетки.
+
+Диапазоны в sources.json открыты снизу ("A1:R", "B4:W"). Один запрос
+метаданных на таблицу (spreadsheets.get, только sheets.properties) дает
+для всех ее листов название, gid и размер сетки. По ним планировщик:
+
+- сужает диапазон до сетки листа: строки и колонки за ее пределами не
+  запрашиваются;
+- читает значения сразу по "'Лист'!A1:R" (values.batchGet), без
+  open_by_key и поиска листа, каждый из которых стоил отдельного запроса
+  метаданных на каждое чтение.
+
+Сетка бывает больше данных (отформатированные пустые строки внизу листа):
+такие строки приходят пустыми строками и отбрасываются векторно до
+очистки (drop_blank_rows).
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from gspread.utils import absolute_range_name, column_letter_to_index, rowcol_to_a1
+
+from src.sheets import parse_a1_range
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+GRID_FIELDS = 'sheets.properties(sheetId,title,gridProperties(rowCount,columnCount))'
+
+
+@dataclass(frozen=True)
+class SheetGrid:
+    """Лист таблицы и размер его сетки."""
+    sheet_id: int
+    title: str
+    row_count: int
+    column_count: int
+
+
+@dataclass(frozen=True)
+class FetchRequest:
+    """Диапазон одного листа для чтения."""
+    sheet_identifier: str
+    range_str: Optional[str] = None
+    use_gid: bool = False
+
+
+def drop_blank_rows(df: pd.DataFrame, keep_columns: Sequence[str] = ('source_row_id',)) -> pd.DataFrame:
+    """Убирает строки, в которых все колонки данных пустые (None или пробелы)."""
+    data_columns = [c for c in df.columns if c not in keep_columns]
+    if df.empty or not data_columns:
+        return df
+    values = df[data_columns].astype('string').apply(lambda col: col.str.strip())
+    blank = (values.isna() | values.eq('')).all(axis=1)
+    if blank.any():
+        return df[~blank.to_numpy()].reset_index(drop=True)
+    return df
+
+
+def clamp_range(grid: SheetGrid, range_str: Optional[str]) -> Optional[str]:
+    """
+    Диапазон листа, суженный до сетки (с именем листа).
+
+    None - диапазон целиком за пределами сетки, читать нечего.
+    Нестандартные диапазоны (именованные и т.п.) передаются как есть.
+    """
+    if not range_str:
+        return absolute_range_name(grid.title, f"A1:{rowcol_to_a1(grid.row_count, grid.column_count)}")
+    try:
+        start_col, start_row, end_col, end_row = parse_a1_range(range_str)
+    except ValueError:
+        return absolute_range_name(grid.title, range_str)
+
+    last_row = min(end_row or grid.row_count, grid.row_count)
+    last_col = min(column_letter_to_index(end_col), grid.column_count)
+    if start_row > last_row or column_letter_to_index(start_col) > last_col:
+        return None
+    return absolute_range_name(grid.title, f"{start_col}{start_row}:{rowcol_to_a1(last_row, last_col)}")
+
+
+class FetchPlanner:
+    """Метаданные сетки таблиц и чтение суженных диапазонов."""
+
+    def __init__(self, gc):
+        self.gc = gc
+        self._grids: Dict[str, Tuple[SheetGrid, ...]] = {}
+
+    def load(self, spreadsheet_ids: Iterable[str]) -> None:
+        """Перечитывает метаданные таблиц: один запрос на таблицу."""
+        for spreadsheet_id in dict.fromkeys(spreadsheet_ids):
+            metadata = self.gc.http_client.fetch_sheet_metadata(spreadsheet_id, params={'fields': GRID_FIELDS})
+            self._grids[spreadsheet_id] = tuple(
+                SheetGrid(
+                    p['sheetId'], p['title'],
+                    p.get('gridProperties', {}).get('rowCount', 0),
+                    p.get('gridProperties', {}).get('columnCount', 0),
+                )
+                for p in (s['properties'] for s in metadata.get('sheets', []))
+            )
+            logger.debug(f"🗺️ {spreadsheet_id}: сетка {len(self._grids[spreadsheet_id])} листов")
+
+    def grids(self, spreadsheet_id: str) -> Tuple[SheetGrid, ...]:
+        if spreadsheet_id not in self._grids:
+            self.load([spreadsheet_id])
+        return self._grids[spreadsheet_id]
+
+    def grid(self, spreadsheet_id: str, sheet_identifier: str, use_gid: bool = False) -> SheetGrid:
+        for grid in self.grids(spreadsheet_id):
+            if (grid.sheet_id == int(sheet_identifier)) if use_gid else (grid.title == sheet_identifier):
+                return grid
+        kind = 'gid' if use_gid else 'название'
+        raise ValueError(f"Лист ({kind}={sheet_identifier}) не найден в таблице {spreadsheet_id}")
+
+    def read_batch(self, spreadsheet_id: str, requests: Sequence[FetchRequest]) -> List[List[List[str]]]:
+        """
+        Читает диапазоны листов одной таблицы одним запросом values.batchGet.
+
+        Возвращает значения (список строк) для каждого запроса в том же
+        порядке; диапазон за пределами сетки дает пустой список.
+        """
+        ranges = [
+            clamp_range(self.grid(spreadsheet_id, r.sheet_identifier, r.use_gid), r.range_str)
+            for r in requests
+        ]
+        to_read = [r for r in ranges if r is not None]
+        if not to_read:
+            return [[] for _ in requests]
+
+        response = self.gc.http_client.values_batch_get(spreadsheet_id, to_read)
+        values = iter(vr.get('values', []) for vr in response.get('valueRanges', []))
+        return [next(values, []) if r is not None else [] for r in ranges]
+
+    def read(self, spreadsheet_id: str, sheet_identifier: str, range_str: Optional[str] = None,
+             use_gid: bool = False) -> List[List[str]]:
+        return self.read_batch(spreadsheet_id, [FetchRequest(sheet_identifier, range_str, use_gid)])[0]
+
+    def read_ranges(self, spreadsheet_id: str, sheet_identifier: str, ranges: Sequence[str],
+                    use_gid: bool = False) -> List[List[List[str]]]:
+        return self.read_batch(spreadsheet_id, [FetchRequest(sheet_identifier, r, use_gid) for r in ranges])
@@ -0,0 +1,253 @@
+"""
+Очередь задач ETL в Postgres (etl.jobs, миграция 07).
+
+Каждый источник — отдельная задача. Воркеры (main.py --worker, на одном
+или нескольких хостах) забирают задачи через FOR UPDATE SKIP LOCKED, так
+что одну задачу никогда не получат двое, а ожидающие воркеры не блокируют
+друг друга.
+
+- Аренда (visibility timeout): забранная задача принадлежит воркеру до
+  locked_until; воркер продлевает аренду, пока работает. Если воркер
+  умер, после истечения аренды задачу заберет другой.
+- Повторы: упавшая задача возвращается в очередь с экспоненциальной
+  задержкой, после max_attempts попыток — failed.
+- Справедливость: на одну таблицу Google одновременно выполняется не
+  больше max_per_spreadsheet задач (квота Sheets и блокировки одной
+  студии не занимают всех воркеров).
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from src.core.constants import (
+    JOB_MAX_ATTEMPTS,
+    JOB_MAX_RUNNING_PER_SPREADSHEET,
+    JOB_RETRY_BASE_SECONDS,
+    JOB_VISIBILITY_TIMEOUT_SECONDS,
+)
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# Сколько раз перевыбирать кандидата, если лимит таблицы заняли параллельно
+CLAIM_ATTEMPTS = 3
+
+ENQUEUE_SQL = """
+    INSERT INTO etl.jobs (pipeline, source_name, target_table, spreadsheet_id, max_attempts)
+    SELECT :pipeline, u.source_name, u.target_table, u.spreadsheet_id, :max_attempts
+    FROM unnest(
+        CAST(:source_names AS text[]), CAST(:target_tables AS text[]), CAST(:spreadsheet_ids AS text[])
+    ) AS u(source_name, target_table, spreadsheet_id)
+    ON CONFLICT (source_name) WHERE status IN ('queued', 'running') DO NOTHING
+    RETURNING job_id
+"""
+
+# Истекшая аренда без оставшихся попыток: воркер умирал на задаче max_attempts раз
+EXPIRE_SQL = """
+    UPDATE etl.jobs
+    SET status = 'failed', locked_by = NULL, locked_until = NULL, finished_at = NOW(),
+        error = COALESCE(error || '; ', '') || 'аренда истекла: ' || locked_by
+    WHERE status = 'running' AND locked_until < NOW() AND attempts >= max_attempts
+"""
+
+CANDIDATE_SQL = """
+    SELECT j.job_id, j.spreadsheet_id
+    FROM etl.jobs j
+    WHERE j.pipeline = ANY(CAST(:pipelines AS text[]))
+      AND (
+          (j.status = 'queued' AND j.available_at <= NOW())
+          OR (j.status = 'running' AND j.locked_until < NOW() AND j.attempts < j.max_attempts)
+      )
+      AND (
+          SELECT COUNT(*) FROM etl.jobs r
+          WHERE r.spreadsheet_id = j.spreadsheet_id
+            AND r.status = 'running' AND r.locked_until >= NOW()
+      ) < :max_per_spreadsheet
+    ORDER BY j.available_at, j.job_id
+    LIMIT 1
+    FOR UPDATE OF j SKIP LOCKED
+"""
+
+RUNNING_FOR_SPREADSHEET_SQL = """
+    SELECT COUNT(*) FROM etl.jobs
+    WHERE spreadsheet_id = :spreadsheet_id
+      AND status = 'running' AND locked_until >= NOW()
+      AND job_id <> :job_id
+"""
+
+CLAIM_SQL = """
+    UPDATE etl.jobs
+    SET status = 'running', attempts = attempts + 1, locked_by = :worker_id,
+        locked_until = NOW() + make_interval(secs => :visibility), started_at = NOW()
+    WHERE job_id = :job_id
+    RETURNING job_id, pipeline, source_name, target_table, spreadsheet_id, attempts, max_attempts
+"""
+
+EXTEND_SQL = """
+    UPDATE etl.jobs
+    SET locked_until = NOW() + make_interval(secs => :visibility)
+    WHERE job_id = :job_id AND locked_by = :worker_id AND status = 'running'
+    RETURNING job_id
+"""
+
+COMPLETE_SQL = """
+    UPDATE etl.jobs
+    SET status = 'done', rows_loaded = :rows_loaded, error = NULL,
+        locked_until = NULL, finished_at = NOW()
+    WHERE job_id = :job_id AND locked_by = :worker_id AND status = 'running'
+    RETURNING job_id
+"""
+
+FAIL_SQL = """
+    UPDATE etl.jobs
+    SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+        available_at = NOW() + make_interval(secs => :retry_base * power(2, attempts - 1)),
+        finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+        error = :error, locked_by = NULL, locked_until = NULL
+    WHERE job_id = :job_id AND locked_by = :worker_id AND status = 'running'
+    RETURNING status
+"""
+
+STATS_SQL = "SELECT status, COUNT(*) FROM etl.jobs GROUP BY status"
+
+
+@dataclass
+class Job:
+    """Задача: загрузить один источник."""
+    job_id: int
+    pipeline: str
+    source_name: str
+    target_table: str
+    spreadsheet_id: str
+    attempts: int
+    max_attempts: int
+
+
+@dataclass
+class JobSource:
+    """Источник, который ставится в очередь."""
+    source_name: str
+    target_table: str
+    spreadsheet_id: str
+
+
+class JobQueue:
+    """Очередь etl.jobs от имени одного воркера."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        worker_id: str,
+        visibility_seconds: float = JOB_VISIBILITY_TIMEOUT_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        max_per_spreadsheet: int = JOB_MAX_RUNNING_PER_SPREADSHEET,
+        retry_base_seconds: float = JOB_RETRY_BASE_SECONDS,
+    ):
+        self.engine = engine
+        self.worker_id = worker_id
+        self.visibility_seconds = visibility_seconds
+        self.max_attempts = max_attempts
+        self.max_per_spreadsheet = max_per_spreadsheet
+        self.retry_base_seconds = retry_base_seconds
+
+    def enqueue(self, pipeline: str, sources: Iterable[JobSource]) -> int:
+        """
+        Ставит источники в очередь и возвращает число новых задач.
+
+        Источник, у которого уже есть незавершенная задача, пропускается.
+        """
+        sources = list(sources)
+        if not sources:
+            return 0
+        with self.engine.begin() as conn:
+            rows = conn.execute(text(ENQUEUE_SQL), {
+                'pipeline': pipeline,
+                'max_attempts': self.max_attempts,
+                'source_names': [s.source_name for s in sources],
+                'target_tables': [s.target_table for s in sources],
+                'spreadsheet_ids': [s.spreadsheet_id for s in sources],
+            }).fetchall()
+        return len(rows)
+
+    def claim(self, pipelines: List[str]) -> Optional[Job]:
+        """
+        Забирает следующую доступную задачу указанных пайплайнов (None - задач нет).
+
+        Кандидат выбирается с SKIP LOCKED, затем под advisory-блокировкой
+        его таблицы Google лимит перепроверяется: два воркера, одновременно
+        выбравшие задачи одной таблицы, не превысят max_per_spreadsheet.
+        """
+        with self.engine.begin() as conn:
+            conn.execute(text(EXPIRE_SQL))
+
+        for _ in range(CLAIM_ATTEMPTS):
+            with self.engine.begin() as conn:
+                candidate = conn.execute(text(CANDIDATE_SQL), {
+                    'pipelines': pipelines,
+                    'max_per_spreadsheet': self.max_per_spreadsheet,
+                }).fetchone()
+                if candidate is None:
+                    return None
+                job_id, spreadsheet_id = candidate
+
+                conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+                             {'key': f"etl.jobs:{spreadsheet_id}"})
+                running = conn.execute(text(RUNNING_FOR_SPREADSHEET_SQL), {
+                    'spreadsheet_id': spreadsheet_id, 'job_id': job_id,
+                }).scalar()
+                if running < self.max_per_spreadsheet:
+                    row = conn.execute(text(CLAIM_SQL), {
+                        'job_id': job_id,
+                        'worker_id': self.worker_id,
+                        'visibility': self.visibility_seconds,
+                    }).fetchone()
+                    return Job(*row)
+            # Лимит таблицы заняли параллельно: транзакция закрыта, выбираем заново
+        return None
+
+    def extend(self, job: Job) -> bool:
+        """Продлевает аренду. False - аренда потеряна (задачу забрал другой воркер)."""
+        with self.engine.begin() as conn:
+            row = conn.execute(text(EXTEND_SQL), {
+                'job_id': job.job_id,
+                'worker_id': self.worker_id,
+                'visibility': self.visibility_seconds,
+            }).fetchone()
+        return row is not None
+
+    def complete(self, job: Job, rows_loaded: int) -> None:
+        with self.engine.begin() as conn:
+            row = conn.execute(text(COMPLETE_SQL), {
+                'job_id': job.job_id, 'worker_id': self.worker_id, 'rows_loaded': rows_loaded,
+            }).fetchone()
+        if row is None:
+            logger.warning(f"⚠️ Задача #{job.job_id} ({job.source_name}): аренда потеряна, результат не записан")
+
+    def fail(self, job: Job, error: str) -> Optional[str]:
+        """
+        Записывает ошибку: задача возвращается в очередь с задержкой или,
+        если попытки исчерпаны, становится failed. Возвращает новый статус.
+        """
+        with self.engine.begin() as conn:
+            row = conn.execute(text(FAIL_SQL), {
+                'job_id': job.job_id,
+                'worker_id': self.worker_id,
+                'retry_base': self.retry_base_seconds,
+                'error': error,
+            }).fetchone()
+        if row is None:
+            logger.warning(f"⚠️ Задача #{job.job_id} ({job.source_name}): аренда потеряна, ошибка не записана")
+            return None
+        return row[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Число задач по статусам."""
+        with self.engine.connect() as conn:
+            return dict(conn.execute(text(STATS_SQL)).fetchall())
@@ -0,0 +1,295 @@
+"""
+Скомпилированный манифест пайплайнов (src/sources.json).
+
+Каждый источник в sources.json декларативно описывает, куда и как он
+грузится: target_table, pipeline, mode, column_mapping, rename, cleaning
+и параметры чтения. Манифест один раз валидируется и компилируется в
+неизменяемый план (frozen dataclasses), который кешируется в памяти
+процесса и на диске (.cache/manifest.pickle), ключ — mtime и размер
+sources.json и config/column_mappings.json. Чтобы добавить источник,
+достаточно описать его в sources.json.
+"""
+import json
+import os
+import pickle
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from src.core.constants import MANIFEST_CACHE_DIR, WATERMARK_TAIL_ROWS
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Меняется при изменении структуры dataclass-ов ниже: старый кеш игнорируется
+MANIFEST_FORMAT_VERSION = 1
+
+SRC_DIR = Path(__file__).parent.parent
+SOURCES_PATH = SRC_DIR / 'sources.json'
+LEGACY_SOURCES_PATH = SRC_DIR.parent / 'secrets' / 'sources.json'
+COLUMN_MAPPINGS_PATH = SRC_DIR / 'config' / 'column_mappings.json'
+CACHE_PATH = SRC_DIR.parent / MANIFEST_CACHE_DIR / 'manifest.pickle'
+
+PIPELINES = ('current', 'historical', 'references')
+MODES = ('full', 'append_only')
+RENAMES = ('positional',)
+CLEANING_KEYS = ('date_columns', 'numeric_columns', 'boolean_columns', 'text_columns', 'skip_columns')
+
+_IDENTIFIER_RE = re.compile(r'^[a-z_][a-z0-9_]*$')
+_A1_RANGE_RE = re.compile(r'^[A-Z]+[0-9]*(:[A-Z]+[0-9]*)?$')
+
+
+class ManifestError(ValueError):
+    """Ошибки валидации sources.json (все сразу, по одной на строку)."""
+
+
+@dataclass(frozen=True)
+class CleaningPlan:
+    """Явные типы колонок; имеют приоритет над ключевыми словами data_cleaner."""
+    date_columns: FrozenSet[str] = frozenset()
+    numeric_columns: FrozenSet[str] = frozenset()
+    boolean_columns: FrozenSet[str] = frozenset()
+    text_columns: FrozenSet[str] = frozenset()
+    skip_columns: FrozenSet[str] = frozenset()
+
+
+@dataclass(frozen=True)
+class SourceSpec:
+    """Скомпилированное описание одного источника."""
+    name: str
+    spreadsheet_id: str
+    use_gid: bool
+    sheet_identifiers: Tuple[str, ...]
+    ranges: Tuple[Tuple[str, str], ...]
+    mode: str = 'full'
+    tail_rows: int = WATERMARK_TAIL_ROWS
+    target_table: Optional[str] = None
+    pipeline: Optional[str] = None
+    column_mapping: Tuple[Tuple[str, str], ...] = ()
+    rename: Optional[str] = None
+    cleaning: CleaningPlan = field(default_factory=CleaningPlan)
+    interval_minutes: Optional[float] = None
+    hint: str = ''
+
+    def fetch_options(self) -> Dict[str, Any]:
+        """Параметры чтения в формате словаря источника (config['SOURCES'])."""
+        options = {
+            'spreadsheet_id': self.spreadsheet_id,
+            'use_gid': self.use_gid,
+            'sheet_identifiers': list(self.sheet_identifiers),
+            'ranges': dict(self.ranges),
+            'mode': self.mode,
+            'tail_rows': self.tail_rows,
+            '_hint': self.hint,
+        }
+        if self.interval_minutes is not None:
+            options['interval_minutes'] = self.interval_minutes
+        return options
+
+
+@dataclass(frozen=True)
+class Manifest:
+    """Неизменяемый план всех источников."""
+    sources: Tuple[SourceSpec, ...]
+
+    def get(self, name: str) -> Optional[SourceSpec]:
+        return next((s for s in self.sources if s.name == name), None)
+
+    def for_pipeline(self, pipeline: str) -> Tuple[SourceSpec, ...]:
+        return tuple(s for s in self.sources if s.pipeline == pipeline)
+
+    def source_mapping(self, pipeline: str) -> Dict[str, str]:
+        """source_name -> target_table для пайплайна."""
+        return {s.name: s.target_table for s in self.for_pipeline(pipeline)}
+
+    def column_mappings(self, pipeline: str) -> Dict[str, Dict[str, str]]:
+        """target_table -> маппинг колонок для пайплайна."""
+        return {
+            s.target_table: dict(s.column_mapping)
+            for s in self.for_pipeline(pipeline) if s.column_mapping
+        }
+
+    def fetch_options(self) -> Dict[str, Dict[str, Any]]:
+        return {s.name: s.fetch_options() for s in self.sources}
+
+
+def _compile_source(name: str, raw: Dict[str, Any], extra_mapping: Dict[str, str], errors: List[str]) -> Optional[SourceSpec]:
+    def error(message: str) -> None:
+        errors.append(f"{name}: {message}")
+
+    spreadsheet_id = raw.get('spreadsheet_id')
+    if not isinstance(spreadsheet_id, str) or not spreadsheet_id:
+        error("spreadsheet_id должен быть непустой строкой")
+
+    sheet_identifiers = raw.get('sheet_identifiers', [])
+    if not isinstance(sheet_identifiers, list) or not sheet_identifiers:
+        error("sheet_identifiers должен быть непустым списком")
+        sheet_identifiers = []
+    sheet_identifiers = [str(s) for s in sheet_identifiers]
+
+    ranges = raw.get('ranges', {})
+    if not isinstance(ranges, dict):
+        error("ranges должен быть объектом {лист: диапазон}")
+        ranges = {}
+    for sheet_id, range_str in ranges.items():
+        if sheet_id not in sheet_identifiers:
+            error(f"диапазон для неизвестного листа {sheet_id}")
+        if not isinstance(range_str, str) or not _A1_RANGE_RE.match(range_str):
+            error(f"некорректный A1-диапазон {range_str!r}")
+
+    mode = raw.get('mode', 'full')
+    if mode not in MODES:
+        error(f"mode должен быть одним из {MODES}")
+
+    tail_rows = raw.get('tail_rows', WATERMARK_TAIL_ROWS)
+    if not isinstance(tail_rows, int) or tail_rows < 0:
+        error("tail_rows должен быть неотрицательным целым")
+
+    pipeline = raw.get('pipeline')
+    target_table = raw.get('target_table')
+    if pipeline is not None and pipeline not in PIPELINES:
+        error(f"pipeline должен быть одним из {PIPELINES}")
+    if pipeline is not None and target_table is None:
+        error("для источника с pipeline нужен target_table")
+    if target_table is not None and (not isinstance(target_table, str) or not _IDENTIFIER_RE.match(target_table)):
+        error(f"некорректное имя таблицы {target_table!r}")
+
+    column_mapping = dict(extra_mapping)
+    column_mapping.update(raw.get('column_mapping', {}))
+    if not all(isinstance(k, str) and isinstance(v, str) for k, v in column_mapping.items()):
+        error("column_mapping должен быть объектом {колонка листа: колонка таблицы}")
+
+    rename = raw.get('rename')
+    if rename is not None and rename not in RENAMES:
+        error(f"rename должен быть одним из {RENAMES}")
+
+    cleaning_raw = raw.get('cleaning', {})
+    unknown = set(cleaning_raw) - set(CLEANING_KEYS)
+    if unknown:
+        error(f"неизвестные ключи cleaning: {', '.join(sorted(unknown))}")
+    cleaning = CleaningPlan(**{
+        key: frozenset(cleaning_raw.get(key, [])) for key in CLEANING_KEYS
+    })
+
+    interval_minutes = raw.get('interval_minutes')
+    if interval_minutes is not None and (not isinstance(interval_minutes, (int, float)) or interval_minutes <= 0):
+        error("interval_minutes должен быть положительным числом")
+
+    if errors:
+        return None
+    return SourceSpec(
+        name=name,
+        spreadsheet_id=spreadsheet_id,
+        use_gid=bool(raw.get('use_gid', False)),
+        sheet_identifiers=tuple(sheet_identifiers),
+        ranges=tuple(sorted(ranges.items())),
+        mode=mode,
+        tail_rows=tail_rows,
+        target_table=target_table,
+        pipeline=pipeline,
+        column_mapping=tuple(sorted(column_mapping.items())),
+        rename=rename,
+        cleaning=cleaning,
+        interval_minutes=float(interval_minutes) if interval_minutes is not None else None,
+        hint=raw.get('_hint', ''),
+    )
+
+
+def compile_manifest(sources_data: Dict[str, Any], column_mappings: Dict[str, Dict[str, str]]) -> Manifest:
+    """
+    Валидирует sources.json и компилирует его в Manifest.
+
+    Raises:
+        ManifestError: Список всех найденных ошибок
+    """
+    errors: List[str] = []
+    specs = []
+    for name, raw in sources_data.items():
+        # Ключи с '_' - комментарии
+        if name.startswith('_') or not isinstance(raw, dict):
+            continue
+        source_errors: List[str] = []
+        spec = _compile_source(name, raw, column_mappings.get(raw.get('target_table'), {}), source_errors)
+        errors.extend(source_errors)
+        if spec is not None:
+            specs.append(spec)
+
+    seen: Dict[Tuple[str, str], str] = {}
+    for spec in specs:
+        if spec.pipeline is None:
+            continue
+        key = (spec.pipeline, spec.target_table)
+        if key in seen:
+            errors.append(f"{spec.name}: таблица {spec.target_table} уже загружается из {seen[key]}")
+        seen[key] = spec.name
+
+    if errors:
+        raise ManifestError("Ошибки в sources.json:\n  " + "\n  ".join(errors))
+    return Manifest(tuple(specs))
+
+
+def _input_paths() -> List[Path]:
+    sources_path = SOURCES_PATH if SOURCES_PATH.exists() else LEGACY_SOURCES_PATH
+    return [sources_path, COLUMN_MAPPINGS_PATH]
+
+
+def _cache_key(paths: List[Path]) -> Tuple:
+    key: List[Any] = [MANIFEST_FORMAT_VERSION]
+    for path in paths:
+        if path.exists():
+            stat = path.stat()
+            key.append((str(path), stat.st_mtime_ns, stat.st_size))
+        else:
+            key.append((str(path), None, None))
+    return tuple(key)
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+_manifest: Optional[Manifest] = None
+_manifest_key: Optional[Tuple] = None
+
+
+def load_manifest() -> Manifest:
+    """
+    Возвращает скомпилированный манифест.
+
+    Порядок: кеш процесса -> дисковый кеш с тем же ключом -> компиляция
+    sources.json (с записью дискового кеша).
+    """
+    global _manifest, _manifest_key
+
+    paths = _input_paths()
+    key = _cache_key(paths)
+    if _manifest is not None and _manifest_key == key:
+        return _manifest
+
+    manifest = None
+    if CACHE_PATH.exists():
+        try:
+            with open(CACHE_PATH, 'rb') as f:
+                cached_key, cached_manifest = pickle.load(f)
+            if cached_key == key:
+                manifest = cached_manifest
+        except Exception as e:
+            logger.debug(f"Кеш манифеста не прочитан, компилируем заново: {e}")
+
+    if manifest is None:
+        manifest = compile_manifest(_read_json(paths[0]), _read_json(paths[1]))
+        try:
+            CACHE_PATH.parent.mkdir(exist_ok=True)
+            tmp_path = CACHE_PATH.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((key, manifest), f)
+            os.replace(tmp_path, CACHE_PATH)
+        except OSError as e:
+            logger.debug(f"Кеш манифеста не записан: {e}")
+
+    _manifest, _manifest_key = manifest, key
+    return manifest
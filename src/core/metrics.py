@@ -0,0 +1,273 @@
+"""
+Метрики ETL: счетчики, gauge и гистограммы в одном реестре на процесс.
+
+Что считается:
+- etl_rows_{fetched,cleaned,inserted,spooled}_total {source} - строки по источникам;
+- etl_stage_duration_seconds {stage, source} - время стадий fetch / clean / load;
+- etl_last_success_timestamp_seconds и etl_table_freshness_seconds {table} -
+  момент последней успешной загрузки таблицы и время, прошедшее с него;
+- etl_sheets_* - запросы к Google Sheets API, 429 и ожидание квоты (из ограничителя);
+- etl_db_round_trips_total - обращения к БД через SQLAlchemy (RoundTripCounter).
+
+Куда попадают:
+- render() - текстовый формат Prometheus: HTTP /metrics в режиме --daemon
+  (serve_metrics) и файл ETL_METRICS_FILE (textfile collector node_exporter);
+- write_run() - etl.metrics (миграция 09): прирост метрик за запуск пайплайна.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.core.constants import METRICS_HTTP_HOST, METRICS_LATENCY_BUCKETS
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+# Имя -> (тип, описание). Порядок - порядок вывода в render()
+METRICS = {
+    'etl_rows_fetched_total': (COUNTER, 'Строк прочитано из Google Sheets'),
+    'etl_rows_cleaned_total': (COUNTER, 'Строк очищено и захешировано'),
+    'etl_rows_inserted_total': (COUNTER, 'Новых строк записано в staging'),
+    'etl_rows_spooled_total': (COUNTER, 'Строк отложено в локальный спул'),
+    'etl_stage_duration_seconds': (HISTOGRAM, 'Время стадии (fetch, clean, load) по источнику'),
+    'etl_last_success_timestamp_seconds': (GAUGE, 'Unix-время последней успешной загрузки таблицы'),
+    'etl_table_freshness_seconds': (GAUGE, 'Секунд с последней успешной загрузки таблицы'),
+    'etl_sheets_requests_total': (COUNTER, 'Запросов к Google Sheets API, включая повторы'),
+    'etl_sheets_throttled_total': (COUNTER, 'Ответов Google Sheets API 429'),
+    'etl_sheets_retries_total': (COUNTER, 'Повторов запросов к Google Sheets API'),
+    'etl_sheets_quota_wait_seconds_total': (COUNTER, 'Ожидание квоты Google Sheets API'),
+    'etl_db_round_trips_total': (COUNTER, 'Обращений к БД через SQLAlchemy'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Labels, float]
+
+# unnest в списке SELECT - выражение работает и во встроенном DuckDB (src/etl/storage.py)
+INSERT_METRICS_SQL = """
+    INSERT INTO etl.metrics (run_id, pipeline, metric, labels, value)
+    SELECT :run_id, :pipeline, metric, CAST(labels AS jsonb), value
+    FROM (
+        SELECT unnest(CAST(:metrics AS text[])) AS metric,
+               unnest(CAST(:labels AS text[])) AS labels,
+               unnest(CAST(:values AS double precision[])) AS value
+    ) AS t
+"""
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _base_name(name: str) -> str:
+    """Имя метрики для отсчета гистограммы (..._bucket / _sum / _count)."""
+    if name in METRICS:
+        return name
+    return name.rsplit('_', 1)[0]
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        f'{k}="' + v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for k, v in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class MetricsRegistry:
+    """Потокобезопасный реестр метрик процесса."""
+
+    def __init__(self, buckets: Tuple[float, ...] = METRICS_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, Labels], float] = {}
+        # (name, labels) -> [счетчики по корзинам и +Inf..., сумма, количество]
+        self._histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._engines: Dict[int, object] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._values[(name, _labels(labels))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.setdefault(key, [0.0] * (len(self.buckets) + 3))
+            histogram[bisect_left(self.buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def collector(self, func: Callable[[], Iterable[Sample]]) -> None:
+        """Регистрирует источник отсчетов, которые считаются в другом месте."""
+        self._collectors.append(func)
+
+    def watch_engine(self, engine) -> None:
+        """Считает round trips engine в etl_db_round_trips_total (один раз на engine)."""
+        from src.db import RoundTripCounter
+
+        with self._lock:
+            if id(engine) in self._engines:
+                return
+            counter = RoundTripCounter(engine).__enter__()
+            self._engines[id(engine)] = counter
+        self.collector(lambda: [('etl_db_round_trips_total', (), counter.count)])
+
+    def samples(self) -> List[Sample]:
+        """Все отсчеты в формате Prometheus (гистограммы - _bucket/_sum/_count)."""
+        now = time.time()
+        with self._lock:
+            samples = [(name, labels, value) for (name, labels), value in self._values.items()]
+            histograms = [(key, list(h)) for key, h in self._histograms.items()]
+
+        for (name, labels), histogram in histograms:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float('inf'),), histogram):
+                cumulative += count
+                samples.append((f"{name}_bucket", labels + (('le', _format_value(bound)),), cumulative))
+            samples.append((f"{name}_sum", labels, histogram[-2]))
+            samples.append((f"{name}_count", labels, histogram[-1]))
+
+        samples.extend(
+            ('etl_table_freshness_seconds', labels, now - value)
+            for name, labels, value in list(samples) if name == 'etl_last_success_timestamp_seconds'
+        )
+        for func in self._collectors:
+            samples.extend(func())
+        return samples
+
+    def snapshot(self) -> Dict[Tuple[str, Labels], float]:
+        return {(name, labels): value for name, labels, value in self.samples()}
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus (exposition format 0.0.4)."""
+        by_metric: Dict[str, List[Sample]] = {}
+        for sample in self.samples():
+            by_metric.setdefault(_base_name(sample[0]), []).append(sample)
+
+        lines = []
+        for metric, (kind, help_text) in METRICS.items():
+            if metric not in by_metric:
+                continue
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, labels, value in by_metric[metric]:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def run_samples(self, since: Dict[Tuple[str, Labels], float]) -> List[Sample]:
+        """
+        Отсчеты за запуск: прирост счетчиков и гистограмм (_sum/_count)
+        с момента снимка since и изменившиеся gauge.
+        """
+        samples = []
+        for name, labels, value in self.samples():
+            metric = _base_name(name)
+            kind = METRICS.get(metric, (COUNTER,))[0]
+            if name.endswith('_bucket') or metric == 'etl_table_freshness_seconds':
+                continue
+            if kind == GAUGE:
+                if since.get((name, labels)) != value:
+                    samples.append((name, labels, value))
+            elif value - since.get((name, labels), 0):
+                samples.append((name, labels, value - since.get((name, labels), 0)))
+        return samples
+
+    def write_run(self, engine, run_id: Optional[int], pipeline: str,
+                  since: Dict[Tuple[str, Labels], float]) -> int:
+        """Записывает отсчеты запуска в etl.metrics одним выражением. Возвращает число строк."""
+        from sqlalchemy import text
+
+        samples = self.run_samples(since)
+        if not samples:
+            return 0
+        with engine.begin() as conn:
+            conn.execute(text(INSERT_METRICS_SQL), {
+                'run_id': run_id,
+                'pipeline': pipeline,
+                'metrics': [name for name, _, _ in samples],
+                'labels': [json.dumps(dict(labels), ensure_ascii=False) for _, labels, _ in samples],
+                'values': [float(value) for _, _, value in samples],
+            })
+        return len(samples)
+
+    def write_file(self, path: str) -> None:
+        """Атомарно записывает render() в файл (textfile collector читает его в любой момент)."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+def _sheets_samples() -> List[Sample]:
+    from src.core.rate_limiter import get_sheets_rate_limiter
+
+    stats = get_sheets_rate_limiter().stats()
+    return [
+        ('etl_sheets_requests_total', (), stats['requests']),
+        ('etl_sheets_throttled_total', (), stats['throttled']),
+        ('etl_sheets_retries_total', (), stats['retries']),
+        ('etl_sheets_quota_wait_seconds_total', (), stats['wait_seconds']),
+    ]
+
+
+def serve_metrics(registry: 'MetricsRegistry', port: int, host: str = METRICS_HTTP_HOST) -> ThreadingHTTPServer:
+    """Запускает HTTP endpoint /metrics в фоновом потоке. Остановка: server.shutdown()."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"📊 Метрики: http://{host}:{server.server_port}/metrics")
+    return server
+
+
+# Общий реестр на процесс: метрики пайплайнов, ограничителя Sheets и БД
+_metrics: Optional[MetricsRegistry] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Возвращает реестр метрик процесса."""
+    global _metrics
+
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                registry = MetricsRegistry()
+                registry.collector(_sheets_samples)
+                _metrics = registry
+    return _metrics
@@ -0,0 +1,147 @@
+"""
+Dry-run планировщик загрузки (main.py --plan).
+
+Выполняет чтение, очистку и хеширование как обычный запуск, но вместо
+вставки сравнивает хеши со staging на стороне сервера (в READ ONLY
+транзакции) и печатает по каждой таблице: сколько строк будет вставлено,
+сколько уже есть, сколько существующих версий будет вытеснено, и оценку
+объема загрузки.
+
+Источником может быть снимок (--snapshot DIR) с сырыми кадрами
+<target_table>.parquet, сохраненный ранее через --save-snapshot DIR:
+так план можно считать в CI без обращений к Google Sheets.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+from sqlalchemy.engine import Engine
+
+from src.etl.storage import StorageBackend, backend_for
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class TablePlan:
+    """Ожидаемый результат загрузки одной таблицы."""
+    source_name: str
+    target_table: str
+    rows: int = 0
+    new: int = 0          # Будет вставлено (уникальных row_hash, которых нет в staging)
+    unchanged: int = 0    # Уже есть в staging
+    stale: int = 0        # Существующие версии тех же source_row_id, которые будут вытеснены
+    est_bytes: int = 0
+    error: Optional[str] = None
+
+
+class DiffPlanner:
+    """Сравнение подготовленных кадров со staging без записи."""
+
+    def __init__(self, engine: Engine, backend: Optional[StorageBackend] = None):
+        self.engine = engine
+        self.backend = backend or backend_for(engine)
+
+    def plan_table(self, df: pd.DataFrame, target_table: str, source_name: str) -> TablePlan:
+        plan = TablePlan(source_name, target_table, rows=len(df))
+        hashes = df['row_hash'].tolist()
+        if 'source_row_id' in df.columns:
+            row_ids = [int(v) if pd.notna(v) else None for v in df['source_row_id']]
+        else:
+            row_ids = [None] * len(df)
+
+        with self.engine.connect() as conn:
+            self.backend.begin_read_only(conn)
+            if not self.backend.table_exists(conn, target_table):
+                plan.new = df['row_hash'].nunique()
+                table_bytes, table_rows = 0, 0
+            else:
+                plan.new, plan.unchanged, plan.stale = self.backend.diff_hashes(conn, target_table, hashes, row_ids)
+                table_bytes, table_rows = self.backend.table_size(conn, target_table)
+            conn.rollback()
+
+        if table_bytes and table_rows:
+            row_width = float(table_bytes) / float(table_rows)
+        else:
+            # Пустая таблица или размер неизвестен (DuckDB): оцениваем по размеру кадра в памяти
+            row_width = df.memory_usage(deep=True, index=False).sum() / max(len(df), 1)
+        plan.est_bytes = int(plan.new * row_width)
+        return plan
+
+
+def save_snapshot(df: pd.DataFrame, directory: Path, target_table: str) -> None:
+    """Сохраняет сырой (до очистки) кадр источника для последующих планов."""
+    from src.etl.spool import to_arrow_safe
+
+    directory.mkdir(parents=True, exist_ok=True)
+    to_arrow_safe(df).to_parquet(directory / f"{target_table}.parquet", index=False)
+
+
+def load_snapshot(directory: Path, target_table: str) -> Optional[pd.DataFrame]:
+    path = directory / f"{target_table}.parquet"
+    if not path.exists():
+        logger.warning(f"⚠️ В снимке нет {path.name}, таблица пропущена")
+        return None
+    return pd.read_parquet(path)
+
+
+def format_plan(plans: List[TablePlan]) -> str:
+    from src.utils.compact_staging import format_bytes
+
+    lines = [f"{'Таблица':<16}{'строк':>10}{'новых':>10}{'без изм.':>10}{'вытеснит':>10}{'объем':>12}"]
+    for p in plans:
+        if p.error:
+            lines.append(f"{p.target_table:<16}  ❌ {p.error}")
+            continue
+        lines.append(
+            f"{p.target_table:<16}{p.rows:>10}{p.new:>10}{p.unchanged:>10}{p.stale:>10}"
+            f"{'≈ ' + format_bytes(p.est_bytes):>12}"
+        )
+    ok = [p for p in plans if not p.error]
+    lines.append(
+        f"{'Итого':<16}{sum(p.rows for p in ok):>10}{sum(p.new for p in ok):>10}"
+        f"{sum(p.unchanged for p in ok):>10}{sum(p.stale for p in ok):>10}"
+        f"{'≈ ' + format_bytes(sum(p.est_bytes for p in ok)):>12}"
+    )
+    return '\n'.join(lines)
+
+
+def run_plan(scope: str, snapshot_dir: Optional[str] = None, save_snapshot_dir: Optional[str] = None) -> int:
+    """
+    Точка входа main.py --plan.
+
+    Returns:
+        Код выхода: 1, если хотя бы одну таблицу не удалось спланировать
+    """
+    from src.config import load_config
+    from src.db import get_db_engine
+    from src.pipelines.current_sync import CurrentSyncPipeline
+    from src.pipelines.historical_sync import HistoricalSyncPipeline
+
+    config = load_config()
+    if not config.get('SUPABASE_DB_URL'):
+        print("❌ Ошибка: Нет подключения к БД")
+        return 1
+
+    engine = get_db_engine(config)
+    pipelines = []
+    if scope in ('current', 'all'):
+        pipelines.append(CurrentSyncPipeline(config, engine))
+    if scope in ('historical', 'all'):
+        pipelines.append(HistoricalSyncPipeline(config, engine))
+
+    plans: List[TablePlan] = []
+    try:
+        for pipeline in pipelines:
+            plans.extend(pipeline.plan(
+                snapshot_dir=Path(snapshot_dir) if snapshot_dir else None,
+                save_snapshot_dir=Path(save_snapshot_dir) if save_snapshot_dir else None,
+            ))
+    finally:
+        engine.dispose()
+
+    print(f"\n📋 План загрузки (scope: {scope}, источник: {snapshot_dir or 'Google Sheets'})")
+    print(format_plan(plans))
+    return 1 if any(p.error for p in plans) else 0
@@ -0,0 +1,191 @@
+"""
+Ограничитель частоты запросов к Google Sheets API.
+
+Token bucket с адаптивной скоростью (AIMD): при 429 скорость снижается вдвое,
+после серии успешных запросов постепенно возвращается к квоте. Повторы при
+429/5xx выполняются с экспоненциальной задержкой и full jitter.
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Optional, TypeVar
+
+from src.core.constants import (
+    SHEETS_READS_PER_MINUTE,
+    SHEETS_QUOTA_SAFETY,
+    SHEETS_BURST_SIZE,
+    SHEETS_MIN_RATE_FRACTION,
+    SHEETS_MAX_RETRIES,
+    SHEETS_BACKOFF_BASE,
+    SHEETS_BACKOFF_MAX,
+)
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class RateLimiterStats:
+    """Метрики ограничителя (накопительные с момента создания)."""
+    requests: int = 0
+    throttled: int = 0          # Ответы 429
+    server_errors: int = 0      # Ответы 5xx / 408
+    retries: int = 0
+    failures: int = 0           # Запросы, упавшие после всех повторов
+    wait_seconds: float = 0.0   # Ожидание токенов
+    backoff_seconds: float = 0.0  # Ожидание между повторами
+    max_wait_seconds: float = 0.0
+    current_rate_per_minute: float = 0.0
+
+
+class RetryableError(Exception):
+    """Ошибка, после которой запрос можно повторить."""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket с адаптивной скоростью пополнения."""
+
+    def __init__(self, rate_per_minute: float, burst: int, min_rate_fraction: float = SHEETS_MIN_RATE_FRACTION):
+        self.max_rate = rate_per_minute / 60.0
+        self.min_rate = self.max_rate * min_rate_fraction
+        self.rate = self.max_rate
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def acquire(self) -> float:
+        """Забирает один токен, при необходимости ожидая. Возвращает время ожидания."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def on_throttled(self) -> None:
+        """Multiplicative decrease: квота превышена, снижаем скорость."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+
+    def on_success(self) -> None:
+        """Additive increase: плавно возвращаемся к максимальной скорости."""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class RateLimiter:
+    """Token bucket + повторы с экспоненциальной задержкой и jitter."""
+
+    def __init__(
+        self,
+        rate_per_minute: float = SHEETS_READS_PER_MINUTE * SHEETS_QUOTA_SAFETY,
+        burst: int = SHEETS_BURST_SIZE,
+        max_retries: int = SHEETS_MAX_RETRIES,
+        backoff_base: float = SHEETS_BACKOFF_BASE,
+        backoff_max: float = SHEETS_BACKOFF_MAX,
+    ):
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._stats = RateLimiterStats()
+        self._stats_lock = threading.Lock()
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full jitter: случайная задержка в [0, min(max, base * 2^attempt)]."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _record(self, **increments: float) -> None:
+        with self._stats_lock:
+            for key, value in increments.items():
+                setattr(self._stats, key, getattr(self._stats, key) + value)
+            if increments.get('wait_seconds', 0) > self._stats.max_wait_seconds:
+                self._stats.max_wait_seconds = increments['wait_seconds']
+
+    def call(self, func: Callable[[], T]) -> T:
+        """
+        Выполняет func с ограничением частоты и повторами.
+
+        func должна выбрасывать RetryableError для ответов 429/5xx;
+        остальные исключения пробрасываются без повторов.
+        """
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            self._record(requests=1, wait_seconds=waited)
+            try:
+                result = func()
+            except RetryableError as e:
+                if e.status_code == 429:
+                    self.bucket.on_throttled()
+                    self._record(throttled=1)
+                else:
+                    self._record(server_errors=1)
+
+                if attempt >= self.max_retries:
+                    self._record(failures=1)
+                    raise
+
+                delay = self._backoff_delay(attempt, e.retry_after)
+                logger.warning(
+                    f"⏳ Sheets API {e}: повтор {attempt + 1}/{self.max_retries} через {delay:.1f}с"
+                )
+                time.sleep(delay)
+                self._record(retries=1, backoff_seconds=delay)
+                attempt += 1
+                continue
+
+            self.bucket.on_success()
+            return result
+
+    def stats(self) -> Dict[str, float]:
+        """Снимок метрик ограничителя."""
+        with self._stats_lock:
+            snapshot = asdict(self._stats)
+        snapshot['current_rate_per_minute'] = round(self.bucket.rate * 60, 2)
+        return snapshot
+
+
+# Общий ограничитель на процесс: квота считается на пользователя, а не на клиента
+_sheets_limiter: Optional[RateLimiter] = None
+_sheets_limiter_lock = threading.Lock()
+
+
+def get_sheets_rate_limiter() -> RateLimiter:
+    """Возвращает общий ограничитель для всех вызовов Sheets API."""
+    global _sheets_limiter
+
+    if _sheets_limiter is None:
+        with _sheets_limiter_lock:
+            if _sheets_limiter is None:
+                _sheets_limiter = RateLimiter()
+    return _sheets_limiter
@@ -0,0 +1,192 @@
+"""
+Долгоживущий планировщик ETL (режим main.py --daemon).
+
+Держит прогретыми пул соединений с БД и клиент Google Sheets и запускает
+каждый источник по собственному интервалу. Если предыдущий запуск источника
+еще не завершился, очередной пропускается. Источники одного пайплайна
+выполняются по очереди: ETLPipeline хранит состояние запуска (run_id,
+last_errors, водяные знаки) и не рассчитан на параллельные run().
+Разрешение клиентов (scope clients и all) - отдельная периодическая задача.
+"""
+import asyncio
+import signal
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from src.core.constants import (
+    DAEMON_CLIENTS_INTERVAL_MINUTES,
+    DAEMON_CURRENT_INTERVAL_MINUTES,
+    DAEMON_HISTORICAL_INTERVAL_MINUTES,
+    DAEMON_TICK_SECONDS,
+)
+from src.logger import get_logger
+
+if TYPE_CHECKING:
+    # Тяжелые зависимости (pandas, gspread) нужны только при запуске пайплайнов
+    from src.core.etl_pipeline import ETLPipeline
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class SourceJob:
+    """Периодическая синхронизация одного источника."""
+    source_name: str
+    pipeline: 'ETLPipeline'
+    interval_seconds: float
+    running: bool = False
+    last_started: Optional[float] = None
+    runs: int = 0
+    skipped: int = 0
+
+    def is_due(self, now: float) -> bool:
+        return self.last_started is None or now - self.last_started >= self.interval_seconds
+
+
+class ETLScheduler:
+    """Asyncio-планировщик источников с индивидуальной периодичностью."""
+
+    def __init__(self, jobs: List[SourceJob], tick_seconds: float = DAEMON_TICK_SECONDS):
+        self.jobs = jobs
+        self.tick_seconds = tick_seconds
+        self._stop = asyncio.Event()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Один замок на экземпляр пайплайна: источники scope делят его состояние
+        self._pipeline_locks: Dict[int, asyncio.Lock] = {
+            id(job.pipeline): asyncio.Lock() for job in jobs
+        }
+
+    def stop(self) -> None:
+        logger.info("🛑 Остановка планировщика...")
+        self._stop.set()
+
+    async def run(self) -> None:
+        """Основной цикл: раз в tick проверяет, какие источники пора запускать."""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        for job in self.jobs:
+            logger.info(f"🗓️ {job.source_name}: каждые {job.interval_seconds / 60:.0f} мин")
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in self.jobs:
+                if not job.is_due(now):
+                    continue
+                if job.running:
+                    job.skipped += 1
+                    # Сдвигаем отсчет, чтобы не писать предупреждение на каждом тике
+                    job.last_started = now
+                    logger.warning(f"⏭️ {job.source_name}: предыдущий запуск еще идет, пропуск")
+                    continue
+                job.last_started = now
+                job.running = True
+                self._tasks[job.source_name] = asyncio.create_task(self._run_job(job))
+
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.tick_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+        # Дожидаемся текущих запусков, новые не начинаем
+        pending = [t for t in self._tasks.values() if not t.done()]
+        if pending:
+            logger.info(f"⏳ Ожидание {len(pending)} незавершенных запусков...")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _run_job(self, job: SourceJob) -> None:
+        started = time.monotonic()
+        try:
+            async with self._pipeline_locks[id(job.pipeline)]:
+                results = await asyncio.to_thread(job.pipeline.run, [job.source_name])
+                # Ошибки чтения листов и загрузки - результаты чтения в results не попадают
+                errors = list(job.pipeline.last_errors)
+            rows = sum(r.rows_loaded for r in results)
+            latency = time.monotonic() - started
+            if errors:
+                logger.error(f"❌ {job.source_name}: цикл за {latency:.1f}с с ошибками: {'; '.join(errors)}")
+            else:
+                logger.info(f"⏱️ {job.source_name}: цикл за {latency:.1f}с, загружено {rows} строк")
+        except Exception as e:
+            latency = time.monotonic() - started
+            logger.error(f"❌ {job.source_name}: цикл упал через {latency:.1f}с: {e}")
+        finally:
+            job.runs += 1
+            job.running = False
+
+
+def build_jobs(config: Dict, pipelines: Dict[str, 'ETLPipeline']) -> List[SourceJob]:
+    """
+    Создает задачи для всех источников переданных пайплайнов.
+
+    Интервал берется из interval_minutes источника в sources.json, иначе
+    значение по умолчанию для пайплайна (current - минуты, historical - сутки).
+    """
+    default_minutes = {
+        'current': DAEMON_CURRENT_INTERVAL_MINUTES,
+        'historical': DAEMON_HISTORICAL_INTERVAL_MINUTES,
+    }
+    sources = config.get('SOURCES', {})
+
+    jobs = []
+    for scope, pipeline in pipelines.items():
+        for source_name in pipeline.get_source_mapping():
+            if source_name not in sources:
+                continue
+            minutes = sources[source_name].get('interval_minutes', default_minutes[scope])
+            jobs.append(SourceJob(source_name, pipeline, float(minutes) * 60))
+    return jobs
+
+
+def run_daemon(scope: str = 'all') -> None:
+    """Точка входа режима --daemon."""
+    from src.config import load_config
+    from src.db import get_db_engine
+    from src.pipelines.clients_sync import ClientsSyncTask
+    from src.pipelines.current_sync import CurrentSyncPipeline
+    from src.pipelines.historical_sync import HistoricalSyncPipeline
+
+    config = load_config()
+    if not config.get('SUPABASE_DB_URL'):
+        print("❌ Ошибка: Нет подключения к БД")
+        return
+
+    # Один engine и по одному клиенту Sheets на весь срок жизни процесса
+    engine = get_db_engine(config)
+    pipelines: Dict[str, 'ETLPipeline'] = {}
+    if scope in ('current', 'all'):
+        pipelines['current'] = CurrentSyncPipeline(config, engine)
+    if scope in ('historical', 'all'):
+        pipelines['historical'] = HistoricalSyncPipeline(config, engine)
+    for pipeline in pipelines.values():
+        # Метрики демона - накопительные, отдаются по HTTP, а не пишутся в БД после каждого цикла
+        pipeline.write_metrics = False
+
+    jobs = build_jobs(config, pipelines)
+    if scope in ('clients', 'all'):
+        # Разрешение клиентов подхватывает новые строки staging по своим водяным знакам
+        jobs.append(SourceJob('clients', ClientsSyncTask(engine), DAEMON_CLIENTS_INTERVAL_MINUTES * 60.0))
+    if not jobs:
+        logger.warning("⚠️ Нет источников для планировщика")
+        return
+
+    server = None
+    if config.get('METRICS_PORT'):
+        from src.core.metrics import get_metrics, serve_metrics
+        try:
+            server = serve_metrics(get_metrics(), config['METRICS_PORT'])
+        except OSError as e:
+            logger.warning(f"⚠️ HTTP endpoint метрик не запущен: {e}")
+
+    logger.info(f"🚀 Запуск планировщика: {len(jobs)} источников")
+    try:
+        asyncio.run(ETLScheduler(jobs).run())
+    finally:
+        if server is not None:
+            server.shutdown()
+        engine.dispose()
@@ -1,6 +1,9 @@
 import pandas as pd
-from typing import Dict, List, Optional, Any
-from src.sheets import get_sheets_client, read_sheet_data
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+from src.sheets import get_sheets_client, parse_a1_range
+from src.core.constants import WATERMARK_TAIL_ROWS
+from src.core.fetch_planner import FetchPlanner, drop_blank_rows
+from src.core.watermarks import Watermark, WatermarkStore, build_watermark, hash_rows
 from src.utils.infer_schema import clean_column_name
 from src.logger import get_logger
 
@@ -9,8 +12,33 @@ logger = get_logger(__name__)
 class SheetsProcessor:
     """Обработчик данных из Google Sheets."""
     
-    def __init__(self, config: Dict):
-        self.gc = get_sheets_client(config)
+    def __init__(self, config: Dict, watermark_store: Optional[WatermarkStore] = None):
+        self.config = config
+        self._gc = None
+        self._planner: Optional[FetchPlanner] = None
+        self.watermark_store = watermark_store
+        # Водяные знаки, которые можно сохранить после успешной загрузки таблицы
+        self.pending_watermarks: Dict[str, List[Watermark]] = {}
+
+    @property
+    def gc(self):
+        """Клиент Sheets создается при первом чтении (для --plan --snapshot не нужен вовсе)."""
+        if self._gc is None:
+            self._gc = get_sheets_client(self.config)
+        return self._gc
+
+    @property
+    def planner(self) -> FetchPlanner:
+        if self._planner is None:
+            self._planner = FetchPlanner(self.gc)
+        return self._planner
+
+    def plan_fetches(self, source_configs: Iterable[Dict]) -> None:
+        """
+        Перечитывает сетку листов всех таблиц запуска (один запрос метаданных
+        на таблицу); чтения источников затем идут без запросов метаданных.
+        """
+        self.planner.load(c['spreadsheet_id'] for c in source_configs if c.get('spreadsheet_id'))
     
     def read_and_transform(
         self,
@@ -20,30 +48,55 @@ class SheetsProcessor:
     ) -> Optional[pd.DataFrame]:
         """
         Читает данные из Sheets и трансформирует их.
+
+        Для источников с "mode": "append_only" читаются только строки после
+        водяного знака (см. _read_sheet_append_only). Диапазоны сужаются до
+        сетки листа (FetchPlanner), полностью пустые строки отбрасываются.
         
         Returns:
-            DataFrame или None если нет данных
+            DataFrame (пустой - новых строк нет) или None, если не удалось
+            прочитать хотя бы один лист источника: частичный кадр сдвинул бы
+            source_row_id (и row_hash) строк следующих листов
         """
         spreadsheet_id = source_config.get('spreadsheet_id')
         sheet_identifiers = source_config.get('sheet_identifiers', [])
         ranges = source_config.get('ranges', {})
         use_gid = source_config.get('use_gid', False)
+        append_only = source_config.get('mode') == 'append_only' and self.watermark_store is not None
+        tail_rows = source_config.get('tail_rows', WATERMARK_TAIL_ROWS)
+        
+        self.pending_watermarks.pop(target_table, None)
         
         if not sheet_identifiers:
             logger.debug(f"⚠️ Нет листов для {target_table}")
             return None
         
-        # Собираем данные со всех листов
+        # Собираем данные со всех листов. source_row_id сквозной: строки
+        # листа нумеруются с 2 и сдвигаются на число строк данных предыдущих
+        # листов - одинаково при полном и инкрементальном чтении
         all_dfs = []
+        rows_offset = 0
         for sheet_id in sheet_identifiers:
-            df = self._read_sheet(
-                spreadsheet_id, sheet_id, ranges.get(sheet_id), use_gid
-            )
-            if df is not None:
-                all_dfs.append(df)
-        
-        if not all_dfs:
-            return None
+            if append_only:
+                df, sheet_rows = self._read_sheet_append_only(
+                    spreadsheet_id, sheet_id, ranges.get(sheet_id), use_gid,
+                    target_table, tail_rows
+                )
+            else:
+                df = self._read_sheet(
+                    spreadsheet_id, sheet_id, ranges.get(sheet_id), use_gid
+                )
+                sheet_rows = len(df) if df is not None else 0
+                if df is not None:
+                    df['source_row_id'] = range(2, len(df) + 2)
+            if df is None:
+                # Водяные знаки уже прочитанных листов не сохраняем: источник перечитается целиком
+                self.pending_watermarks.pop(target_table, None)
+                logger.error(f"❌ {target_table}: лист {sheet_id} не прочитан, источник пропущен")
+                return None
+            df['source_row_id'] += rows_offset
+            all_dfs.append(df)
+            rows_offset += sheet_rows
         
         # Объединяем
         result_df = pd.concat(all_dfs, ignore_index=True)
@@ -52,26 +105,134 @@ class SheetsProcessor:
         if column_mapping:
             result_df = result_df.rename(columns=column_mapping)
         
-        # Добавляем метаданные
-        result_df['source_row_id'] = range(2, len(result_df) + 2)
+        # После нумерации: пустые строки не сдвигают source_row_id остальных
+        rows_read = len(result_df)
+        result_df = drop_blank_rows(result_df)
+        if len(result_df) < rows_read:
+            logger.info(f"   🧹 {target_table}: отброшено пустых строк {rows_read - len(result_df)}")
         
         return result_df
+
+    def commit_watermarks(self, target_table: str) -> None:
+        """Сохраняет водяные знаки таблицы. Вызывать только после успешной загрузки."""
+        for watermark in self.pending_watermarks.pop(target_table, []):
+            try:
+                self.watermark_store.save(watermark)
+            except Exception as e:
+                logger.error(f"❌ Не удалось сохранить водяной знак {watermark.sheet_id}: {e}")
+
+    def _read_sheet_append_only(
+        self, spreadsheet_id: str, sheet_id: str, range_name: Optional[str],
+        use_gid: bool, target_table: str, tail_rows: int
+    ) -> Tuple[Optional[pd.DataFrame], int]:
+        """
+        Читает лист, который растет добавлением строк в конец.
+
+        Одним запросом batchGet забираются заголовок и строки начиная с
+        хвоста, покрытого водяным знаком. Если хеш хвоста не совпал
+        (строки выше водяного знака редактировались), выполняется полное
+        чтение. source_row_id совпадает с нумерацией полного чтения листа.
+
+        Returns:
+            (кадр новых строк или None при ошибке, всего строк данных в листе)
+        """
+        try:
+            start_col, header_row, end_col, end_row = parse_a1_range(range_name)
+        except ValueError:
+            start_col = end_row = None
+
+        if start_col is None or end_row is not None:
+            # Для закрытых или нестандартных диапазонов инкремент не имеет смысла
+            df = self._read_sheet(spreadsheet_id, sheet_id, range_name, use_gid)
+            if df is None:
+                return None, 0
+            df['source_row_id'] = range(2, len(df) + 2)
+            return df, len(df)
+
+        watermark = self.watermark_store.get(spreadsheet_id, sheet_id)
+        if watermark is None:
+            return self._read_sheet_full_with_watermark(
+                spreadsheet_id, sheet_id, range_name, use_gid, target_table, tail_rows
+            )
+
+        first_row = header_row + 1 + watermark.rows_processed - watermark.tail_size
+        header_range = f"{start_col}{header_row}:{end_col}{header_row}"
+        tail_range = f"{start_col}{first_row}:{end_col}"
+        try:
+            header_data, tail_data = self.planner.read_ranges(
+                spreadsheet_id, sheet_id, [header_range, tail_range], use_gid
+            )
+        except Exception as e:
+            logger.error(f"❌ Не удалось прочитать лист {sheet_id} ({spreadsheet_id}): {e}")
+            return None, 0
+
+        raw_headers = header_data[0] if header_data else []
+        tail = self._align_rows(tail_data, len(raw_headers))
+        known_tail = tail[:watermark.tail_size]
+
+        if len(known_tail) < watermark.tail_size or hash_rows(known_tail) != watermark.tail_hash:
+            logger.info(f"   🔁 {target_table}: строки выше водяного знака изменились, полное чтение")
+            return self._read_sheet_full_with_watermark(
+                spreadsheet_id, sheet_id, range_name, use_gid, target_table, tail_rows
+            )
+
+        new_rows = tail[watermark.tail_size:]
+        if not new_rows:
+            logger.info(f"   ✅ {target_table}: новых строк после {watermark.rows_processed} нет")
+            # Пустой кадр, а не None: None означает ошибку чтения
+            return self._build_frame(raw_headers, [], watermark.rows_processed), watermark.rows_processed
+
+        rows_before = watermark.rows_processed - watermark.tail_size
+        self.pending_watermarks.setdefault(target_table, []).append(
+            build_watermark(spreadsheet_id, sheet_id, tail, tail_rows, rows_before)
+        )
+        logger.info(f"   📥 {target_table}: {len(new_rows)} новых строк после {watermark.rows_processed}")
+        sheet_rows = rows_before + len(tail)
+        return self._build_frame(raw_headers, new_rows, watermark.rows_processed), sheet_rows
+
+    def _read_sheet_full_with_watermark(
+        self, spreadsheet_id: str, sheet_id: str, range_name: Optional[str],
+        use_gid: bool, target_table: str, tail_rows: int
+    ) -> Tuple[Optional[pd.DataFrame], int]:
+        """Полное чтение append-only листа с построением нового водяного знака."""
+        try:
+            data = self.planner.read(spreadsheet_id, sheet_id, range_name, use_gid)
+        except Exception as e:
+            logger.error(f"❌ Не удалось прочитать лист {sheet_id} ({spreadsheet_id}): {e}")
+            return None, 0
+
+        if len(data) < 2:
+            # Пустой лист или только заголовок: данных нет, но чтение успешно
+            return self._build_frame(data[0] if data else [], [], 0), 0
+
+        rows = self._align_rows(data[1:], len(data[0]))
+        self.pending_watermarks.setdefault(target_table, []).append(
+            build_watermark(spreadsheet_id, sheet_id, rows, tail_rows)
+        )
+        return self._build_frame(data[0], rows, 0), len(rows)
+
+    def _build_frame(self, raw_headers: List[Any], rows: List[List[Any]], rows_before: int) -> pd.DataFrame:
+        """DataFrame листа с source_row_id, как при полном чтении листа (строка данных i -> i + 2)."""
+        df = pd.DataFrame(rows, columns=self._normalize_headers(raw_headers))
+        df['source_row_id'] = range(rows_before + 2, rows_before + 2 + len(df))
+        return df
     
     def _read_sheet(
         self, spreadsheet_id: str, sheet_id: str,
         range_name: Optional[str], use_gid: bool
     ) -> Optional[pd.DataFrame]:
-        """Читает один лист и превращает в DataFrame."""
+        """Читает один лист и превращает в DataFrame (пустой - данных нет, None - ошибка чтения)."""
         try:
-            data = read_sheet_data(self.gc, spreadsheet_id, sheet_id, range_name, use_gid)
-            if not data or len(data) < 2:
-                return None
-            
+            data = self.planner.read(spreadsheet_id, sheet_id, range_name, use_gid)
+            if not data:
+                return pd.DataFrame()
+
             headers = self._normalize_headers(data[0])
             rows = self._align_rows(data[1:], len(headers))
             
             return pd.DataFrame(rows, columns=headers)
-        except Exception:
+        except Exception as e:
+            logger.error(f"❌ Не удалось прочитать лист {sheet_id} ({spreadsheet_id}): {e}")
             return None
     
     def _normalize_headers(self, headers: List[Any]) -> List[str]:
@@ -0,0 +1,107 @@
+"""
+Водяные знаки для append-only источников.
+
+Для каждого листа хранится число обработанных строк данных и хеш последних
+N строк. Если хвост совпадает, следующий запуск читает только строки после
+водяного знака; иначе (строки выше были изменены) — полное чтение.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class Watermark:
+    """Состояние append-only чтения одного листа."""
+    spreadsheet_id: str
+    sheet_id: str
+    rows_processed: int   # Строк данных (без заголовка), уже загруженных
+    tail_size: int        # Сколько последних строк покрывает tail_hash
+    tail_hash: str
+
+
+def hash_rows(rows: List[List[Any]]) -> str:
+    """Детерминированный MD5 набора строк (строки уже выровнены по ширине)."""
+    payload = json.dumps(rows, ensure_ascii=False, default=str)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def build_watermark(
+    spreadsheet_id: str,
+    sheet_id: str,
+    rows: List[List[Any]],
+    tail_rows: int,
+    rows_before: int = 0
+) -> Watermark:
+    """
+    Строит водяной знак по последним строкам данных листа.
+
+    Args:
+        rows: Строки данных, заканчивающиеся последней строкой листа
+        tail_rows: Сколько последних строк хешировать
+        rows_before: Сколько строк данных листа предшествует rows
+    """
+    tail = rows[-tail_rows:] if tail_rows else []
+    return Watermark(
+        spreadsheet_id=spreadsheet_id,
+        sheet_id=str(sheet_id),
+        rows_processed=rows_before + len(rows),
+        tail_size=len(tail),
+        tail_hash=hash_rows(tail),
+    )
+
+
+class WatermarkStore:
+    """Хранилище водяных знаков в таблице etl.sheet_watermarks."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def get(self, spreadsheet_id: str, sheet_id: str) -> Optional[Watermark]:
+        """Возвращает сохраненный водяной знак или None (тогда нужно полное чтение)."""
+        query = text("""
+            SELECT rows_processed, tail_size, tail_hash
+            FROM etl.sheet_watermarks
+            WHERE spreadsheet_id = :spreadsheet_id AND sheet_id = :sheet_id
+        """)
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(
+                    query, {'spreadsheet_id': spreadsheet_id, 'sheet_id': str(sheet_id)}
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось прочитать водяной знак {sheet_id}: {e}")
+            return None
+
+        if row is None:
+            return None
+        return Watermark(spreadsheet_id, str(sheet_id), row[0], row[1], row[2])
+
+    def save(self, watermark: Watermark) -> None:
+        """Сохраняет водяной знак (вызывается только после успешной загрузки)."""
+        query = text("""
+            INSERT INTO etl.sheet_watermarks
+                (spreadsheet_id, sheet_id, rows_processed, tail_size, tail_hash, updated_at)
+            VALUES (:spreadsheet_id, :sheet_id, :rows_processed, :tail_size, :tail_hash, NOW())
+            ON CONFLICT (spreadsheet_id, sheet_id) DO UPDATE SET
+                rows_processed = EXCLUDED.rows_processed,
+                tail_size = EXCLUDED.tail_size,
+                tail_hash = EXCLUDED.tail_hash,
+                updated_at = NOW()
+        """)
+        with self.engine.begin() as conn:
+            conn.execute(query, {
+                'spreadsheet_id': watermark.spreadsheet_id,
+                'sheet_id': watermark.sheet_id,
+                'rows_processed': watermark.rows_processed,
+                'tail_size': watermark.tail_size,
+                'tail_hash': watermark.tail_hash,
+            })
@@ -0,0 +1,191 @@
+"""
+Воркер очереди задач ETL (режимы main.py --enqueue и --worker).
+
+--enqueue ставит источники scope задачами в etl.jobs (например, по cron),
+--worker разбирает очередь: для каждой задачи запускает пайплайн источника
+(SheetsProcessor -> clean_dataframe -> DataLoader, как обычный запуск) и
+записывает результат. Воркеров может быть сколько угодно на любом числе
+хостов; --workers N запускает N процессов на этом хосте.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from typing import TYPE_CHECKING, Dict, List
+
+from src.core.constants import JOB_HEARTBEAT_SECONDS, JOB_POLL_SECONDS
+from src.core.job_queue import JOB_FAILED, Job, JobQueue, JobSource
+from src.logger import get_logger
+
+if TYPE_CHECKING:
+    from src.core.etl_pipeline import ETLPipeline
+
+logger = get_logger(__name__)
+
+QUEUE_PIPELINES = ('current', 'historical')
+
+
+def scope_pipelines(scope: str) -> List[str]:
+    return [p for p in QUEUE_PIPELINES if scope in (p, 'all')]
+
+
+class LeaseKeeper:
+    """Продлевает аренду задачи в фоновом потоке, пока идет ее обработка."""
+
+    def __init__(self, queue: JobQueue, job: Job, interval: float = JOB_HEARTBEAT_SECONDS):
+        self.queue = queue
+        self.job = job
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.extend(self.job):
+                    logger.warning(f"⚠️ Задача #{self.job.job_id} ({self.job.source_name}): аренда потеряна")
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ Задача #{self.job.job_id}: не удалось продлить аренду: {e}")
+
+
+class Worker:
+    """Цикл одного воркера: забрать задачу, выполнить, записать результат."""
+
+    def __init__(self, queue: JobQueue, pipelines: Dict[str, 'ETLPipeline'], poll_seconds: float = JOB_POLL_SECONDS):
+        self.queue = queue
+        self.pipelines = pipelines
+        self.poll_seconds = poll_seconds
+        self.processed = 0
+        self._stop = threading.Event()
+
+    def stop(self, *args) -> None:
+        logger.info("🛑 Остановка воркера после текущей задачи...")
+        self._stop.set()
+
+    def run(self, drain: bool = False) -> None:
+        """
+        Разбирает очередь до остановки (SIGINT/SIGTERM).
+
+        Args:
+            drain: Выйти, когда доступных задач не осталось
+        """
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(list(self.pipelines))
+            except Exception as e:
+                logger.error(f"❌ Очередь недоступна: {e}")
+                job = None
+            if job is None:
+                if drain:
+                    break
+                self._stop.wait(self.poll_seconds)
+                continue
+            self.process(job)
+        logger.info(f"🏁 Воркер {self.queue.worker_id} завершен, задач: {self.processed}")
+
+    def process(self, job: Job) -> None:
+        pipeline = self.pipelines[job.pipeline]
+        logger.info(f"▶️ Задача #{job.job_id}: {job.source_name} (попытка {job.attempts}/{job.max_attempts})")
+        try:
+            with LeaseKeeper(self.queue, job):
+                results = pipeline.run([job.source_name])
+            errors = pipeline.last_errors
+        except Exception as e:
+            errors = [f"{type(e).__name__}: {e}"]
+            results = []
+
+        self.processed += 1
+        if errors:
+            status = self.queue.fail(job, '; '.join(errors))
+            if status == JOB_FAILED:
+                logger.error(f"❌ Задача #{job.job_id} ({job.source_name}) провалена: {'; '.join(errors)}")
+            else:
+                logger.warning(f"🔁 Задача #{job.job_id} ({job.source_name}) будет повторена: {'; '.join(errors)}")
+        else:
+            rows = sum(r.rows_loaded for r in results)
+            self.queue.complete(job, rows)
+            logger.info(f"✅ Задача #{job.job_id} ({job.source_name}): загружено {rows} строк")
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_sources(scope: str) -> None:
+    """Точка входа --enqueue: ставит источники scope в очередь."""
+    from src.config import load_config
+    from src.db import get_db_engine
+
+    config = load_config()
+    if not config.get('SUPABASE_DB_URL'):
+        print("❌ Ошибка: Нет подключения к БД")
+        return
+
+    engine = get_db_engine(config)
+    queue = JobQueue(engine, worker_id())
+    try:
+        for pipeline in scope_pipelines(scope):
+            sources = [
+                JobSource(spec.name, spec.target_table, spec.spreadsheet_id)
+                for spec in config['MANIFEST'].for_pipeline(pipeline)
+            ]
+            added = queue.enqueue(pipeline, sources)
+            logger.info(f"📥 {pipeline}: поставлено задач {added} из {len(sources)} "
+                        f"(остальные уже в очереди)")
+        logger.info(f"📊 Очередь: {queue.stats()}")
+    finally:
+        engine.dispose()
+
+
+def run_worker(scope: str = 'all', drain: bool = False) -> None:
+    """Точка входа --worker: один воркер в текущем процессе."""
+    from src.config import load_config
+    from src.db import get_db_engine
+    from src.pipelines.current_sync import CurrentSyncPipeline
+    from src.pipelines.historical_sync import HistoricalSyncPipeline
+
+    config = load_config()
+    if not config.get('SUPABASE_DB_URL'):
+        print("❌ Ошибка: Нет подключения к БД")
+        return
+
+    engine = get_db_engine(config)
+    classes = {'current': CurrentSyncPipeline, 'historical': HistoricalSyncPipeline}
+    pipelines = {name: classes[name](config, engine) for name in scope_pipelines(scope)}
+    worker = Worker(JobQueue(engine, worker_id()), pipelines)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, worker.stop)
+
+    logger.info(f"🚀 Воркер {worker.queue.worker_id}: пайплайны {', '.join(pipelines)}")
+    try:
+        worker.run(drain)
+    finally:
+        engine.dispose()
+
+
+def run_workers(count: int, scope: str = 'all', drain: bool = False) -> None:
+    """--workers N: N процессов-воркеров на этом хосте (каждый со своим пулом соединений)."""
+    if count <= 1:
+        run_worker(scope, drain)
+        return
+
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_worker, args=(scope, drain)) for _ in range(count)]
+    for process in processes:
+        process.start()
+    # Ctrl+C получает вся группа процессов, SIGTERM пересылаем сами;
+    # воркеры доделывают текущую задачу и выходят
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: [p.terminate() for p in processes if p.is_alive()])
+    for process in processes:
+        process.join()
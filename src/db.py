@@ -1,11 +1,14 @@
 """Модуль для подключения к базе данных Supabase/PostgreSQL."""
-import psycopg2
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+
+from src.core.constants import DB_CONNECTION_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE_SECONDS
 
 def get_db_connection(config):
     """
     Создает и возвращает подключение к БД через psycopg2.
     """
+    import psycopg2
+
     try:
         conn = psycopg2.connect(config['SUPABASE_DB_URL'])
         return conn
@@ -15,9 +18,68 @@ def get_db_connection(config):
 def get_db_engine(config):
     """
     Создает и возвращает SQLAlchemy engine для работы с БД.
+
+    Размер пула согласован с числом потоков записи ParallelLoadExecutor.
+    В pooler mode (DB_POOLER) соединения не пингуются при выдаче из пула,
+    а пересоздаются по возрасту: каждый pre-ping - лишний round trip.
+    psycopg2 не использует серверные prepared statements, поэтому
+    отдельно отключать их для transaction pooler не нужно.
     """
     try:
-        engine = create_engine(config['SUPABASE_DB_URL'])
+        if config.get('DB_POOLER'):
+            pool_options = {'pool_pre_ping': False, 'pool_recycle': DB_POOL_RECYCLE_SECONDS}
+        else:
+            pool_options = {'pool_pre_ping': True}
+        engine = create_engine(
+            config['SUPABASE_DB_URL'],
+            pool_size=DB_CONNECTION_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            **pool_options,
+        )
         return engine
     except Exception as e:
         raise Exception(f"Error creating database engine: {e}")
+
+
+class RoundTripCounter:
+    """
+    Считает обращения к серверу через события SQLAlchemy: выражения,
+    BEGIN/COMMIT/ROLLBACK транзакций (psycopg2 шлет их отдельными
+    командами; в autocommit их нет) и pre-ping при выдаче из пула.
+
+    Использование:
+        with RoundTripCounter(engine) as counter:
+            loader.write_staging(...)
+        print(counter.count)
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self._listeners = [
+            (engine, 'before_cursor_execute', self._on_execute),
+            (engine, 'begin', self._on_transaction),
+            (engine, 'commit', self._on_transaction),
+            (engine, 'rollback', self._on_transaction),
+            (engine.pool, 'checkout', self._on_checkout),
+        ]
+
+    def __enter__(self):
+        for target, name, fn in self._listeners:
+            event.listen(target, name, fn)
+        return self
+
+    def __exit__(self, *exc):
+        for target, name, fn in self._listeners:
+            event.remove(target, name, fn)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def _on_transaction(self, conn):
+        if conn.get_execution_options().get('isolation_level') != 'AUTOCOMMIT':
+            self.count += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        if getattr(self.engine.pool, '_pre_ping', False):
+            self.count += 1
@@ -2,6 +2,7 @@ import sqlalchemy
 from sqlalchemy import text
 
 from src.config import load_config
+from src.etl.storage import backend_for
 
 def apply_schema():
     print("🏗️ Применение схемы базы данных...")
@@ -14,31 +15,22 @@ def apply_schema():
         return
 
     try:
-        # Создаем engine
         # Для Transaction Pooler (6543) важно отключить prepared statements в некоторых драйверах,
         # но для psycopg2 обычно работает нормально.
         # Важно: Transaction Pooler не поддерживает LISTEN/NOTIFY и некоторые другие фичи,
         # но CREATE TABLE должен работать, если это не Session mode pooler.
         # Если возникнет ошибка "prepared statement ... already exists", нужно добавить connect_args.
-        
-        engine = sqlalchemy.create_engine(db_url, isolation_level="AUTOCOMMIT")
-        
-        schema_path = os.path.join(os.path.dirname(__file__), 'final_schema.sql')
-        
-        print(f"   📖 Чтение схемы из {schema_path}...")
-        with open(schema_path, 'r', encoding='utf-8') as f:
-            sql_script = f.read()
+        # duckdb:///<файл> - встроенный бэкенд, схема src/db/final_schema_duckdb.sql
+        engine = sqlalchemy.create_engine(db_url)
+        backend = backend_for(engine)
 
+        print(f"   📖 Схема {backend.schema_file} (бэкенд {backend.name})...")
         print("   🚀 Выполнение SQL скрипта...")
+        # Скрипт выполняется одним блоком в одной транзакции
+        backend.apply_schema(engine)
+        print("✅ Схема успешно применена!")
+
         with engine.connect() as connection:
-            # Разделяем скрипт на команды, если драйвер не поддерживает выполнение всего скрипта сразу
-            # Но sqlalchemy обычно умеет выполнять блоки.
-            # Для надежности выполним как один блок text()
-            
-            connection.execute(text(sql_script))
-            
-            print("✅ Схема успешно применена!")
-            
             # Проверка создания таблиц
             result = connection.execute(text("""
                 SELECT table_schema, table_name 
@@ -2,7 +2,8 @@
 -- Особенности:
 -- 1. Схемы: raw, staging, references, core, analytics
 -- 2. Таблицы staging сгруппированы по сущностям (sales_hst, sales_cur)
--- 3. Инкрементальное обновление через row_hash
+-- 3. Инкрементальное обновление через row_hash (MD5 в UUID, уникальный индекс + ON CONFLICT)
+-- 4. Исторические таблицы партиционированы по году (партиции создает загрузчик)
 
 -- ============================================================================
 -- 1. Схема RAW (Сырые данные - JSONB)
@@ -78,11 +79,11 @@ CREATE TABLE IF NOT EXISTS raw.trainings_cur (
 -- ============================================================================
 CREATE SCHEMA IF NOT EXISTS staging;
 
--- Продажи (История)
+-- Продажи (История) - партиции по году колонки data
 CREATE TABLE IF NOT EXISTS staging.sales_hst (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     source_row_id INTEGER,
-    row_hash VARCHAR(64),          -- Для инкрементального обновления
+    row_hash UUID,                 -- MD5 строки, для инкрементального обновления
     
     data                           DATE,
     klient                         TEXT,
@@ -104,14 +105,17 @@ CREATE TABLE IF NOT EXISTS staging.sales_hst (
     bonus_trenera                  INTEGER,
     
     imported_at TIMESTAMP DEFAULT NOW()
-);
-CREATE INDEX idx_staging_sales_hst_hash ON staging.sales_hst(row_hash);
+) PARTITION BY RANGE (data);
+CREATE TABLE IF NOT EXISTS staging.sales_hst_default PARTITION OF staging.sales_hst DEFAULT;
+CREATE INDEX IF NOT EXISTS idx_staging_sales_hst_id ON staging.sales_hst(id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_sales_hst_row_hash
+    ON staging.sales_hst(row_hash, data) NULLS NOT DISTINCT;
 
 -- Продажи (Текущие)
 CREATE TABLE IF NOT EXISTS staging.sales_cur (
     id SERIAL PRIMARY KEY,
     source_row_id INTEGER,
-    row_hash VARCHAR(64),
+    row_hash UUID,
     
     data                           TEXT, -- В текущих дата может быть текстом
     klient                         TEXT,
@@ -136,13 +140,46 @@ CREATE TABLE IF NOT EXISTS staging.sales_cur (
     
     imported_at TIMESTAMP DEFAULT NOW()
 );
-CREATE INDEX idx_staging_sales_cur_hash ON staging.sales_cur(row_hash);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_sales_cur_row_hash ON staging.sales_cur(row_hash);
 
 -- Клиенты
 CREATE TABLE IF NOT EXISTS staging.clients_hst (
     id SERIAL PRIMARY KEY,
     source_row_id INTEGER,
-    row_hash VARCHAR(64),
+    row_hash UUID,
+    
+    klient                         TEXT,
+    data_obrascheniya              DATE,
+    mobilnyy                       TEXT,
+    zapros_pri_obraschenii         TEXT,
+    kto_vnyos_informatsiyu_ob_obraschenii TEXT,
+    familiya_vzroslogo             TEXT,
+    imya_vzroslogo                 TEXT,
+    imya_rebenka                   TEXT,
+    data_rozhdeniya_rebenka        DATE,
+    pol_rebyonka                   TEXT,
+    tip                            TEXT,
+    kto_sozdal                     TEXT,
+    zapis_na                       DATE,
+    istochnik                      TEXT,
+    kommentariy_pri_zapisi         TEXT,
+    kto_zapisal                    TEXT,
+    tsena_probnogo                 TEXT,
+    kto_oformil_prodazhu_probnogo  TEXT,
+    instruktor                     TEXT,
+    kommentariy_posle_probnogo     TEXT,
+    priobretennyy_abonement        TEXT,
+    admin_v_den_vizita             TEXT,
+    
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_clients_hst_row_hash ON staging.clients_hst(row_hash);
+
+-- Текущие клиенты (лист Клиент_cur, те же колонки, что у истории)
+CREATE TABLE IF NOT EXISTS staging.clients_cur (
+    id SERIAL PRIMARY KEY,
+    source_row_id INTEGER,
+    row_hash UUID,
     
     klient                         TEXT,
     data_obrascheniya              DATE,
@@ -169,12 +206,13 @@ CREATE TABLE IF NOT EXISTS staging.clients_hst (
     
     imported_at TIMESTAMP DEFAULT NOW()
 );
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_clients_cur_row_hash ON staging.clients_cur(row_hash);
 
 -- Расходы (История)
 CREATE TABLE IF NOT EXISTS staging.expenses_hst (
     id SERIAL PRIMARY KEY,
     source_row_id INTEGER,
-    row_hash VARCHAR(64),
+    row_hash UUID,
     
     god                            INTEGER,
     mesyats                        INTEGER,
@@ -193,12 +231,13 @@ CREATE TABLE IF NOT EXISTS staging.expenses_hst (
     
     imported_at TIMESTAMP DEFAULT NOW()
 );
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_expenses_hst_row_hash ON staging.expenses_hst(row_hash);
 
 -- Расходы (Текущие)
 CREATE TABLE IF NOT EXISTS staging.expenses_cur (
     id SERIAL PRIMARY KEY,
     source_row_id INTEGER,
-    row_hash VARCHAR(64),
+    row_hash UUID,
     
     god                            INTEGER,
     mesyats                        INTEGER,
@@ -217,12 +256,13 @@ CREATE TABLE IF NOT EXISTS staging.expenses_cur (
     
     imported_at TIMESTAMP DEFAULT NOW()
 );
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_expenses_cur_row_hash ON staging.expenses_cur(row_hash);
 
--- Тренировки (История)
+-- Тренировки (История) - партиции по году колонки data
 CREATE TABLE IF NOT EXISTS staging.trainings_hst (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     source_row_id INTEGER,
-    row_hash VARCHAR(64),
+    row_hash UUID,
     
     data                           DATE,
     nachalo                        TEXT,
@@ -244,24 +284,27 @@ CREATE TABLE IF NOT EXISTS staging.trainings_hst (
     zp                             INTEGER,
     
     imported_at TIMESTAMP DEFAULT NOW()
-);
+) PARTITION BY RANGE (data);
+CREATE TABLE IF NOT EXISTS staging.trainings_hst_default PARTITION OF staging.trainings_hst DEFAULT;
+CREATE INDEX IF NOT EXISTS idx_staging_trainings_hst_id ON staging.trainings_hst(id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_trainings_hst_row_hash
+    ON staging.trainings_hst(row_hash, data) NULLS NOT DISTINCT;
 
 -- Тренировки (Текущие) - структура отличается от истории (меньше полей)
 CREATE TABLE IF NOT EXISTS staging.trainings_cur (
     id SERIAL PRIMARY KEY,
     source_row_id INTEGER,
-    row_hash VARCHAR(64),
+    row_hash UUID,
     
-    -- Поля из current_trainings (нужно уточнить, если они отличаются)
-    -- Пока берем базовые, предполагая схожесть, или используем JSONB если структура плавает
-    -- В отчете было 9 колонок.
-    -- Заголовки были: сб 01.11, 14:00, 17:30, Алмаз, Администратор...
-    -- Это требует отдельного маппинга, пока создадим generic поля
+    -- Лист без стабильных заголовков (сб 01.11, 14:00, 17:30, Алмаз, Администратор...),
+    -- колонки именуются по позиции. Если в листе появятся новые колонки,
+    -- загрузчик добавит col_10, col_11... через ALTER TABLE ADD COLUMN
     col_1 TEXT, col_2 TEXT, col_3 TEXT, col_4 TEXT, col_5 TEXT,
     col_6 TEXT, col_7 TEXT, col_8 TEXT, col_9 TEXT,
     
     imported_at TIMESTAMP DEFAULT NOW()
 );
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_trainings_cur_row_hash ON staging.trainings_cur(row_hash);
 
 
 -- ============================================================================
@@ -323,8 +366,22 @@ CREATE TABLE IF NOT EXISTS core.clients (
     updated_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Индекс ключей блокировки: MD5("<вид>:<нормализованное значение>") -> клиент
+CREATE TABLE IF NOT EXISTS core.client_keys (
+    key_hash UUID NOT NULL,
+    client_pk INTEGER NOT NULL REFERENCES core.clients(id) ON DELETE CASCADE,
+    key_kind VARCHAR(10) NOT NULL,     -- phone / name
+    PRIMARY KEY (key_hash, client_pk)
+);
+
+-- Ссылки на клиента в продажах и тренировках
+ALTER TABLE staging.sales_hst ADD COLUMN IF NOT EXISTS client_id INTEGER REFERENCES core.clients(id) ON DELETE SET NULL;
+ALTER TABLE staging.sales_cur ADD COLUMN IF NOT EXISTS client_id INTEGER REFERENCES core.clients(id) ON DELETE SET NULL;
+ALTER TABLE staging.trainings_hst ADD COLUMN IF NOT EXISTS client_id INTEGER REFERENCES core.clients(id) ON DELETE SET NULL;
+
+-- Партиции по году sale_date
 CREATE TABLE IF NOT EXISTS core.sales (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     client_id INTEGER REFERENCES core.clients(id),
     sale_date DATE NOT NULL,
     product_name VARCHAR(255),
@@ -334,8 +391,23 @@ CREATE TABLE IF NOT EXISTS core.sales (
     admin_name VARCHAR(100),
     source VARCHAR(50), -- 'hst' or 'cur'
     validation_status VARCHAR(20),
-    created_at TIMESTAMP DEFAULT NOW()
-);
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (id, sale_date)
+) PARTITION BY RANGE (sale_date);
+CREATE TABLE IF NOT EXISTS core.sales_default PARTITION OF core.sales DEFAULT;
+CREATE INDEX IF NOT EXISTS idx_core_sales_sale_date ON core.sales(sale_date);
+-- Партиции текущего и следующего года (дальше - src/etl/partitions.py)
+DO $$
+DECLARE
+    v_year INTEGER;
+BEGIN
+    FOR v_year IN SELECT EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER + i FROM generate_series(0, 1) i
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS core.%I PARTITION OF core.sales FOR VALUES FROM (%L) TO (%L)',
+            'sales_y' || v_year, make_date(v_year, 1, 1), make_date(v_year + 1, 1, 1));
+    END LOOP;
+END $$;
 
 CREATE TABLE IF NOT EXISTS core.expenses (
     id SERIAL PRIMARY KEY,
@@ -375,3 +447,174 @@ FROM core.sales
 WHERE validation_status = 'valid'
 GROUP BY 1
 ORDER BY 1 DESC;
+
+
+-- ============================================================================
+-- 6. Схема ETL (Служебное состояние загрузок)
+-- ============================================================================
+CREATE SCHEMA IF NOT EXISTS etl;
+
+-- Водяные знаки append-only источников (см. src/core/watermarks.py)
+CREATE TABLE IF NOT EXISTS etl.sheet_watermarks (
+    spreadsheet_id VARCHAR(100) NOT NULL,
+    sheet_id VARCHAR(100) NOT NULL,
+    rows_processed INTEGER NOT NULL,
+    tail_size INTEGER NOT NULL,
+    tail_hash VARCHAR(32) NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (spreadsheet_id, sheet_id)
+);
+
+-- Запуски пайплайнов и контрольные точки загрузки (см. src/core/checkpoints.py)
+CREATE TABLE IF NOT EXISTS etl.etl_runs (
+    run_id BIGSERIAL PRIMARY KEY,
+    pipeline VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL,       -- running / completed / failed
+    started_at TIMESTAMP DEFAULT NOW(),
+    resumed_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_etl_runs_pipeline_status ON etl.etl_runs(pipeline, status, run_id DESC);
+
+CREATE TABLE IF NOT EXISTS etl.etl_checkpoints (
+    run_id BIGINT NOT NULL REFERENCES etl.etl_runs(run_id) ON DELETE CASCADE,
+    target_table VARCHAR(100) NOT NULL,
+    source_name VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    rows_committed INTEGER NOT NULL DEFAULT 0,   -- Строк DataFrame, закоммиченных чанками
+    chunks_committed INTEGER NOT NULL DEFAULT 0,
+    boundary_hash VARCHAR(32),                   -- row_hash последней закоммиченной строки
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (run_id, target_table)
+);
+
+-- Обработанные строки staging (id) по таблицам
+CREATE TABLE IF NOT EXISTS etl.resolution_watermarks (
+    source_table VARCHAR(100) PRIMARY KEY,
+    last_id BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Упоминания клиента без однозначного совпадения (ждут появления ключа)
+CREATE TABLE IF NOT EXISTS etl.client_link_pending (
+    source_table VARCHAR(100) NOT NULL,
+    row_id INTEGER NOT NULL,
+    key_hash UUID NOT NULL,
+    PRIMARY KEY (source_table, row_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_client_link_pending_key ON etl.client_link_pending(key_hash);
+
+-- Очередь задач воркеров (см. src/core/job_queue.py)
+CREATE TABLE IF NOT EXISTS etl.jobs (
+    job_id BIGSERIAL PRIMARY KEY,
+    pipeline VARCHAR(50) NOT NULL,
+    source_name VARCHAR(100) NOT NULL,
+    target_table VARCHAR(100) NOT NULL,
+    spreadsheet_id VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',  -- queued / running / done / failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at TIMESTAMP NOT NULL DEFAULT NOW(), -- Не раньше (задержка повтора)
+    locked_by VARCHAR(100),
+    locked_until TIMESTAMP,                        -- Срок аренды: после него задачу забирает другой воркер
+    rows_loaded INTEGER,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Не больше одной незавершенной задачи на источник (повторная постановка - no-op)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_source
+    ON etl.jobs(source_name) WHERE status IN ('queued', 'running');
+
+CREATE INDEX IF NOT EXISTS idx_jobs_queued ON etl.jobs(available_at, job_id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON etl.jobs(spreadsheet_id, locked_until) WHERE status = 'running';
+
+-- Статистика справочников (см. src/etl/reference_stats.py)
+-- Частота значения (тренер, продукт, тип...) по последним версиям строк листов
+CREATE TABLE IF NOT EXISTS etl.reference_counts (
+    stat VARCHAR(50) NOT NULL,
+    value TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (stat, value)
+);
+
+-- Посчитанные значения каждой строки листа: новая версия строки
+-- (тот же source_row_id) вычитает старые значения из etl.reference_counts
+CREATE TABLE IF NOT EXISTS etl.reference_rows (
+    source_table VARCHAR(100) NOT NULL,
+    source_row_id INTEGER NOT NULL,
+    stat VARCHAR(50) NOT NULL,
+    value TEXT,
+    PRIMARY KEY (source_table, source_row_id, stat)
+);
+
+-- Обработанные статистикой справочников строки staging (id) по таблицам
+CREATE TABLE IF NOT EXISTS etl.reference_watermarks (
+    source_table VARCHAR(100) PRIMARY KEY,
+    last_id BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Метрики запусков (см. src/core/metrics.py)
+-- Отсчеты метрик за запуск (счетчики - прирост за запуск, гистограммы - _sum/_count)
+CREATE TABLE IF NOT EXISTS etl.metrics (
+    id BIGSERIAL PRIMARY KEY,
+    run_id BIGINT REFERENCES etl.etl_runs(run_id) ON DELETE SET NULL,
+    pipeline VARCHAR(100) NOT NULL,
+    metric VARCHAR(100) NOT NULL,
+    labels JSONB NOT NULL DEFAULT '{}',
+    value DOUBLE PRECISION NOT NULL,
+    recorded_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_metrics_metric_recorded ON etl.metrics(metric, recorded_at DESC);
+
+-- Свежесть таблиц: время с последней успешной загрузки
+CREATE OR REPLACE VIEW etl.table_freshness AS
+SELECT
+    labels->>'table' AS target_table,
+    to_timestamp(MAX(value)) AS last_success_at,
+    NOW() - to_timestamp(MAX(value)) AS staleness
+FROM etl.metrics
+WHERE metric = 'etl_last_success_timestamp_seconds'
+GROUP BY labels->>'table';
+
+-- Версии таблиц core для кеша аналитического API (см. src/api/analytics.py)
+-- Номер изменения таблицы: растет на каждое INSERT/UPDATE/DELETE/TRUNCATE
+CREATE TABLE IF NOT EXISTS etl.table_versions (
+    table_name VARCHAR(100) PRIMARY KEY,  -- schema.table
+    version BIGINT NOT NULL DEFAULT 1,
+    changed_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION etl.bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO etl.table_versions (table_name)
+    VALUES (TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME)
+    ON CONFLICT (table_name) DO UPDATE
+    SET version = etl.table_versions.version + 1, changed_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггер уровня выражения: одна строчка на загрузку, а не на каждую строку
+DROP TRIGGER IF EXISTS trg_core_sales_version ON core.sales;
+CREATE TRIGGER trg_core_sales_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON core.sales
+    FOR EACH STATEMENT EXECUTE FUNCTION etl.bump_table_version();
+
+DROP TRIGGER IF EXISTS trg_core_trainings_version ON core.trainings;
+CREATE TRIGGER trg_core_trainings_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON core.trainings
+    FOR EACH STATEMENT EXECUTE FUNCTION etl.bump_table_version();
+
+DROP TRIGGER IF EXISTS trg_core_expenses_version ON core.expenses;
+CREATE TRIGGER trg_core_expenses_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON core.expenses
+    FOR EACH STATEMENT EXECUTE FUNCTION etl.bump_table_version();
+
+DROP TRIGGER IF EXISTS trg_core_clients_version ON core.clients;
+CREATE TRIGGER trg_core_clients_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON core.clients
+    FOR EACH STATEMENT EXECUTE FUNCTION etl.bump_table_version();
@@ -0,0 +1,596 @@
+-- Схема Planeta для встроенного бэкенда DuckDB (перевод final_schema.sql)
+-- Применяется через src/db/apply_schema.py, если SUPABASE_DB_URL=duckdb:///<файл>.
+-- Отличия от Postgres:
+-- 1. SERIAL / BIGSERIAL - последовательности с DEFAULT nextval(...)
+-- 2. Без партиций: уникальный ключ дедупликации исторических таблиц - только row_hash
+--    (в Postgres дата входит в индекс лишь потому, что таблица партиционирована)
+-- 3. Без внешних ключей (DuckDB не поддерживает ON DELETE CASCADE / SET NULL)
+--    и частичных индексов
+-- 4. Без etl.table_versions и триггеров: кеш аналитического API живет только TTL
+-- 5. JSONB - псевдоним типа JSON (выражения с CAST(... AS jsonb) работают без изменений)
+
+CREATE TYPE IF NOT EXISTS jsonb AS JSON;
+
+-- ============================================================================
+-- 1. Схема RAW (Сырые данные - JSONB)
+-- ============================================================================
+CREATE SCHEMA IF NOT EXISTS raw;
+
+CREATE SEQUENCE IF NOT EXISTS raw.sales_hst_id_seq;
+CREATE TABLE IF NOT EXISTS raw.sales_hst (
+    id INTEGER PRIMARY KEY DEFAULT nextval('raw.sales_hst_id_seq'),
+    spreadsheet_id VARCHAR(100),
+    sheet_id VARCHAR(100),
+    row_number INTEGER,
+    raw_data JSONB,
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE SEQUENCE IF NOT EXISTS raw.sales_cur_id_seq;
+CREATE TABLE IF NOT EXISTS raw.sales_cur (
+    id INTEGER PRIMARY KEY DEFAULT nextval('raw.sales_cur_id_seq'),
+    spreadsheet_id VARCHAR(100),
+    sheet_id VARCHAR(100),
+    row_number INTEGER,
+    raw_data JSONB,
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE SEQUENCE IF NOT EXISTS raw.clients_hst_id_seq;
+CREATE TABLE IF NOT EXISTS raw.clients_hst (
+    id INTEGER PRIMARY KEY DEFAULT nextval('raw.clients_hst_id_seq'),
+    spreadsheet_id VARCHAR(100),
+    sheet_id VARCHAR(100),
+    row_number INTEGER,
+    raw_data JSONB,
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE SEQUENCE IF NOT EXISTS raw.expenses_hst_id_seq;
+CREATE TABLE IF NOT EXISTS raw.expenses_hst (
+    id INTEGER PRIMARY KEY DEFAULT nextval('raw.expenses_hst_id_seq'),
+    spreadsheet_id VARCHAR(100),
+    sheet_id VARCHAR(100),
+    row_number INTEGER,
+    raw_data JSONB,
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE SEQUENCE IF NOT EXISTS raw.expenses_cur_id_seq;
+CREATE TABLE IF NOT EXISTS raw.expenses_cur (
+    id INTEGER PRIMARY KEY DEFAULT nextval('raw.expenses_cur_id_seq'),
+    spreadsheet_id VARCHAR(100),
+    sheet_id VARCHAR(100),
+    row_number INTEGER,
+    raw_data JSONB,
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE SEQUENCE IF NOT EXISTS raw.trainings_hst_id_seq;
+CREATE TABLE IF NOT EXISTS raw.trainings_hst (
+    id INTEGER PRIMARY KEY DEFAULT nextval('raw.trainings_hst_id_seq'),
+    spreadsheet_id VARCHAR(100),
+    sheet_id VARCHAR(100),
+    row_number INTEGER,
+    raw_data JSONB,
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE SEQUENCE IF NOT EXISTS raw.trainings_cur_id_seq;
+CREATE TABLE IF NOT EXISTS raw.trainings_cur (
+    id INTEGER PRIMARY KEY DEFAULT nextval('raw.trainings_cur_id_seq'),
+    spreadsheet_id VARCHAR(100),
+    sheet_id VARCHAR(100),
+    row_number INTEGER,
+    raw_data JSONB,
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+
+
+-- ============================================================================
+-- 2. Схема STAGING (Типизированные данные + row_hash)
+-- ============================================================================
+CREATE SCHEMA IF NOT EXISTS staging;
+
+-- Продажи (История)
+CREATE SEQUENCE IF NOT EXISTS staging.sales_hst_id_seq;
+CREATE TABLE IF NOT EXISTS staging.sales_hst (
+    id INTEGER DEFAULT nextval('staging.sales_hst_id_seq'),
+    source_row_id INTEGER,
+    row_hash UUID,                 -- MD5 строки, для инкрементального обновления
+    
+    data                           DATE,
+    klient                         TEXT,
+    produkt                        TEXT,
+    tip                            TEXT,
+    kategoriya                     TEXT,
+    kolichestvo                    INTEGER,
+    polnaya_stoimost               INTEGER,
+    skidka                         TEXT,
+    okonchatelnaya_stoimost        INTEGER,
+    nalichnye                      INTEGER,
+    perevod                        INTEGER,
+    terminal                       INTEGER,
+    vdolg                          INTEGER,
+    admin                          TEXT,
+    trener                         TEXT,
+    kommentariy                    TEXT,
+    bonus_admina                   INTEGER,
+    bonus_trenera                  INTEGER,
+    
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_staging_sales_hst_id ON staging.sales_hst(id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_sales_hst_row_hash ON staging.sales_hst(row_hash);
+
+-- Продажи (Текущие)
+CREATE SEQUENCE IF NOT EXISTS staging.sales_cur_id_seq;
+CREATE TABLE IF NOT EXISTS staging.sales_cur (
+    id INTEGER PRIMARY KEY DEFAULT nextval('staging.sales_cur_id_seq'),
+    source_row_id INTEGER,
+    row_hash UUID,
+    
+    data                           TEXT, -- В текущих дата может быть текстом
+    klient                         TEXT,
+    produkt                        TEXT,
+    tip                            TEXT,
+    kategoriya                     TEXT,
+    kolichestvo                    INTEGER,
+    polnaya_stoimost               INTEGER,
+    skidka                         TEXT,
+    okonchatelnaya_stoimost        INTEGER,
+    nalichnye                      INTEGER,
+    perevod                        INTEGER,
+    terminal                       INTEGER,
+    vdolg                          INTEGER,
+    admin                          TEXT,
+    trener                         TEXT,
+    kommentariy                    TEXT,
+    bonus_admina                   INTEGER,
+    bonus_trenera                  INTEGER,
+    probili_na_evotore             BOOLEAN,
+    vnesli_v_crm                   BOOLEAN,
+    
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_sales_cur_row_hash ON staging.sales_cur(row_hash);
+
+-- Клиенты
+CREATE SEQUENCE IF NOT EXISTS staging.clients_hst_id_seq;
+CREATE TABLE IF NOT EXISTS staging.clients_hst (
+    id INTEGER PRIMARY KEY DEFAULT nextval('staging.clients_hst_id_seq'),
+    source_row_id INTEGER,
+    row_hash UUID,
+    
+    klient                         TEXT,
+    data_obrascheniya              DATE,
+    mobilnyy                       TEXT,
+    zapros_pri_obraschenii         TEXT,
+    kto_vnyos_informatsiyu_ob_obraschenii TEXT,
+    familiya_vzroslogo             TEXT,
+    imya_vzroslogo                 TEXT,
+    imya_rebenka                   TEXT,
+    data_rozhdeniya_rebenka        DATE,
+    pol_rebyonka                   TEXT,
+    tip                            TEXT,
+    kto_sozdal                     TEXT,
+    zapis_na                       DATE,
+    istochnik                      TEXT,
+    kommentariy_pri_zapisi         TEXT,
+    kto_zapisal                    TEXT,
+    tsena_probnogo                 TEXT,
+    kto_oformil_prodazhu_probnogo  TEXT,
+    instruktor                     TEXT,
+    kommentariy_posle_probnogo     TEXT,
+    priobretennyy_abonement        TEXT,
+    admin_v_den_vizita             TEXT,
+    
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_clients_hst_row_hash ON staging.clients_hst(row_hash);
+
+-- Текущие клиенты (лист Клиент_cur, те же колонки, что у истории)
+CREATE SEQUENCE IF NOT EXISTS staging.clients_cur_id_seq;
+CREATE TABLE IF NOT EXISTS staging.clients_cur (
+    id INTEGER PRIMARY KEY DEFAULT nextval('staging.clients_cur_id_seq'),
+    source_row_id INTEGER,
+    row_hash UUID,
+    
+    klient                         TEXT,
+    data_obrascheniya              DATE,
+    mobilnyy                       TEXT,
+    zapros_pri_obraschenii         TEXT,
+    kto_vnyos_informatsiyu_ob_obraschenii TEXT,
+    familiya_vzroslogo             TEXT,
+    imya_vzroslogo                 TEXT,
+    imya_rebenka                   TEXT,
+    data_rozhdeniya_rebenka        DATE,
+    pol_rebyonka                   TEXT,
+    tip                            TEXT,
+    kto_sozdal                     TEXT,
+    zapis_na                       DATE,
+    istochnik                      TEXT,
+    kommentariy_pri_zapisi         TEXT,
+    kto_zapisal                    TEXT,
+    tsena_probnogo                 TEXT,
+    kto_oformil_prodazhu_probnogo  TEXT,
+    instruktor                     TEXT,
+    kommentariy_posle_probnogo     TEXT,
+    priobretennyy_abonement        TEXT,
+    admin_v_den_vizita             TEXT,
+    
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_clients_cur_row_hash ON staging.clients_cur(row_hash);
+
+-- Расходы (История)
+CREATE SEQUENCE IF NOT EXISTS staging.expenses_hst_id_seq;
+CREATE TABLE IF NOT EXISTS staging.expenses_hst (
+    id INTEGER PRIMARY KEY DEFAULT nextval('staging.expenses_hst_id_seq'),
+    source_row_id INTEGER,
+    row_hash UUID,
+    
+    god                            INTEGER,
+    mesyats                        INTEGER,
+    mesyats_1                      INTEGER,
+    uch_mesyats                    TEXT,
+    data                           DATE,
+    summa                          INTEGER,
+    tip_zatrat                     TEXT,
+    kategoriya_zatrat              TEXT,
+    sotrudnik_kontragent           TEXT,
+    opisanieperiod_naimenovanie_kolichestvo TEXT,
+    oplacheno                      TEXT,
+    klient                         TEXT,
+    raspredelenie                  TEXT,
+    relevant                       BOOLEAN,
+    
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_expenses_hst_row_hash ON staging.expenses_hst(row_hash);
+
+-- Расходы (Текущие)
+CREATE SEQUENCE IF NOT EXISTS staging.expenses_cur_id_seq;
+CREATE TABLE IF NOT EXISTS staging.expenses_cur (
+    id INTEGER PRIMARY KEY DEFAULT nextval('staging.expenses_cur_id_seq'),
+    source_row_id INTEGER,
+    row_hash UUID,
+    
+    god                            INTEGER,
+    mesyats                        INTEGER,
+    mesyats_1                      INTEGER,
+    uch_mesyats                    TEXT,
+    data                           DATE,
+    summa                          INTEGER,
+    tip_zatrat                     TEXT,
+    kategoriya_zatrat              TEXT,
+    sotrudnik_kontragent           TEXT,
+    opisanieperiod_naimenovanie_kolichestvo TEXT,
+    oplacheno                      TEXT,
+    klient                         TEXT,
+    raspredelenie                  TEXT,
+    relevant                       BOOLEAN,
+    
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_expenses_cur_row_hash ON staging.expenses_cur(row_hash);
+
+-- Тренировки (История)
+CREATE SEQUENCE IF NOT EXISTS staging.trainings_hst_id_seq;
+CREATE TABLE IF NOT EXISTS staging.trainings_hst (
+    id INTEGER DEFAULT nextval('staging.trainings_hst_id_seq'),
+    source_row_id INTEGER,
+    row_hash UUID,
+    
+    data                           DATE,
+    nachalo                        TEXT,
+    konets                         TEXT,
+    sotrudnik                      TEXT,
+    klient                         TEXT,
+    status                         TEXT,
+    tip                            TEXT,
+    kategoriya                     TEXT,
+    zamena                         BOOLEAN,
+    kommentariy                    TEXT,
+    chasy                          NUMERIC(10,2),
+    kolichestvo                    NUMERIC(10,2),
+    spisano                        INTEGER,
+    oplata                         INTEGER,
+    stavka                         INTEGER,
+    stavka_na_zamene               INTEGER,
+    stavka_propusk                 INTEGER,
+    zp                             INTEGER,
+    
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_staging_trainings_hst_id ON staging.trainings_hst(id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_trainings_hst_row_hash ON staging.trainings_hst(row_hash);
+
+-- Тренировки (Текущие) - структура отличается от истории (меньше полей)
+CREATE SEQUENCE IF NOT EXISTS staging.trainings_cur_id_seq;
+CREATE TABLE IF NOT EXISTS staging.trainings_cur (
+    id INTEGER PRIMARY KEY DEFAULT nextval('staging.trainings_cur_id_seq'),
+    source_row_id INTEGER,
+    row_hash UUID,
+    
+    -- Лист без стабильных заголовков (сб 01.11, 14:00, 17:30, Алмаз, Администратор...),
+    -- колонки именуются по позиции. Если в листе появятся новые колонки,
+    -- загрузчик добавит col_10, col_11... через ALTER TABLE ADD COLUMN
+    col_1 TEXT, col_2 TEXT, col_3 TEXT, col_4 TEXT, col_5 TEXT,
+    col_6 TEXT, col_7 TEXT, col_8 TEXT, col_9 TEXT,
+    
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_trainings_cur_row_hash ON staging.trainings_cur(row_hash);
+
+
+-- ============================================================================
+-- 3. Схема REFERENCES (Справочники)
+-- ============================================================================
+CREATE SCHEMA IF NOT EXISTS "references";
+
+CREATE SEQUENCE IF NOT EXISTS "references".employees_id_seq;
+CREATE TABLE IF NOT EXISTS "references".employees (
+    id INTEGER PRIMARY KEY DEFAULT nextval('"references".employees_id_seq'),
+    name VARCHAR(100) UNIQUE NOT NULL,
+    role VARCHAR(50),
+    aliases TEXT[],
+    is_active BOOLEAN DEFAULT TRUE
+);
+
+CREATE SEQUENCE IF NOT EXISTS "references".products_id_seq;
+CREATE TABLE IF NOT EXISTS "references".products (
+    id INTEGER PRIMARY KEY DEFAULT nextval('"references".products_id_seq'),
+    name VARCHAR(255) UNIQUE NOT NULL,
+    type VARCHAR(100),
+    category VARCHAR(100),
+    aliases TEXT[],
+    is_active BOOLEAN DEFAULT TRUE
+);
+
+CREATE SEQUENCE IF NOT EXISTS "references".expense_categories_id_seq;
+CREATE TABLE IF NOT EXISTS "references".expense_categories (
+    id INTEGER PRIMARY KEY DEFAULT nextval('"references".expense_categories_id_seq'),
+    name VARCHAR(100) UNIQUE NOT NULL,
+    type VARCHAR(50),
+    aliases TEXT[],
+    is_active BOOLEAN DEFAULT TRUE
+);
+
+CREATE SEQUENCE IF NOT EXISTS "references".unknown_values_id_seq;
+CREATE TABLE IF NOT EXISTS "references".unknown_values (
+    id INTEGER PRIMARY KEY DEFAULT nextval('"references".unknown_values_id_seq'),
+    entity_type VARCHAR(50),
+    raw_value TEXT,
+    source_table VARCHAR(50),
+    row_id INTEGER,
+    detected_at TIMESTAMP DEFAULT NOW(),
+    resolution VARCHAR(50) DEFAULT 'pending'
+);
+
+
+-- ============================================================================
+-- 4. Схема CORE (Нормализованные данные)
+-- ============================================================================
+CREATE SCHEMA IF NOT EXISTS core;
+
+CREATE SEQUENCE IF NOT EXISTS core.clients_id_seq;
+CREATE TABLE IF NOT EXISTS core.clients (
+    id INTEGER PRIMARY KEY DEFAULT nextval('core.clients_id_seq'),
+    client_id VARCHAR(100) UNIQUE NOT NULL, -- mobile + child_name
+    mobile VARCHAR(20),
+    child_name VARCHAR(255),
+    child_birthdate DATE,
+    assigned_trainer VARCHAR(100),
+    status VARCHAR(50),
+    balance NUMERIC(10,2) DEFAULT 0,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Индекс ключей блокировки: MD5("<вид>:<нормализованное значение>") -> клиент
+CREATE TABLE IF NOT EXISTS core.client_keys (
+    key_hash UUID NOT NULL,
+    client_pk INTEGER NOT NULL,
+    key_kind VARCHAR(10) NOT NULL,     -- phone / name
+    PRIMARY KEY (key_hash, client_pk)
+);
+
+-- Ссылки на клиента в продажах и тренировках (core.clients.id)
+ALTER TABLE staging.sales_hst ADD COLUMN IF NOT EXISTS client_id INTEGER;
+ALTER TABLE staging.sales_cur ADD COLUMN IF NOT EXISTS client_id INTEGER;
+ALTER TABLE staging.trainings_hst ADD COLUMN IF NOT EXISTS client_id INTEGER;
+
+CREATE SEQUENCE IF NOT EXISTS core.sales_id_seq;
+CREATE TABLE IF NOT EXISTS core.sales (
+    id INTEGER DEFAULT nextval('core.sales_id_seq'),
+    client_id INTEGER,
+    sale_date DATE NOT NULL,
+    product_name VARCHAR(255),
+    amount NUMERIC(10,2),
+    payment_type VARCHAR(50),
+    trainer_name VARCHAR(100),
+    admin_name VARCHAR(100),
+    source VARCHAR(50), -- 'hst' or 'cur'
+    validation_status VARCHAR(20),
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (id, sale_date)
+);
+CREATE INDEX IF NOT EXISTS idx_core_sales_sale_date ON core.sales(sale_date);
+
+CREATE SEQUENCE IF NOT EXISTS core.expenses_id_seq;
+CREATE TABLE IF NOT EXISTS core.expenses (
+    id INTEGER PRIMARY KEY DEFAULT nextval('core.expenses_id_seq'),
+    expense_date DATE NOT NULL,
+    amount NUMERIC(10,2),
+    category VARCHAR(100),
+    description TEXT,
+    source VARCHAR(50),
+    validation_status VARCHAR(20),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE SEQUENCE IF NOT EXISTS core.trainings_id_seq;
+CREATE TABLE IF NOT EXISTS core.trainings (
+    id INTEGER PRIMARY KEY DEFAULT nextval('core.trainings_id_seq'),
+    client_id INTEGER,
+    training_date DATE NOT NULL,
+    training_time TIME,
+    trainer_name VARCHAR(100),
+    status VARCHAR(50),
+    source VARCHAR(50),
+    validation_status VARCHAR(20),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+
+-- ============================================================================
+-- 5. Схема ANALYTICS (Представления)
+-- ============================================================================
+CREATE SCHEMA IF NOT EXISTS analytics;
+
+CREATE OR REPLACE VIEW analytics.monthly_revenue AS
+SELECT 
+    DATE_TRUNC('month', sale_date)::DATE as month,
+    SUM(amount) as total_revenue,
+    COUNT(*) as sales_count
+FROM core.sales
+WHERE validation_status = 'valid'
+GROUP BY 1
+ORDER BY 1 DESC;
+
+
+-- ============================================================================
+-- 6. Схема ETL (Служебное состояние загрузок)
+-- ============================================================================
+CREATE SCHEMA IF NOT EXISTS etl;
+
+-- Водяные знаки append-only источников (см. src/core/watermarks.py)
+CREATE TABLE IF NOT EXISTS etl.sheet_watermarks (
+    spreadsheet_id VARCHAR(100) NOT NULL,
+    sheet_id VARCHAR(100) NOT NULL,
+    rows_processed INTEGER NOT NULL,
+    tail_size INTEGER NOT NULL,
+    tail_hash VARCHAR(32) NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (spreadsheet_id, sheet_id)
+);
+
+-- Запуски пайплайнов и контрольные точки загрузки (см. src/core/checkpoints.py)
+CREATE SEQUENCE IF NOT EXISTS etl.etl_runs_run_id_seq;
+CREATE TABLE IF NOT EXISTS etl.etl_runs (
+    run_id BIGINT PRIMARY KEY DEFAULT nextval('etl.etl_runs_run_id_seq'),
+    pipeline VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL,       -- running / completed / failed
+    started_at TIMESTAMP DEFAULT NOW(),
+    resumed_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_etl_runs_pipeline_status ON etl.etl_runs(pipeline, status, run_id DESC);
+
+CREATE TABLE IF NOT EXISTS etl.etl_checkpoints (
+    run_id BIGINT NOT NULL,
+    target_table VARCHAR(100) NOT NULL,
+    source_name VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    rows_committed INTEGER NOT NULL DEFAULT 0,   -- Строк DataFrame, закоммиченных чанками
+    chunks_committed INTEGER NOT NULL DEFAULT 0,
+    boundary_hash VARCHAR(32),                   -- row_hash последней закоммиченной строки
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (run_id, target_table)
+);
+
+-- Обработанные строки staging (id) по таблицам
+CREATE TABLE IF NOT EXISTS etl.resolution_watermarks (
+    source_table VARCHAR(100) PRIMARY KEY,
+    last_id BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Упоминания клиента без однозначного совпадения (ждут появления ключа)
+CREATE TABLE IF NOT EXISTS etl.client_link_pending (
+    source_table VARCHAR(100) NOT NULL,
+    row_id INTEGER NOT NULL,
+    key_hash UUID NOT NULL,
+    PRIMARY KEY (source_table, row_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_client_link_pending_key ON etl.client_link_pending(key_hash);
+
+-- Очередь задач воркеров (см. src/core/job_queue.py)
+CREATE SEQUENCE IF NOT EXISTS etl.jobs_job_id_seq;
+CREATE TABLE IF NOT EXISTS etl.jobs (
+    job_id BIGINT PRIMARY KEY DEFAULT nextval('etl.jobs_job_id_seq'),
+    pipeline VARCHAR(50) NOT NULL,
+    source_name VARCHAR(100) NOT NULL,
+    target_table VARCHAR(100) NOT NULL,
+    spreadsheet_id VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',  -- queued / running / done / failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at TIMESTAMP NOT NULL DEFAULT NOW(), -- Не раньше (задержка повтора)
+    locked_by VARCHAR(100),
+    locked_until TIMESTAMP,                        -- Срок аренды: после него задачу забирает другой воркер
+    rows_loaded INTEGER,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Воркерам нужен FOR UPDATE SKIP LOCKED и advisory-блокировки, поэтому очередь
+-- работает только на Postgres; таблица оставлена для совместимости схемы
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON etl.jobs(status, available_at, job_id);
+
+-- Статистика справочников (см. src/etl/reference_stats.py)
+-- Частота значения (тренер, продукт, тип...) по последним версиям строк листов
+CREATE TABLE IF NOT EXISTS etl.reference_counts (
+    stat VARCHAR(50) NOT NULL,
+    value TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (stat, value)
+);
+
+-- Посчитанные значения каждой строки листа: новая версия строки
+-- (тот же source_row_id) вычитает старые значения из etl.reference_counts
+CREATE TABLE IF NOT EXISTS etl.reference_rows (
+    source_table VARCHAR(100) NOT NULL,
+    source_row_id INTEGER NOT NULL,
+    stat VARCHAR(50) NOT NULL,
+    value TEXT,
+    PRIMARY KEY (source_table, source_row_id, stat)
+);
+
+-- Обработанные статистикой справочников строки staging (id) по таблицам
+CREATE TABLE IF NOT EXISTS etl.reference_watermarks (
+    source_table VARCHAR(100) PRIMARY KEY,
+    last_id BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Метрики запусков (см. src/core/metrics.py)
+-- Отсчеты метрик за запуск (счетчики - прирост за запуск, гистограммы - _sum/_count)
+CREATE SEQUENCE IF NOT EXISTS etl.metrics_id_seq;
+CREATE TABLE IF NOT EXISTS etl.metrics (
+    id BIGINT PRIMARY KEY DEFAULT nextval('etl.metrics_id_seq'),
+    run_id BIGINT,
+    pipeline VARCHAR(100) NOT NULL,
+    metric VARCHAR(100) NOT NULL,
+    labels JSONB NOT NULL DEFAULT '{}',
+    value DOUBLE PRECISION NOT NULL,
+    recorded_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_metrics_metric_recorded ON etl.metrics(metric, recorded_at DESC);
+
+-- Свежесть таблиц: время с последней успешной загрузки
+CREATE OR REPLACE VIEW etl.table_freshness AS
+SELECT
+    labels->>'table' AS target_table,
+    to_timestamp(MAX(value)) AS last_success_at,
+    NOW() - to_timestamp(MAX(value)) AS staleness
+FROM etl.metrics
+WHERE metric = 'etl_last_success_timestamp_seconds'
+GROUP BY labels->>'table';
@@ -0,0 +1,15 @@
+-- Миграция: Водяные знаки для append-only источников
+-- Причина: исторические и текущие продажи растут только вниз,
+-- перечитывать весь лист на каждом запуске не нужно
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+CREATE TABLE IF NOT EXISTS etl.sheet_watermarks (
+    spreadsheet_id VARCHAR(100) NOT NULL,
+    sheet_id VARCHAR(100) NOT NULL,
+    rows_processed INTEGER NOT NULL,   -- Строк данных (без заголовка) уже загружено
+    tail_size INTEGER NOT NULL,        -- Сколько последних строк покрывает tail_hash
+    tail_hash VARCHAR(32) NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (spreadsheet_id, sheet_id)
+);
@@ -0,0 +1,36 @@
+-- Миграция: Компактный row_hash (UUID) с уникальным индексом
+-- Причина: MD5 в VARCHAR(64) занимает 33 байта против 16 у UUID,
+-- а неуникальный индекс заставлял дедуплицировать в Python.
+-- Теперь загрузчик вставляет с ON CONFLICT (row_hash) DO NOTHING.
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'sales_hst', 'sales_cur', 'clients_hst',
+        'expenses_hst', 'expenses_cur', 'trainings_hst', 'trainings_cur'
+    ]
+    LOOP
+        IF to_regclass('staging.' || t) IS NULL THEN
+            CONTINUE;
+        END IF;
+
+        -- 1. Удаляем дубликаты (оставляем самую раннюю версию строки)
+        EXECUTE format(
+            'DELETE FROM staging.%I a USING staging.%I b
+             WHERE a.row_hash = b.row_hash AND a.id > b.id', t, t);
+
+        -- 2. Старый неуникальный индекс
+        EXECUTE format('DROP INDEX IF EXISTS staging.%I', 'idx_staging_' || t || '_hash');
+
+        -- 3. 32 hex-символа MD5 - валидный UUID
+        EXECUTE format(
+            'ALTER TABLE staging.%I ALTER COLUMN row_hash TYPE uuid USING row_hash::uuid', t);
+
+        -- 4. Уникальный индекс для ON CONFLICT
+        EXECUTE format(
+            'CREATE UNIQUE INDEX IF NOT EXISTS %I ON staging.%I(row_hash)',
+            'uq_staging_' || t || '_row_hash', t);
+    END LOOP;
+END $$;
@@ -0,0 +1,113 @@
+-- Миграция: Годовое RANGE-партиционирование исторических таблиц
+-- Причина: staging.sales_hst, staging.trainings_hst и core.sales копят годы
+-- данных, любой запрос и analytics.monthly_revenue сканируют всю кучу.
+-- После миграции запросы с фильтром по дате отсекают лишние партиции,
+-- а старые годы отсоединяются через ALTER TABLE ... DETACH PARTITION.
+-- Новые партиции создает загрузчик (src/etl/partitions.py).
+-- Требуется PostgreSQL 15+ (NULLS NOT DISTINCT).
+
+-- Представление зависит от core.sales
+DROP VIEW IF EXISTS analytics.monthly_revenue;
+
+CREATE OR REPLACE FUNCTION pg_temp.partition_by_year(
+    p_schema TEXT, p_table TEXT, p_column TEXT
+) RETURNS VOID AS $$
+DECLARE
+    v_old TEXT := p_table || '_unpartitioned';
+    v_seq TEXT;
+    v_year INTEGER;
+BEGIN
+    IF to_regclass(format('%I.%I', p_schema, p_table)) IS NULL THEN
+        RETURN;
+    END IF;
+    IF (SELECT c.relkind FROM pg_class c
+        WHERE c.oid = to_regclass(format('%I.%I', p_schema, p_table))) = 'p' THEN
+        RETURN;  -- уже партиционирована
+    END IF;
+
+    v_seq := pg_get_serial_sequence(format('%I.%I', p_schema, p_table), 'id');
+
+    -- 1. Старая таблица уходит в сторону вместе с индексами (имена освобождаются)
+    EXECUTE format('ALTER TABLE %I.%I RENAME TO %I', p_schema, p_table, v_old);
+    EXECUTE format('ALTER TABLE %I.%I DROP CONSTRAINT IF EXISTS %I',
+                   p_schema, v_old, p_table || '_pkey');
+    EXECUTE format('DROP INDEX IF EXISTS %I.%I', p_schema, 'uq_staging_' || p_table || '_row_hash');
+
+    -- 2. Новая партиционированная таблица с теми же колонками и DEFAULT'ами
+    EXECUTE format('CREATE TABLE %I.%I (LIKE %I.%I INCLUDING DEFAULTS) PARTITION BY RANGE (%I)',
+                   p_schema, p_table, p_schema, v_old, p_column);
+    IF v_seq IS NOT NULL THEN
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY %I.%I.id', v_seq, p_schema, p_table);
+    END IF;
+
+    -- 3. DEFAULT партиция (строки без даты) + годовые партиции под существующие данные
+    EXECUTE format('CREATE TABLE %I.%I PARTITION OF %I.%I DEFAULT',
+                   p_schema, p_table || '_default', p_schema, p_table);
+    FOR v_year IN EXECUTE format(
+        'SELECT DISTINCT EXTRACT(YEAR FROM %I)::INTEGER FROM %I.%I WHERE %I IS NOT NULL',
+        p_column, p_schema, v_old, p_column)
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I.%I PARTITION OF %I.%I FOR VALUES FROM (%L) TO (%L)',
+            p_schema, p_table || '_y' || v_year, p_schema, p_table,
+            make_date(v_year, 1, 1), make_date(v_year + 1, 1, 1));
+    END LOOP;
+
+    -- 4. Перенос данных и удаление старой таблицы
+    EXECUTE format('INSERT INTO %I.%I SELECT * FROM %I.%I', p_schema, p_table, p_schema, v_old);
+    EXECUTE format('DROP TABLE %I.%I', p_schema, v_old);
+END;
+$$ LANGUAGE plpgsql;
+
+-- STAGING: дата может отсутствовать, поэтому вместо PK - индекс по id,
+-- а ключ дедупликации (row_hash, data) с NULLS NOT DISTINCT
+SELECT pg_temp.partition_by_year('staging', 'sales_hst', 'data');
+CREATE INDEX IF NOT EXISTS idx_staging_sales_hst_id ON staging.sales_hst(id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_sales_hst_row_hash
+    ON staging.sales_hst(row_hash, data) NULLS NOT DISTINCT;
+
+SELECT pg_temp.partition_by_year('staging', 'trainings_hst', 'data');
+CREATE INDEX IF NOT EXISTS idx_staging_trainings_hst_id ON staging.trainings_hst(id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_trainings_hst_row_hash
+    ON staging.trainings_hst(row_hash, data) NULLS NOT DISTINCT;
+
+-- CORE: sale_date NOT NULL, поэтому PK (id, sale_date)
+SELECT pg_temp.partition_by_year('core', 'sales', 'sale_date');
+-- Ограничения добавляются только при первом применении миграции
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE conrelid = 'core.sales'::regclass AND contype = 'p') THEN
+        ALTER TABLE core.sales ADD PRIMARY KEY (id, sale_date);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE conrelid = 'core.sales'::regclass AND conname = 'sales_client_id_fkey') THEN
+        ALTER TABLE core.sales ADD CONSTRAINT sales_client_id_fkey
+            FOREIGN KEY (client_id) REFERENCES core.clients(id);
+    END IF;
+END $$;
+CREATE INDEX IF NOT EXISTS idx_core_sales_sale_date ON core.sales(sale_date);
+
+-- Партиции текущего и следующего года: новые продажи не копятся в DEFAULT
+-- (партицию года, строки которого уже лежат в DEFAULT, создать нельзя)
+DO $$
+DECLARE
+    v_year INTEGER;
+BEGIN
+    FOR v_year IN SELECT EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER + i FROM generate_series(0, 1) i
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS core.%I PARTITION OF core.sales FOR VALUES FROM (%L) TO (%L)',
+            'sales_y' || v_year, make_date(v_year, 1, 1), make_date(v_year + 1, 1, 1));
+    END LOOP;
+END $$;
+
+CREATE OR REPLACE VIEW analytics.monthly_revenue AS
+SELECT 
+    DATE_TRUNC('month', sale_date)::DATE as month,
+    SUM(amount) as total_revenue,
+    COUNT(*) as sales_count
+FROM core.sales
+WHERE validation_status = 'valid'
+GROUP BY 1
+ORDER BY 1 DESC;
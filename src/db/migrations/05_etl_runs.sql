@@ -0,0 +1,29 @@
+-- Миграция: Контрольные точки запусков ETL
+-- Причина: упавший запуск начинался с нуля (повторное чтение всех листов
+-- и хеширование всех строк); теперь --resume продолжает с последнего чанка
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+CREATE TABLE IF NOT EXISTS etl.etl_runs (
+    run_id BIGSERIAL PRIMARY KEY,
+    pipeline VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL,       -- running / completed / failed
+    started_at TIMESTAMP DEFAULT NOW(),
+    resumed_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_etl_runs_pipeline_status ON etl.etl_runs(pipeline, status, run_id DESC);
+
+CREATE TABLE IF NOT EXISTS etl.etl_checkpoints (
+    run_id BIGINT NOT NULL REFERENCES etl.etl_runs(run_id) ON DELETE CASCADE,
+    target_table VARCHAR(100) NOT NULL,
+    source_name VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    rows_committed INTEGER NOT NULL DEFAULT 0,   -- Строк DataFrame, закоммиченных чанками
+    chunks_committed INTEGER NOT NULL DEFAULT 0,
+    boundary_hash VARCHAR(32),                   -- row_hash последней закоммиченной строки
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (run_id, target_table)
+);
@@ -0,0 +1,69 @@
+-- Миграция: Разрешение клиентов (src/etl/entity_resolution.py)
+-- Причина: core.clients никто не заполнял, а продажи и тренировки ссылаются
+-- на клиента только текстом klient. Теперь клиенты собираются из
+-- staging.clients_hst / clients_cur по натуральному ключу (телефон + имя
+-- ребенка), а строки продаж и тренировок получают client_id через индекс
+-- ключей блокировки core.client_keys.
+
+-- Текущие клиенты (лист Клиент_cur, те же колонки, что у истории)
+CREATE TABLE IF NOT EXISTS staging.clients_cur (
+    id SERIAL PRIMARY KEY,
+    source_row_id INTEGER,
+    row_hash UUID,
+    
+    klient                         TEXT,
+    data_obrascheniya              DATE,
+    mobilnyy                       TEXT,
+    zapros_pri_obraschenii         TEXT,
+    kto_vnyos_informatsiyu_ob_obraschenii TEXT,
+    familiya_vzroslogo             TEXT,
+    imya_vzroslogo                 TEXT,
+    imya_rebenka                   TEXT,
+    data_rozhdeniya_rebenka        DATE,
+    pol_rebyonka                   TEXT,
+    tip                            TEXT,
+    kto_sozdal                     TEXT,
+    zapis_na                       DATE,
+    istochnik                      TEXT,
+    kommentariy_pri_zapisi         TEXT,
+    kto_zapisal                    TEXT,
+    tsena_probnogo                 TEXT,
+    kto_oformil_prodazhu_probnogo  TEXT,
+    instruktor                     TEXT,
+    kommentariy_posle_probnogo     TEXT,
+    priobretennyy_abonement        TEXT,
+    admin_v_den_vizita             TEXT,
+    
+    imported_at TIMESTAMP DEFAULT NOW()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_staging_clients_cur_row_hash ON staging.clients_cur(row_hash);
+
+-- Индекс ключей блокировки: MD5("<вид>:<нормализованное значение>") -> клиент
+CREATE TABLE IF NOT EXISTS core.client_keys (
+    key_hash UUID NOT NULL,
+    client_pk INTEGER NOT NULL REFERENCES core.clients(id) ON DELETE CASCADE,
+    key_kind VARCHAR(10) NOT NULL,     -- phone / name
+    PRIMARY KEY (key_hash, client_pk)
+);
+
+-- Ссылки на клиента в продажах и тренировках
+ALTER TABLE staging.sales_hst ADD COLUMN IF NOT EXISTS client_id INTEGER REFERENCES core.clients(id) ON DELETE SET NULL;
+ALTER TABLE staging.sales_cur ADD COLUMN IF NOT EXISTS client_id INTEGER REFERENCES core.clients(id) ON DELETE SET NULL;
+ALTER TABLE staging.trainings_hst ADD COLUMN IF NOT EXISTS client_id INTEGER REFERENCES core.clients(id) ON DELETE SET NULL;
+
+-- Обработанные строки staging (id) по таблицам
+CREATE TABLE IF NOT EXISTS etl.resolution_watermarks (
+    source_table VARCHAR(100) PRIMARY KEY,
+    last_id BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Упоминания клиента без однозначного совпадения (ждут появления ключа)
+CREATE TABLE IF NOT EXISTS etl.client_link_pending (
+    source_table VARCHAR(100) NOT NULL,
+    row_id INTEGER NOT NULL,
+    key_hash UUID NOT NULL,
+    PRIMARY KEY (source_table, row_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_client_link_pending_key ON etl.client_link_pending(key_hash);
@@ -0,0 +1,33 @@
+-- Миграция: Очередь задач ETL (src/core/job_queue.py, режим main.py --worker)
+-- Причина: один процесс main.py обходит все источники по очереди и не
+-- успевает при росте числа студий. Теперь источники ставятся задачами в
+-- etl.jobs, а N воркеров (на одном или нескольких хостах) разбирают их
+-- через FOR UPDATE SKIP LOCKED.
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+CREATE TABLE IF NOT EXISTS etl.jobs (
+    job_id BIGSERIAL PRIMARY KEY,
+    pipeline VARCHAR(50) NOT NULL,
+    source_name VARCHAR(100) NOT NULL,
+    target_table VARCHAR(100) NOT NULL,
+    spreadsheet_id VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',  -- queued / running / done / failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at TIMESTAMP NOT NULL DEFAULT NOW(), -- Не раньше (задержка повтора)
+    locked_by VARCHAR(100),
+    locked_until TIMESTAMP,                        -- Срок аренды: после него задачу забирает другой воркер
+    rows_loaded INTEGER,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Не больше одной незавершенной задачи на источник (повторная постановка - no-op)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_source
+    ON etl.jobs(source_name) WHERE status IN ('queued', 'running');
+
+CREATE INDEX IF NOT EXISTS idx_jobs_queued ON etl.jobs(available_at, job_id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON etl.jobs(spreadsheet_id, locked_until) WHERE status = 'running';
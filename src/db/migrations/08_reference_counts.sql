@@ -0,0 +1,32 @@
+-- Миграция: Инкрементальная статистика справочников (src/etl/reference_stats.py)
+-- Причина: src/utils/generate_references.py каждый раз заново читал из
+-- Sheets полные листы исторических продаж и тренировок и считал значения
+-- в Python. Теперь частоты хранятся в etl.reference_counts и обновляются
+-- только по новым строкам staging (водяные знаки по staging.id).
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+-- Частота значения (тренер, продукт, тип...) по последним версиям строк листов
+CREATE TABLE IF NOT EXISTS etl.reference_counts (
+    stat VARCHAR(50) NOT NULL,
+    value TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (stat, value)
+);
+
+-- Посчитанные значения каждой строки листа: новая версия строки
+-- (тот же source_row_id) вычитает старые значения из etl.reference_counts
+CREATE TABLE IF NOT EXISTS etl.reference_rows (
+    source_table VARCHAR(100) NOT NULL,
+    source_row_id INTEGER NOT NULL,
+    stat VARCHAR(50) NOT NULL,
+    value TEXT,
+    PRIMARY KEY (source_table, source_row_id, stat)
+);
+
+-- Обработанные строки staging (id) по таблицам
+CREATE TABLE IF NOT EXISTS etl.reference_watermarks (
+    source_table VARCHAR(100) PRIMARY KEY,
+    last_id BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
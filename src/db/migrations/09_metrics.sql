@@ -0,0 +1,30 @@
+-- Миграция: Метрики запусков ETL (src/core/metrics.py)
+-- Причина: кроме строк логов, операционных метрик не было. Каждый запуск
+-- пайплайна (кроме --daemon, у него HTTP endpoint) записывает сюда свои
+-- метрики: строки по источникам, запросы к Sheets API и 429, round trips
+-- к БД, время стадий и момент последней успешной загрузки таблиц.
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+-- Отсчеты метрик за запуск (счетчики - прирост за запуск, гистограммы - _sum/_count)
+CREATE TABLE IF NOT EXISTS etl.metrics (
+    id BIGSERIAL PRIMARY KEY,
+    run_id BIGINT REFERENCES etl.etl_runs(run_id) ON DELETE SET NULL,
+    pipeline VARCHAR(100) NOT NULL,
+    metric VARCHAR(100) NOT NULL,
+    labels JSONB NOT NULL DEFAULT '{}',
+    value DOUBLE PRECISION NOT NULL,
+    recorded_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_metrics_metric_recorded ON etl.metrics(metric, recorded_at DESC);
+
+-- Свежесть таблиц: время с последней успешной загрузки
+CREATE OR REPLACE VIEW etl.table_freshness AS
+SELECT
+    labels->>'table' AS target_table,
+    to_timestamp(MAX(value)) AS last_success_at,
+    NOW() - to_timestamp(MAX(value)) AS staleness
+FROM etl.metrics
+WHERE metric = 'etl_last_success_timestamp_seconds'
+GROUP BY labels->>'table';
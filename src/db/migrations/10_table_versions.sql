@@ -0,0 +1,41 @@
+-- Миграция: Версии таблиц core для кеша аналитического API (src/api/analytics.py)
+-- Причина: дашборды на каждой загрузке страницы заново считали агрегаты по
+-- core.* и analytics. API кеширует ответы, а версия таблицы растет после
+-- каждого выражения, которое ее изменило (кто бы ни писал в таблицу), и
+-- точно сбрасывает только зависящие от нее ответы.
+
+CREATE SCHEMA IF NOT EXISTS etl;
+
+-- Номер изменения таблицы: растет на каждое INSERT/UPDATE/DELETE/TRUNCATE
+CREATE TABLE IF NOT EXISTS etl.table_versions (
+    table_name VARCHAR(100) PRIMARY KEY,  -- schema.table
+    version BIGINT NOT NULL DEFAULT 1,
+    changed_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION etl.bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO etl.table_versions (table_name)
+    VALUES (TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME)
+    ON CONFLICT (table_name) DO UPDATE
+    SET version = etl.table_versions.version + 1, changed_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггер уровня выражения: одна строчка на загрузку, а не на каждую строку
+DROP TRIGGER IF EXISTS trg_core_sales_version ON core.sales;
+CREATE TRIGGER trg_core_sales_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON core.sales
+    FOR EACH STATEMENT EXECUTE FUNCTION etl.bump_table_version();
+
+DROP TRIGGER IF EXISTS trg_core_trainings_version ON core.trainings;
+CREATE TRIGGER trg_core_trainings_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON core.trainings
+    FOR EACH STATEMENT EXECUTE FUNCTION etl.bump_table_version();
+
+DROP TRIGGER IF EXISTS trg_core_expenses_version ON core.expenses;
+CREATE TRIGGER trg_core_expenses_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON core.expenses
+    FOR EACH STATEMENT EXECUTE FUNCTION etl.bump_table_version();
+
+DROP TRIGGER IF EXISTS trg_core_clients_version ON core.clients;
+CREATE TRIGGER trg_core_clients_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON core.clients
+    FOR EACH STATEMENT EXECUTE FUNCTION etl.bump_table_version();
@@ -0,0 +1,357 @@
+"""
+Асинхронный путь записи в Staging на asyncpg (ETL_DB_DRIVER=asyncpg).
+
+AsyncDataLoader повторяет семантику DataLoader.write_staging: те же чанки
+по DB_BATCH_SIZE, та же дедупликация ON CONFLICT DO NOTHING, контрольная
+точка в транзакции чанка, спул при ошибке. Пул соединений открывается
+при первой записи, поэтому недоступная БД — это ошибка записи таблицы
+(данные уходят в спул), а не падение всего запуска. Отличие — способ вставки:
+чанк передается бинарным COPY (copy_records_to_table) во временную
+таблицу и переносится в staging одним INSERT ... SELECT ... ON CONFLICT.
+Значения приводятся к типам колонок из каталога.
+
+AsyncLoadPipeline связывает чтение, очистку и загрузку в ограниченный
+конвейер на очередях: пока одна таблица пишется в БД, следующая уже
+хешируется, а следующий лист уже читается из Sheets.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.core.checkpoints import TableCheckpoint
+from src.core.constants import ASYNC_PIPELINE_QUEUE_SIZE, DB_BATCH_SIZE, DB_CONNECTION_POOL_SIZE
+from src.etl.loader import DataLoader, conflict_columns
+from src.etl.parallel_loader import LoadResult, LoadTask, prepare_frame
+from src.etl.spool import is_connectivity_error
+from src.etl.row_shards import prepare_frame_sharded, shard_count
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+CATALOG_TYPES_SQL = """
+    SELECT a.attname, t.typname
+    FROM pg_attribute a
+    JOIN pg_type t ON t.oid = a.atttypid
+    WHERE a.attrelid = $1::regclass AND a.attnum > 0 AND NOT a.attisdropped
+"""
+
+
+def asyncpg_dsn(db_url: str) -> str:
+    """URL SQLAlchemy (postgresql+psycopg2://...) -> DSN для asyncpg."""
+    scheme, rest = db_url.split('://', 1)
+    return f"postgresql://{rest}" if scheme.startswith('postgres') else db_url
+
+
+def _to_bool_text(v: Any) -> str:
+    # psycopg2 передает bool как true/false, в TEXT колонке получается 'true'/'false'
+    return ('true' if v else 'false') if isinstance(v, bool) else str(v)
+
+
+def _to_datetime(v: Any) -> datetime:
+    return pd.Timestamp(v).to_pydatetime()
+
+
+def _to_date(v: Any) -> date:
+    return pd.Timestamp(v).date()
+
+
+# typname -> преобразование не-NULL значения к типу, который ожидает кодек asyncpg
+CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    'int2': int,
+    'int4': int,
+    'int8': int,
+    'float4': float,
+    'float8': float,
+    'numeric': lambda v: Decimal(str(v)),
+    'bool': bool,
+    'text': _to_bool_text,
+    'varchar': _to_bool_text,
+    'bpchar': _to_bool_text,
+    'timestamp': _to_datetime,
+    'timestamptz': _to_datetime,
+    'date': _to_date,
+    'uuid': lambda v: uuid.UUID(str(v)),
+    'json': lambda v: json.dumps(v, ensure_ascii=False, default=str),
+    'jsonb': lambda v: json.dumps(v, ensure_ascii=False, default=str),
+}
+
+
+def frame_to_records(df: pd.DataFrame, column_types: Dict[str, str]) -> List[Tuple]:
+    """Строки DataFrame в кортежи с типами колонок таблицы (NaN/NaT -> None)."""
+    columns = []
+    for col in df.columns:
+        convert = CONVERTERS.get(column_types.get(col), _to_bool_text)
+        values = df[col].tolist()
+        mask = df[col].isna().tolist()
+        columns.append([None if is_na else convert(v) for v, is_na in zip(values, mask)])
+    return list(zip(*columns))
+
+
+class AsyncDataLoader:
+    """Загрузчик staging через пул соединений asyncpg."""
+
+    def __init__(self, db_url: str, sync_loader: DataLoader, pool_size: int = DB_CONNECTION_POOL_SIZE):
+        self.dsn = asyncpg_dsn(db_url)
+        # DDL (создание таблиц, новые колонки, партиции) — общий с DataLoader
+        self.sync_loader = sync_loader
+        self.pool_size = pool_size
+        self.pool = None
+        # Пул открывает первая из db_workers корутин, остальные ждут ее
+        self._pool_lock = asyncio.Lock()
+        self._column_types: Dict[str, Dict[str, str]] = {}
+
+    async def open(self) -> None:
+        import asyncpg
+
+        # Transaction pooler не сохраняет именованные prepared statements между транзакциями
+        statement_cache_size = 0 if self.sync_loader.pooler_mode else 100
+        self.pool = await asyncpg.create_pool(
+            self.dsn, min_size=1, max_size=self.pool_size, statement_cache_size=statement_cache_size
+        )
+
+    async def _acquire_pool(self):
+        async with self._pool_lock:
+            if self.pool is None:
+                # Ошибка подключения не запоминается: следующая таблица попробует снова
+                await self.open()
+        return self.pool
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _table_types(self, conn, table_name: str) -> Dict[str, str]:
+        if table_name not in self._column_types:
+            rows = await conn.fetch(CATALOG_TYPES_SQL, f"staging.{table_name}")
+            self._column_types[table_name] = {r['attname']: r['typname'] for r in rows}
+        return self._column_types[table_name]
+
+    async def write_staging(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        source_name: str,
+        checkpoint: Optional[TableCheckpoint] = None
+    ) -> int:
+        """
+        Аналог DataLoader.write_staging: чанк = COPY во временную таблицу +
+        INSERT ... ON CONFLICT DO NOTHING + контрольная точка, одна транзакция.
+
+        Returns:
+            Количество загруженных (новых) строк
+        """
+        conflict_cols = ', '.join(conflict_columns(table_name))
+        start = checkpoint.resume_offset(df['row_hash'].tolist()) if checkpoint else 0
+        if start:
+            logger.info(f"   ⏩ {table_name}: {start} строк уже закоммичено, продолжаем с чанка {start // DB_BATCH_SIZE + 1}")
+
+        await asyncio.to_thread(self.sync_loader.prepare_table, df, table_name)
+        # После DDL типы колонок могли измениться
+        self._column_types.pop(table_name, None)
+
+        columns = list(df.columns)
+        column_list = ', '.join(f'"{c}"' for c in columns)
+        tmp_table = f"tmp_{table_name}"
+
+        logger.info(f"   🚀 Вставка {len(df) - start} строк в {table_name} (COPY + ON CONFLICT DO NOTHING)...")
+        inserted = 0
+        pool = await self._acquire_pool()
+        async with pool.acquire() as conn:
+            column_types = await self._table_types(conn, table_name)
+            for chunk_start in range(start, len(df), DB_BATCH_SIZE):
+                chunk = df.iloc[chunk_start:chunk_start + DB_BATCH_SIZE]
+                chunk_end = chunk_start + len(chunk)
+                boundary_hash = chunk['row_hash'].iloc[-1]
+                records = frame_to_records(chunk, column_types)
+
+                async with conn.transaction():
+                    await conn.execute(
+                        f"CREATE TEMP TABLE {tmp_table} ON COMMIT DROP AS "
+                        f"SELECT {column_list} FROM staging.{table_name} WITH NO DATA"
+                    )
+                    await conn.copy_records_to_table(tmp_table, records=records, columns=columns)
+                    status = await conn.execute(
+                        f"INSERT INTO staging.{table_name} ({column_list}) "
+                        f"SELECT {column_list} FROM {tmp_table} "
+                        f"ON CONFLICT ({conflict_cols}) DO NOTHING"
+                    )
+                    inserted += int(status.split()[-1])
+                    if checkpoint:
+                        await checkpoint.save_async(conn, chunk_end, boundary_hash, chunk_end == len(df))
+                if checkpoint:
+                    checkpoint.advance(chunk_end, boundary_hash, chunk_end == len(df))
+
+        if inserted:
+            logger.info(f"   ✅ Загружено {inserted} новых строк в {table_name} (пропущено {len(df) - start - inserted})")
+        else:
+            logger.info(f"   ✅ Нет новых данных для {table_name} (все {len(df) - start} строк)")
+        return inserted
+
+    async def write_or_spool(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        source_name: str,
+        checkpoint: Optional[TableCheckpoint] = None
+    ) -> Tuple[int, int]:
+        """Аналог DataLoader.write_or_spool: (загружено, отложено в спул)."""
+        spool = self.sync_loader.spool
+        if spool is None:
+            return await self.write_staging(df, table_name, source_name, checkpoint), 0
+
+        if spool.has_pending(table_name):
+            error = 'в спуле есть более ранние батчи таблицы'
+            if checkpoint:
+                checkpoint.resume_offset(df['row_hash'].tolist())
+        else:
+            try:
+                return await self.write_staging(df, table_name, source_name, checkpoint), 0
+            except Exception as e:
+                # Ошибки данных и схемы не откладываются: повтор из спула упал бы так же
+                if not is_connectivity_error(e):
+                    raise
+                error = f"{type(e).__name__}: {e}"
+                logger.error(f"❌ Ошибка записи {table_name}, откладываем в спул: {error}")
+
+        spooled = await asyncio.to_thread(
+            self.sync_loader.spool_remaining, df, table_name, source_name, checkpoint, error
+        )
+        return 0, spooled
+
+
+@dataclass
+class SourceItem:
+    """Источник, ожидающий чтения в асинхронном конвейере."""
+    source_name: str
+    target_table: str
+
+
+_DONE = object()
+
+
+class AsyncLoadPipeline:
+    """
+    Ограниченный конвейер fetch -> clean -> load.
+
+    Чтение идет последовательно (общая квота Sheets), очистка и хеширование
+    — в пуле процессов, запись — db_workers корутинами. Очереди между
+    стадиями ограничены queue_size, поэтому в памяти одновременно не больше
+    нескольких подготовленных таблиц.
+    """
+
+    def __init__(
+        self,
+        loader: AsyncDataLoader,
+        read_task: Callable[[SourceItem], Optional[LoadTask]],
+        queue_size: int = ASYNC_PIPELINE_QUEUE_SIZE,
+        cpu_workers: Optional[int] = None,
+        db_workers: int = DB_CONNECTION_POOL_SIZE,
+    ):
+        self.loader = loader
+        self.read_task = read_task
+        self.queue_size = queue_size
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        self.db_workers = db_workers
+
+    def run(self, items: List[SourceItem]) -> List[LoadResult]:
+        return asyncio.run(self.run_async(items))
+
+    async def run_async(self, items: List[SourceItem]) -> List[LoadResult]:
+        if not items:
+            return []
+
+        started = time.monotonic()
+        results: Dict[str, LoadResult] = {}
+        clean_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        load_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        # Таблицы очищаются по одной, но большая таблица занимает все ядра блоками строк
+        if self.cpu_workers > 1:
+            cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+        else:
+            cpu_pool = ThreadPoolExecutor(max_workers=1)
+
+        async def fetch() -> None:
+            try:
+                for item in items:
+                    task = await asyncio.to_thread(self.read_task, item)
+                    if task is not None:
+                        results[task.target_table] = LoadResult(task.source_name, task.target_table)
+                        await clean_queue.put(task)
+            finally:
+                await clean_queue.put(_DONE)
+
+        async def clean() -> None:
+            loop = asyncio.get_running_loop()
+            try:
+                while (task := await clean_queue.get()) is not _DONE:
+                    shards = shard_count(len(task.df), self.cpu_workers)
+                    result = results[task.target_table]
+                    cleaning_started = time.perf_counter()
+                    try:
+                        if shards > 1:
+                            task.df = await asyncio.to_thread(
+                                prepare_frame_sharded, task.df, task.target_table, task.cleaning, cpu_pool, shards
+                            )
+                        else:
+                            task.df = await loop.run_in_executor(
+                                cpu_pool, prepare_frame, task.df, task.target_table, task.cleaning
+                            )
+                    except Exception as e:
+                        self._fail(result, 'подготовки', e, started)
+                        continue
+                    result.clean_seconds = time.perf_counter() - cleaning_started
+                    result.rows_cleaned = len(task.df)
+                    await load_queue.put(task)
+            finally:
+                for _ in range(self.db_workers):
+                    await load_queue.put(_DONE)
+
+        async def load() -> None:
+            while (task := await load_queue.get()) is not _DONE:
+                result = results[task.target_table]
+                loading_started = time.perf_counter()
+                try:
+                    result.rows_loaded, result.rows_spooled = await self.loader.write_or_spool(
+                        task.df, task.target_table, task.source_name, task.checkpoint
+                    )
+                except Exception as e:
+                    self._fail(result, 'записи', e, started)
+                    continue
+                finally:
+                    result.load_seconds = time.perf_counter() - loading_started
+                result.duration = time.monotonic() - started
+
+        try:
+            with cpu_pool:
+                # Дожидаемся всех стадий, даже если одна упала, и только потом пробрасываем ошибку
+                outcomes = await asyncio.gather(
+                    fetch(), clean(), *(load() for _ in range(self.db_workers)),
+                    return_exceptions=True
+                )
+            errors = [o for o in outcomes if isinstance(o, BaseException)]
+            if errors:
+                raise errors[0]
+        finally:
+            await self.loader.close()
+
+        for r in results.values():
+            spooled = f", {r.rows_spooled} отложено в спул" if r.rows_spooled else ""
+            status = '✅' if r.ok else '❌'
+            logger.info(f"{status} {r.target_table}: {r.rows_loaded} строк{spooled} за {r.duration:.1f}с")
+        return list(results.values())
+
+    def _fail(self, result: LoadResult, stage: str, error: Exception, started: float) -> None:
+        result.error = f"{type(error).__name__}: {error}"
+        result.duration = time.monotonic() - started
+        logger.error(f"❌ Ошибка {stage} {result.target_table} ({result.source_name}): {result.error}")
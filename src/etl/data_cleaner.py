@@ -4,7 +4,8 @@
 import re
 import pandas as pd
 import warnings
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Optional
+from pandas.tseries.api import guess_datetime_format
 from src.core.constants import (
     NUMERIC_KEYWORDS,
     DATE_KEYWORDS,
@@ -12,11 +13,69 @@ from src.core.constants import (
     SERVICE_COLUMNS
 )
 
+if TYPE_CHECKING:
+    from src.core.manifest import CleaningPlan
+
 # Подавляем предупреждения pandas о форматах дат
 warnings.filterwarnings('ignore', message='Could not infer format')
 
 
-def clean_dataframe(df: pd.DataFrame, table_name: Optional[str] = None) -> pd.DataFrame:
+def _column_kind(col: str, plan: Optional['CleaningPlan']) -> str:
+    """Тип колонки: явный из плана источника, иначе по ключевым словам."""
+    if col in SERVICE_COLUMNS:
+        return 'skip'
+    if plan is not None:
+        if col in plan.skip_columns:
+            return 'skip'
+        if col in plan.date_columns:
+            return 'date'
+        if col in plan.numeric_columns:
+            return 'numeric'
+        if col in plan.boolean_columns:
+            return 'boolean'
+        if col in plan.text_columns:
+            return 'text'
+    if any(k in col for k in DATE_KEYWORDS):
+        return 'date'
+    if any(k in col for k in NUMERIC_KEYWORDS):
+        return 'numeric'
+    if col in BOOLEAN_COLUMNS:
+        return 'boolean'
+    return 'text'
+
+
+# Значения, которые pandas пропускает, выбирая образец для угадывания формата даты
+_DATE_GUESS_SKIP = {'', 'NaT', 'nat', 'NAT', 'nan', 'NaN', 'NAN', 'now', 'today'}
+
+
+def infer_date_formats(df: pd.DataFrame, plan: Optional['CleaningPlan'] = None) -> Dict[str, str]:
+    """
+    Форматы колонок дат так, как их угадал бы pd.to_datetime для всего столбца.
+
+    pandas угадывает формат по первому непустому значению, поэтому части
+    строк одного столбца (row_shards) получают формат, найденный по всему
+    столбцу; 'mixed' - разбор каждого значения по отдельности (так pandas
+    поступает, если формат не угадан).
+    """
+    formats = {}
+    for col in df.columns:
+        if _column_kind(col, plan) != 'date' or df[col].dtype != 'object':
+            continue
+        sample = next(
+            (v for v in df[col] if not pd.isna(v) and not (isinstance(v, str) and v in _DATE_GUESS_SKIP)),
+            None
+        )
+        guessed = guess_datetime_format(sample, dayfirst=True) if type(sample) is str else None
+        formats[col] = guessed or 'mixed'
+    return formats
+
+
+def clean_dataframe(
+    df: pd.DataFrame,
+    table_name: Optional[str] = None,
+    plan: Optional['CleaningPlan'] = None,
+    date_formats: Optional[Dict[str, str]] = None
+) -> pd.DataFrame:
     """
     Очищает данные перед загрузкой:
     1. Числа: удаляет пробелы, конвертирует.
@@ -27,24 +86,29 @@ def clean_dataframe(df: pd.DataFrame, table_name: Optional[str] = None) -> pd.Da
     Args:
         df (pd.DataFrame): Данные для очистки
         table_name (str): Имя целевой таблицы (для контекста)
+        plan (CleaningPlan): Явные типы колонок из манифеста источника
+        date_formats (dict): Форматы дат по колонкам (см. infer_date_formats);
+            без них формат угадывается по этому DataFrame
         
     Returns:
         pd.DataFrame: Очищенный DataFrame
     """
     for col in df.columns:
+        kind = _column_kind(col, plan)
+
         # Пропускаем служебные
-        if col in SERVICE_COLUMNS:
+        if kind == 'skip':
             continue
             
         # 1. Даты
-        if any(k in col for k in DATE_KEYWORDS):
+        if kind == 'date':
             # dayfirst=True для DD.MM.YYYY
-            df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce')
+            fmt = date_formats.get(col) if date_formats else None
+            df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce', format=fmt)
             continue
 
         # 2. Числа
-        is_numeric = any(k in col for k in NUMERIC_KEYWORDS)
-        if is_numeric:
+        if kind == 'numeric':
             if df[col].dtype == 'object':
                 # Удаляем пробелы только для чисел и меняем запятую на точку
                 df[col] = df[col].astype(str).str.replace('\xa0', '').str.replace(' ', '').str.replace(',', '.').str.strip()
@@ -53,7 +117,7 @@ def clean_dataframe(df: pd.DataFrame, table_name: Optional[str] = None) -> pd.Da
             continue
             
         # 3. Boolean
-        if col in BOOLEAN_COLUMNS:
+        if kind == 'boolean':
             df[col] = df[col].map({
                 'TRUE': True, 'True': True, 'true': True, '1': True, 1: True,
                 'FALSE': False, 'False': False, 'false': False, '0': False, 0: False,
@@ -0,0 +1,362 @@
+"""
+Разрешение клиентов (entity resolution): staging -> core.clients.
+
+Телефоны и имена нормализуются по колонкам (векторные str-операции
+pandas), из них строятся ключи блокировки — MD5 от "<вид>:<значение>"
+в виде UUID, которые хранятся в индексе core.client_keys. Новые строки
+сопоставляются с клиентами соединением по этому индексу, без попарных
+сравнений, поэтому стоимость запуска пропорциональна числу новых строк:
+
+1. Новые строки staging.clients_* (id больше водяного знака в
+   etl.resolution_watermarks) -> пакетный upsert core.clients по
+   натуральному ключу client_id = <телефон>_<имя ребенка> и ключи в индекс.
+2. Новые строки продаж и тренировок -> client_id по ключу колонки klient
+   (телефон, если он есть в тексте, иначе нормализованное имя). Ключ
+   принимается, только если он указывает ровно на одного клиента;
+   несопоставленные строки ждут в etl.client_link_pending и
+   досопоставляются, когда в индексе появляется их ключ.
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from src.core.constants import (
+    CLIENT_LINK_TABLES,
+    CLIENT_RESOLUTION_BATCH_SIZE,
+    CLIENT_RESOLUTION_TABLES,
+    CLIENT_SOURCE_TABLES,
+)
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+PHONE_KEY = 'phone'
+NAME_KEY = 'name'
+
+# Колонки staging.clients_*, нужные для core.clients и ключей блокировки
+CLIENT_COLUMNS = [
+    'mobilnyy', 'imya_rebenka', 'data_rozhdeniya_rebenka', 'instruktor',
+    'klient', 'imya_vzroslogo', 'familiya_vzroslogo',
+]
+
+UPSERT_CLIENTS_SQL = """
+    INSERT INTO core.clients AS c (client_id, mobile, child_name, child_birthdate, assigned_trainer)
+    SELECT * FROM unnest(
+        CAST(:client_ids AS text[]), CAST(:mobiles AS text[]), CAST(:child_names AS text[]),
+        CAST(:birthdates AS date[]), CAST(:trainers AS text[])
+    )
+    ON CONFLICT (client_id) DO UPDATE SET
+        child_name = COALESCE(EXCLUDED.child_name, c.child_name),
+        child_birthdate = COALESCE(EXCLUDED.child_birthdate, c.child_birthdate),
+        assigned_trainer = COALESCE(EXCLUDED.assigned_trainer, c.assigned_trainer),
+        updated_at = NOW()
+    RETURNING id, client_id
+"""
+
+INSERT_KEYS_SQL = """
+    INSERT INTO core.client_keys (key_hash, client_pk, key_kind)
+    SELECT * FROM unnest(CAST(:key_hashes AS uuid[]), CAST(:client_pks AS integer[]), CAST(:kinds AS text[]))
+    ON CONFLICT DO NOTHING
+    RETURNING key_hash
+"""
+
+# Ключ принимается, только если в индексе за ним ровно один клиент
+LINK_SQL = """
+    WITH incoming AS (
+        SELECT * FROM unnest(CAST(:row_ids AS integer[]), CAST(:key_hashes AS uuid[]))
+            AS t(row_id, key_hash)
+    ), matched AS (
+        SELECT k.key_hash, MIN(k.client_pk) AS client_pk
+        FROM core.client_keys k
+        WHERE k.key_hash IN (SELECT key_hash FROM incoming)
+        GROUP BY k.key_hash
+        HAVING COUNT(*) = 1
+    )
+    UPDATE staging.{table} s
+    SET client_id = m.client_pk
+    FROM incoming i
+    JOIN matched m ON m.key_hash = i.key_hash
+    WHERE s.id = i.row_id
+    RETURNING s.id
+"""
+
+INSERT_PENDING_SQL = """
+    INSERT INTO etl.client_link_pending (source_table, row_id, key_hash)
+    SELECT :table, * FROM unnest(CAST(:row_ids AS integer[]), CAST(:key_hashes AS uuid[]))
+    ON CONFLICT (source_table, row_id) DO UPDATE SET key_hash = EXCLUDED.key_hash
+"""
+
+SELECT_PENDING_SQL = """
+    SELECT row_id, key_hash::text
+    FROM etl.client_link_pending
+    WHERE source_table = :table AND key_hash = ANY(CAST(:key_hashes AS uuid[]))
+"""
+
+DELETE_PENDING_SQL = """
+    DELETE FROM etl.client_link_pending
+    WHERE source_table = :table AND row_id = ANY(CAST(:row_ids AS integer[]))
+"""
+
+
+def normalize_phones(values: pd.Series) -> pd.Series:
+    """
+    Телефоны к виду 7XXXXXXXXXX (первый номер в ячейке).
+
+    8XXXXXXXXXX и 10-значные номера без кода страны приводятся к 7...;
+    все, что не похоже на российский мобильный, -> None.
+    """
+    first = values.astype('string').str.split(r'[,;/]', n=1, regex=True).str[0]
+    digits = first.str.replace(r'\D', '', regex=True)
+    length = digits.str.len()
+    digits = digits.mask(length == 10, '7' + digits)
+    digits = digits.mask((length == 11) & digits.str.startswith('8'), '7' + digits.str[1:])
+    valid = ((digits.str.len() == 11) & digits.str.startswith('7')).fillna(False).astype(bool)
+    return digits.astype(object).where(valid, None)
+
+
+def normalize_names(values: pd.Series) -> pd.Series:
+    """Имя -> ключ: нижний регистр, ё -> е, только буквы, слова по алфавиту."""
+    words = (
+        values.astype('string')
+        .str.lower()
+        .str.replace('ё', 'е', regex=False)
+        .str.replace(r'[\W\d_]+', ' ', regex=True)
+        .str.split()
+    )
+    # Порядок слов не важен: "Иванова Маша" и "Маша Иванова" - один ключ
+    return words.map(lambda w: ' '.join(sorted(w)) if isinstance(w, list) and w else None).astype(object)
+
+
+def key_hashes(kind: str, keys: pd.Series) -> pd.Series:
+    """Ключи блокировки -> MD5 hex (хранится как UUID), None остается None."""
+    return keys.map(
+        lambda k: hashlib.md5(f"{kind}:{k}".encode('utf-8')).hexdigest(), na_action='ignore'
+    ).astype(object).where(keys.notna(), None)
+
+
+def mention_keys(names: pd.Series) -> pd.Series:
+    """Ключ упоминания клиента в klient: телефон, если он есть в тексте, иначе имя."""
+    phone_keys = key_hashes(PHONE_KEY, normalize_phones(names))
+    name_keys = key_hashes(NAME_KEY, normalize_names(names))
+    return phone_keys.where(phone_keys.notna(), name_keys)
+
+
+def prepare_clients(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Новые строки staging.clients_* (по возрастанию id) -> строки core.clients.
+
+    Строки без телефона пропускаются: натуральный ключ без него не построить.
+    Повторы одного client_id сливаются: по каждому полю - последнее непустое.
+    """
+    phones = normalize_phones(df['mobilnyy'])
+    child_keys = normalize_names(df['imya_rebenka'])
+    client_ids = (
+        phones.astype('string') + '_' + child_keys.astype('string').str.replace(' ', '_', regex=False)
+    ).fillna(phones.astype('string')).str.slice(0, 100)
+
+    clients = pd.DataFrame({
+        'client_id': client_ids.astype(object),
+        'mobile': phones,
+        'child_name': _clean_text(df['imya_rebenka'], 255),
+        'child_birthdate': pd.to_datetime(df['data_rozhdeniya_rebenka'], errors='coerce').dt.date,
+        'assigned_trainer': _clean_text(df['instruktor'], 100),
+        'klient_key': normalize_names(df['klient']),
+        'adult_key': normalize_names(
+            df['imya_vzroslogo'].fillna('').astype(str) + ' ' + df['familiya_vzroslogo'].fillna('').astype(str)
+        ),
+    })
+    clients['child_birthdate'] = clients['child_birthdate'].astype(object).where(clients['child_birthdate'].notna(), None)
+    clients = clients[clients['client_id'].notna()]
+    return clients.groupby('client_id', sort=False, as_index=False).last()
+
+
+def client_keys(clients: pd.DataFrame) -> pd.DataFrame:
+    """Ключи блокировки клиентов: телефон, имя из klient, имя взрослого."""
+    frames = [
+        pd.DataFrame({'client_id': clients['client_id'], 'key_kind': kind, 'key_hash': key_hashes(kind, keys)})
+        for kind, keys in (
+            (PHONE_KEY, clients['mobile']),
+            (NAME_KEY, clients['klient_key']),
+            (NAME_KEY, clients['adult_key']),
+        )
+    ]
+    keys = pd.concat(frames, ignore_index=True)
+    return keys[keys['key_hash'].notna()].drop_duplicates(['client_id', 'key_hash'])
+
+
+def _clean_text(values: pd.Series, max_length: int) -> pd.Series:
+    cleaned = values.astype('string').str.strip().str.slice(0, max_length)
+    return cleaned.astype(object).where(cleaned.notna() & (cleaned != ''), None)
+
+
+@dataclass
+class ResolutionStats:
+    """Итоги одного запуска разрешения клиентов."""
+    clients_upserted: int = 0
+    clients_skipped: int = 0   # Строки клиентов без телефона
+    keys_added: int = 0
+    rows_linked: int = 0
+    rows_pending: int = 0      # Новые упоминания без однозначного клиента (ждут в etl.client_link_pending)
+
+
+class ClientResolver:
+    """Инкрементальное разрешение клиентов по водяным знакам staging.id."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        client_tables: Sequence[str] = CLIENT_SOURCE_TABLES,
+        link_tables: Sequence[str] = CLIENT_LINK_TABLES,
+        batch_size: int = CLIENT_RESOLUTION_BATCH_SIZE,
+    ):
+        self.engine = engine
+        self.client_tables = client_tables
+        self.link_tables = link_tables
+        self.batch_size = batch_size
+
+    def missing_tables(self) -> List[str]:
+        """Таблицы состояния разрешения, которых нет в БД (миграция 06 не применена)."""
+        with self.engine.connect() as conn:
+            existing = {
+                f"{schema}.{table}" for schema, table in conn.execute(text("""
+                    SELECT table_schema, table_name FROM information_schema.tables
+                    WHERE table_schema IN ('core', 'etl')
+                """))
+            }
+        return [name for name in CLIENT_RESOLUTION_TABLES if name not in existing]
+
+    def run(self) -> ResolutionStats:
+        stats = ResolutionStats()
+        new_keys: List[str] = []
+        for table in self.client_tables:
+            new_keys.extend(self._resolve_clients(table, stats))
+        for table in self.link_tables:
+            self._link_table(table, new_keys, stats)
+
+        logger.info(
+            f"✅ Клиенты: {stats.clients_upserted} обновлено/добавлено "
+            f"(без телефона: {stats.clients_skipped}), новых ключей: {stats.keys_added}; "
+            f"привязано строк: {stats.rows_linked}, ожидают клиента: {stats.rows_pending}"
+        )
+        return stats
+
+    def _resolve_clients(self, table: str, stats: ResolutionStats) -> List[str]:
+        """Upsert новых клиентов таблицы пачками; возвращает новые ключи индекса."""
+        columns = self._columns(table)
+        if columns is None:
+            return []
+        select_list = ', '.join(c if c in columns else f"NULL AS {c}" for c in CLIENT_COLUMNS)
+
+        new_keys: List[str] = []
+        while True:
+            with self.engine.begin() as conn:
+                df = self._fetch_new(conn, table, select_list)
+                if df.empty:
+                    break
+                clients = prepare_clients(df)
+                stats.clients_skipped += int(normalize_phones(df['mobilnyy']).isna().sum())
+                if not clients.empty:
+                    new_keys.extend(self._upsert_clients(conn, clients, stats))
+                self._advance(conn, table, int(df['id'].iloc[-1]))
+            logger.info(f"   👤 {table}: обработано {len(df)} строк, клиентов {len(clients)}")
+        return new_keys
+
+    def _upsert_clients(self, conn, clients: pd.DataFrame, stats: ResolutionStats) -> List[str]:
+        rows = conn.execute(text(UPSERT_CLIENTS_SQL), {
+            'client_ids': clients['client_id'].tolist(),
+            'mobiles': clients['mobile'].tolist(),
+            'child_names': clients['child_name'].tolist(),
+            'birthdates': clients['child_birthdate'].tolist(),
+            'trainers': clients['assigned_trainer'].tolist(),
+        }).fetchall()
+        stats.clients_upserted += len(rows)
+
+        pks = pd.DataFrame(rows, columns=['client_pk', 'client_id'])
+        keys = client_keys(clients).merge(pks, on='client_id')
+        added = conn.execute(text(INSERT_KEYS_SQL), {
+            'key_hashes': keys['key_hash'].tolist(),
+            'client_pks': keys['client_pk'].astype(int).tolist(),
+            'kinds': keys['key_kind'].tolist(),
+        }).scalars().all()
+        stats.keys_added += len(added)
+        return [str(h) for h in added]
+
+    def _link_table(self, table: str, new_keys: List[str], stats: ResolutionStats) -> None:
+        columns = self._columns(table)
+        if columns is None:
+            return
+        if 'client_id' not in columns:
+            logger.warning(f"⚠️ В staging.{table} нет client_id (миграция 06 не применена), пропуск")
+            return
+
+        # Досопоставление ожидающих строк, ключи которых только что появились в индексе
+        if new_keys:
+            with self.engine.begin() as conn:
+                pending = conn.execute(text(SELECT_PENDING_SQL), {'table': table, 'key_hashes': new_keys}).fetchall()
+                if pending:
+                    row_ids = [r[0] for r in pending]
+                    linked = self._link(conn, table, row_ids, [r[1] for r in pending])
+                    conn.execute(text(DELETE_PENDING_SQL), {'table': table, 'row_ids': linked})
+                    stats.rows_linked += len(linked)
+
+        while True:
+            with self.engine.begin() as conn:
+                df = self._fetch_new(conn, table, 'klient')
+                if df.empty:
+                    break
+                df['key_hash'] = mention_keys(df['klient'])
+                mentions = df[df['key_hash'].notna()]
+                linked = set(self._link(conn, table, mentions['id'].tolist(), mentions['key_hash'].tolist()))
+                unmatched = mentions[~mentions['id'].isin(linked)]
+                if not unmatched.empty:
+                    conn.execute(text(INSERT_PENDING_SQL), {
+                        'table': table,
+                        'row_ids': unmatched['id'].tolist(),
+                        'key_hashes': unmatched['key_hash'].tolist(),
+                    })
+                self._advance(conn, table, int(df['id'].iloc[-1]))
+            stats.rows_linked += len(linked)
+            stats.rows_pending += len(unmatched)
+            logger.info(f"   🔗 {table}: {len(linked)} из {len(df)} строк привязано к клиентам")
+
+    def _link(self, conn, table: str, row_ids: List[int], hashes: List[str]) -> List[int]:
+        if not row_ids:
+            return []
+        return conn.execute(
+            text(LINK_SQL.format(table=table)), {'row_ids': row_ids, 'key_hashes': hashes}
+        ).scalars().all()
+
+    def _columns(self, table: str) -> Optional[set]:
+        with self.engine.connect() as conn:
+            columns = conn.execute(text("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = 'staging' AND table_name = :table
+            """), {'table': table}).scalars().all()
+        if not columns:
+            logger.info(f"ℹ️ staging.{table} еще не создана, пропуск")
+            return None
+        return set(columns)
+
+    def _fetch_new(self, conn, table: str, select_list: str) -> pd.DataFrame:
+        last_id = conn.execute(text(
+            "SELECT last_id FROM etl.resolution_watermarks WHERE source_table = :table"
+        ), {'table': table}).scalar() or 0
+        result = conn.execute(text(f"""
+            SELECT id, {select_list} FROM staging.{table}
+            WHERE id > :last_id
+            ORDER BY id
+            LIMIT :limit
+        """), {'last_id': last_id, 'limit': self.batch_size})
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    def _advance(self, conn, table: str, last_id: int) -> None:
+        conn.execute(text("""
+            INSERT INTO etl.resolution_watermarks (source_table, last_id)
+            VALUES (:table, :last_id)
+            ON CONFLICT (source_table) DO UPDATE
+            SET last_id = EXCLUDED.last_id, updated_at = NOW()
+        """), {'table': table, 'last_id': last_id})
@@ -5,48 +5,103 @@ import pandas as pd
 import hashlib
 import json
 from sqlalchemy.engine import Engine
-from sqlalchemy import text
-from typing import List, Dict, Any, Optional
+from sqlalchemy import column, func, literal_column, select, table, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import List, Dict, Any, Optional, Set, Tuple
 from src.logger import get_logger
-from src.core.constants import DB_BATCH_SIZE
+from src.core.checkpoints import TableCheckpoint
+from src.core.constants import DB_BATCH_SIZE, DDL_LOCK_TIMEOUT_MS, PARTITIONED_TABLES
+from src.etl.partitions import partition_name, partition_years, year_partition_ddl
+from src.etl.spool import LoadSpool, is_connectivity_error
+from src.etl.storage import StorageBackend, backend_for, conflict_columns, infer_sql_type
 
 logger = get_logger(__name__)
 
+# Колонки и партиции таблицы одним запросом (pooler mode)
+CATALOG_SQL = """
+    SELECT
+        to_regclass(CAST(:table AS text)) IS NOT NULL,
+        ARRAY(SELECT attname::text FROM pg_attribute
+              WHERE attrelid = to_regclass(CAST(:table AS text)) AND attnum > 0 AND NOT attisdropped),
+        ARRAY(SELECT c.relname::text FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+              WHERE i.inhparent = to_regclass(CAST(:table AS text)))
+"""
+
+def calculate_row_hash(row: pd.Series) -> str:
+    """Считает MD5 хеш строки для дедупликации."""
+    # Используем robust подход для чисел (1.0 == 1)
+    data = row.to_dict()
+    normalized_data = {}
+    
+    for k, v in data.items():
+        if pd.isna(v):
+            normalized_data[k] = None
+        elif isinstance(v, float) and v.is_integer():
+            normalized_data[k] = int(v)
+        else:
+            normalized_data[k] = v
+            
+    def json_default(obj):
+        if hasattr(obj, 'isoformat'):
+            return obj.isoformat()
+        return str(obj)
+
+    # sort_keys=True важен для детерминированности
+    row_json = json.dumps(normalized_data, sort_keys=True, default=json_default, ensure_ascii=False)
+    return hashlib.md5(row_json.encode('utf-8')).hexdigest()
+
+
+def add_row_hashes(df: pd.DataFrame) -> pd.DataFrame:
+    """Добавляет колонку row_hash (функция уровня модуля, чтобы ее можно было отдать в пул процессов)."""
+    # Хеш считается от всего, что пришло из очистки
+    df['row_hash'] = df.apply(calculate_row_hash, axis=1)
+    return df
+
+
 class DataLoader:
-    """Загрузчик данных в Staging таблицы с поддержкой инкрементальной загрузки."""
+    """
+    Загрузчик данных в Staging таблицы с поддержкой инкрементальной загрузки.
+
+    pooler_mode - режим для Supabase transaction pooler (порт 6543), где
+    каждый round trip идет через WAN: каталог таблицы читается одним
+    запросом и кешируется, DDL собирается в один пакет, а чанк вставляется
+    вместе с контрольной точкой одним выражением в autocommit (без
+    BEGIN/COMMIT и без серверных prepared statements).
+
+    backend - операции, зависящие от БД (src/etl/storage.py); по умолчанию
+    выбирается по диалекту engine: Postgres или встроенный DuckDB.
+    """
     
-    def __init__(self, engine: Engine):
+    def __init__(
+        self,
+        engine: Engine,
+        spool: Optional[LoadSpool] = None,
+        pooler_mode: bool = False,
+        backend: Optional[StorageBackend] = None
+    ):
         self.engine = engine
+        self.spool = spool
+        self.backend = backend or backend_for(engine)
+        # Pooler mode - только для Postgres за transaction pooler
+        self.pooler_mode = pooler_mode and not self.backend.embedded
+        # Колонки и партиции staging таблиц из каталога (кеш на один запуск)
+        self._catalog: Dict[str, Set[str]] = {}
+        self._partitions: Dict[str, Set[str]] = {}
+
+    def reset_catalog_cache(self) -> None:
+        """Сбрасывает кеш каталога; вызывается в начале каждого запуска."""
+        self._catalog = {}
+        self._partitions = {}
 
     def _calculate_row_hash(self, row: pd.Series) -> str:
         """Считает MD5 хеш строки для дедупликации."""
-        # Используем robust подход для чисел (1.0 == 1)
-        data = row.to_dict()
-        normalized_data = {}
-        
-        for k, v in data.items():
-            if pd.isna(v):
-                normalized_data[k] = None
-            elif isinstance(v, float) and v.is_integer():
-                normalized_data[k] = int(v)
-            else:
-                normalized_data[k] = v
-                
-        def json_default(obj):
-            if hasattr(obj, 'isoformat'):
-                return obj.isoformat()
-            return str(obj)
-
-        # sort_keys=True важен для детерминированности
-        row_json = json.dumps(normalized_data, sort_keys=True, default=json_default, ensure_ascii=False)
-        return hashlib.md5(row_json.encode('utf-8')).hexdigest()
+        return calculate_row_hash(row)
 
     def load_staging(self, df: pd.DataFrame, table_name: str, source_name: str) -> int:
         """
         Загружает данные в staging таблицу.
         1. Считает хеши строк.
-        2. Проверяет, какие хеши уже есть в БД.
-        3. Загружает только новые.
+        2. Вставляет строки с ON CONFLICT (row_hash) DO NOTHING.
         
         Args:
             df: DataFrame с данными
@@ -55,59 +110,251 @@ class DataLoader:
             
         Returns:
             Количество загруженных строк
+
+        Raises:
+            Exception: Ошибка вставки (закоммиченные чанки остаются в таблице)
         """
         if df.empty:
             logger.info(f"⚠️ Нет данных для загрузки в {table_name}")
             return 0
 
-        # Добавляем хеш
-        # Исключаем служебные поля из хеша, если они есть (но source_row_id нам нужен для уникальности?)
-        # Обычно хеш считается от бизнес-данных.
-        # Но здесь мы считаем от всего, что пришло из очистки.
-        df['row_hash'] = df.apply(self._calculate_row_hash, axis=1)
+        add_row_hashes(df)
         
-        # Получаем существующие хеши из БД
-        existing_hashes = set()
         try:
-            with self.engine.connect() as conn:
-                # Проверяем существование таблицы
-                # Используем text() для безопасного выполнения
-                check_table = text(f"SELECT to_regclass('staging.{table_name}')")
-                if conn.execute(check_table).scalar() is not None:
-                    query = text(f"SELECT row_hash FROM staging.{table_name}")
-                    result = conn.execute(query)
-                    existing_hashes = {row[0] for row in result}
+            return self.write_staging(df, table_name, source_name)
         except Exception as e:
-            logger.debug(f"Ошибка при получении хешей (возможно таблица пустая): {e}")
+            logger.error(f"❌ Ошибка вставки в {table_name}: {e}")
+            raise
 
-        # Фильтруем новые строки
-        # Используем ~ (NOT) и isin
-        new_records = df[~df['row_hash'].isin(existing_hashes)]
-        
-        if new_records.empty:
-            logger.info(f"   ✅ Нет новых данных для {table_name} (все {len(df)} строк)")
-            return 0
-            
-        logger.info(f"   🚀 Вставка {len(new_records)} новых строк...")
-        
-        # Загружаем
-        try:
-            # chunksize для больших объемов
-            new_records.to_sql(
-                table_name,
-                self.engine,
-                schema='staging',
-                if_exists='append',
-                index=False,
-                chunksize=DB_BATCH_SIZE,
-                method='multi' 
-            )
-            logger.info(f"   ✅ Загружено {len(new_records)} строк")
-            return len(new_records)
-            
-        except Exception:
-            logger.error(f"❌ Ошибка вставки в {table_name}")
-            return 0
+    def write_staging(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        source_name: str,
+        checkpoint: Optional[TableCheckpoint] = None
+    ) -> int:
+        """
+        Записывает DataFrame с уже посчитанным row_hash в staging таблицу.
+
+        Дедупликация происходит на сервере (уникальный индекс по row_hash +
+        ON CONFLICT DO NOTHING), без выгрузки существующих хешей в Python.
+        Каждый чанк из DB_BATCH_SIZE строк коммитится отдельной транзакцией
+        вместе с контрольной точкой (если она передана), поэтому после сбоя
+        загрузка продолжается с границы последнего чанка (в pooler mode
+        чанк и контрольная точка - одно выражение). Ошибки пробрасываются
+        вызывающему коду.
+
+        Новые колонки листа (дрейф схемы) и недостающие годовые партиции
+        добавляются отдельной короткой транзакцией до вставки.
+
+        Returns:
+            Количество загруженных (новых) строк
+        """
+        conflict_cols = self.backend.conflict_columns(table_name)
+
+        start = checkpoint.resume_offset(df['row_hash'].tolist()) if checkpoint else 0
+        if start:
+            logger.info(f"   ⏩ {table_name}: {start} строк уже закоммичено, продолжаем с чанка {start // DB_BATCH_SIZE + 1}")
+
+        self.prepare_table(df, table_name)
+
+        logger.info(f"   🚀 Вставка {len(df) - start} строк в {table_name} (ON CONFLICT DO NOTHING)...")
+        inserted = 0
+        for chunk_start in range(start, len(df), DB_BATCH_SIZE):
+            chunk = df.iloc[chunk_start:chunk_start + DB_BATCH_SIZE]
+            chunk_end = chunk_start + len(chunk)
+            boundary_hash = chunk['row_hash'].iloc[-1]
+            if self.pooler_mode:
+                inserted += self._write_chunk_pooled(
+                    chunk, table_name, conflict_cols, checkpoint, chunk_end, boundary_hash, chunk_end == len(df)
+                )
+            else:
+                with self.engine.begin() as conn:
+                    inserted += self.backend.insert_rows(conn, chunk, table_name)
+                    if checkpoint:
+                        checkpoint.save(conn, chunk_end, boundary_hash, chunk_end == len(df))
+            if checkpoint:
+                checkpoint.advance(chunk_end, boundary_hash, chunk_end == len(df))
+
+        if inserted:
+            logger.info(f"   ✅ Загружено {inserted} новых строк в {table_name} (пропущено {len(df) - start - inserted})")
+        else:
+            logger.info(f"   ✅ Нет новых данных для {table_name} (все {len(df) - start} строк)")
+        return inserted
+
+    def prepare_table(self, df: pd.DataFrame, table_name: str) -> None:
+        """
+        Готовит таблицу к вставке одной короткой транзакцией: создает ее,
+        если нет, добавляет новые колонки и недостающие годовые партиции.
+        """
+        if self.pooler_mode and self._prepare_table_pooled(df, table_name):
+            return
+
+        with self.engine.begin() as conn:
+            if not self.backend.table_exists(conn, table_name):
+                self._create_staging_table(conn, df, table_name)
+                added = []
+            else:
+                added = self._add_missing_columns(conn, df, table_name)
+                self.backend.ensure_partitions(conn, df, table_name)
+        # Кеш каталога обновляется только после коммита DDL
+        if added:
+            self._catalog[table_name].update(added)
+
+    def _prepare_table_pooled(self, df: pd.DataFrame, table_name: str) -> bool:
+        """
+        prepare_table для pooler mode: каталог - один запрос на таблицу за
+        запуск, недостающие колонки и партиции - одним пакетом DDL.
+
+        Returns:
+            False, если таблицы нет (ее создает обычный путь prepare_table)
+        """
+        if table_name not in self._catalog:
+            with self._autocommit_connection() as conn:
+                exists, columns, partitions = conn.execute(
+                    text(CATALOG_SQL), {'table': f"staging.{table_name}"}
+                ).one()
+            if not exists:
+                return False
+            self._catalog[table_name] = set(columns)
+            self._partitions[table_name] = set(partitions)
+
+        missing = [c for c in df.columns if c not in self._catalog[table_name]]
+        statements = [self._add_column_ddl(df, table_name, col) for col in missing]
+
+        partition_column = PARTITIONED_TABLES.get(table_name)
+        new_partitions = []
+        if partition_column and partition_column in df.columns:
+            new_partitions = [
+                year for year in partition_years(df[partition_column])
+                if partition_name(table_name, year) not in self._partitions[table_name]
+            ]
+            statements.extend(year_partition_ddl('staging', table_name, year) for year in new_partitions)
+
+        if statements:
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT_MS}ms';\n" + ";\n".join(statements)
+                ))
+            # Кеш каталога обновляется только после коммита DDL
+            self._catalog[table_name].update(missing)
+            self._partitions[table_name].update(partition_name(table_name, year) for year in new_partitions)
+        return True
+
+    def _write_chunk_pooled(
+        self,
+        chunk: pd.DataFrame,
+        table_name: str,
+        conflict_cols: List[str],
+        checkpoint: Optional[TableCheckpoint],
+        rows_committed: int,
+        boundary_hash: str,
+        completed: bool
+    ) -> int:
+        """
+        Вставка чанка и контрольная точка одним выражением (data-modifying
+        CTE) в autocommit: один round trip, атомарность дает само выражение.
+
+        Returns:
+            Количество вставленных строк
+        """
+        target = table(table_name, *[column(c) for c in chunk.columns], schema='staging')
+        rows = chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+        inserted = pg_insert(target).values(rows).on_conflict_do_nothing(
+            index_elements=conflict_cols
+        ).returning(literal_column('1')).cte('inserted')
+
+        counts = [select(func.count()).select_from(inserted).scalar_subquery()]
+        if checkpoint:
+            saved = checkpoint.save_statement(rows_committed, boundary_hash, completed).cte('saved')
+            counts.append(select(func.count()).select_from(saved).scalar_subquery())
+
+        with self._autocommit_connection() as conn:
+            return conn.execute(select(*counts)).scalar() or 0
+
+    def _autocommit_connection(self):
+        # Одиночное выражение без BEGIN/COMMIT: один round trip вместо трех
+        return self.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+
+    def write_or_spool(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        source_name: str,
+        checkpoint: Optional[TableCheckpoint] = None
+    ) -> Tuple[int, int]:
+        """
+        Записывает DataFrame в staging, а при потере связи с БД откладывает в спул.
+
+        В спул попадают только незакоммиченные строки. Если у таблицы уже
+        есть отложенные батчи, новые данные тоже уходят в спул, чтобы при
+        загрузке не обогнать более ранние версии строк.
+
+        Returns:
+            (загружено новых строк, отложено в спул строк)
+        """
+        if self.spool is None:
+            return self.write_staging(df, table_name, source_name, checkpoint), 0
+
+        if self.spool.has_pending(table_name):
+            error = 'в спуле есть более ранние батчи таблицы'
+            if checkpoint:
+                checkpoint.resume_offset(df['row_hash'].tolist())
+        else:
+            try:
+                return self.write_staging(df, table_name, source_name, checkpoint), 0
+            except Exception as e:
+                # Ошибки данных и схемы не откладываются: повтор из спула упал бы так же
+                if not is_connectivity_error(e):
+                    raise
+                error = f"{type(e).__name__}: {e}"
+                logger.error(f"❌ Ошибка записи {table_name}, откладываем в спул: {error}")
+
+        return 0, self.spool_remaining(df, table_name, source_name, checkpoint, error)
+
+    def spool_remaining(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        source_name: str,
+        checkpoint: Optional[TableCheckpoint],
+        error: str
+    ) -> int:
+        """Откладывает в спул незакоммиченные строки; возвращает их число."""
+        remaining = df.iloc[checkpoint.rows_committed:] if checkpoint else df
+        self.spool.put(remaining, table_name, source_name, error)
+        return len(remaining)
+
+    def _table_columns(self, conn, table_name: str) -> Set[str]:
+        if table_name not in self._catalog:
+            self._catalog[table_name] = self.backend.table_columns(conn, table_name)
+        return self._catalog[table_name]
+
+    def _add_missing_columns(self, conn, df: pd.DataFrame, table_name: str) -> List[str]:
+        """
+        Добавляет в таблицу колонки, которые появились в листе.
+
+        ADD COLUMN без DEFAULT меняет только каталог: существующие строки
+        не переписываются, старые данные получают NULL. Для
+        партиционированных таблиц колонка добавляется во все партиции.
+        """
+        existing = self._table_columns(conn, table_name)
+        missing = [c for c in df.columns if c not in existing]
+        if not missing:
+            return []
+
+        self.backend.add_columns(conn, [self._add_column_ddl(df, table_name, col) for col in missing])
+        return missing
+
+    def _add_column_ddl(self, df: pd.DataFrame, table_name: str, col: str) -> str:
+        sql_type = infer_sql_type(df[col])
+        logger.info(f"   🧩 {table_name}: новая колонка {col} ({sql_type})")
+        return f'ALTER TABLE staging.{table_name} ADD COLUMN IF NOT EXISTS "{col}" {sql_type}'
+
+    def _create_staging_table(self, conn, df: pd.DataFrame, table_name: str) -> None:
+        """Создает отсутствующую staging таблицу по DataFrame с уникальным индексом дедупликации."""
+        logger.info(f"   🏗️ Таблица staging.{table_name} не найдена, создаем по данным")
+        self.backend.create_table(conn, df, table_name)
 
     def load_raw_json(self, data_list: List[Dict[str, Any]], table_name: str, spreadsheet_id: str, sheet_id: str) -> None:
         """Загрузка сырого JSON (если понадобится)."""
@@ -0,0 +1,160 @@
+"""
+Параллельная загрузка таблиц в Staging.
+
+Очистка и хеширование (CPU) выполняются в пуле процессов (большая таблица
+делится на блоки строк, см. src/etl/row_shards.py), запись в БД —
+в пуле потоков размером с пул соединений. Каждая таблица грузится на своем
+соединении чанками с контрольными точками, ошибка одной таблицы не блокирует
+остальные.
+"""
+import os
+import time
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+import pandas as pd
+
+from src.core.checkpoints import TableCheckpoint
+from src.core.constants import DB_CONNECTION_POOL_SIZE
+from src.core.manifest import CleaningPlan
+from src.etl.data_cleaner import clean_dataframe
+from src.etl.loader import DataLoader, add_row_hashes
+from src.etl.row_shards import prepare_frame_sharded, shard_count
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+
+@dataclass
+class LoadTask:
+    """Прочитанный из Sheets источник, ожидающий загрузки."""
+    source_name: str
+    target_table: str
+    df: pd.DataFrame
+    checkpoint: Optional[TableCheckpoint] = None
+    cleaning: Optional[CleaningPlan] = None
+
+
+@dataclass
+class LoadResult:
+    """Итог загрузки одной таблицы."""
+    source_name: str
+    target_table: str
+    rows_loaded: int = 0
+    rows_spooled: int = 0
+    error: Optional[str] = None
+    duration: float = 0.0
+    rows_cleaned: int = 0
+    clean_seconds: float = 0.0      # Очистка + хеширование
+    load_seconds: float = 0.0       # Запись в staging (или спул)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def prepare_frame(df: pd.DataFrame, table_name: str, cleaning: Optional[CleaningPlan] = None) -> pd.DataFrame:
+    """Очистка + хеширование. Выполняется в дочернем процессе."""
+    df = clean_dataframe(df, table_name, cleaning)
+    return add_row_hashes(df)
+
+
+def timed(func: Callable[..., T], *args) -> Tuple[T, float]:
+    """Результат func(*args) и время выполнения (там, где она выполнялась, а не в очереди пула)."""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+class ParallelLoadExecutor:
+    """Исполнитель загрузки набора таблиц с независимыми транзакциями."""
+
+    def __init__(
+        self,
+        loader: DataLoader,
+        cpu_workers: Optional[int] = None,
+        db_workers: int = DB_CONNECTION_POOL_SIZE,
+    ):
+        self.loader = loader
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        self.db_workers = db_workers
+
+    def run(self, tasks: List[LoadTask]) -> List[LoadResult]:
+        """Грузит все задачи и возвращает результаты в порядке задач."""
+        if not tasks:
+            return []
+
+        started = time.monotonic()
+        results: Dict[str, LoadResult] = {
+            t.target_table: LoadResult(t.source_name, t.target_table) for t in tasks
+        }
+        shards = {t.target_table: shard_count(len(t.df), self.cpu_workers) for t in tasks}
+        cpu_workers = max(min(self.cpu_workers, len(tasks)), *shards.values())
+
+        if cpu_workers > 1:
+            cpu_pool = ProcessPoolExecutor(max_workers=cpu_workers)
+        else:
+            # Для одной задачи процесс не нужен: pickling дороже самой работы
+            cpu_pool = ThreadPoolExecutor(max_workers=1)
+
+        # Большие таблицы режутся на блоки в отдельном потоке, блоки - в том же пуле процессов
+        with cpu_pool, ThreadPoolExecutor(max_workers=1) as shard_pool, \
+                ThreadPoolExecutor(max_workers=self.db_workers) as db_pool:
+            prepared: Dict[Future, LoadTask] = {}
+            for t in tasks:
+                if shards[t.target_table] > 1:
+                    future = shard_pool.submit(
+                        timed, prepare_frame_sharded, t.df, t.target_table, t.cleaning, cpu_pool, shards[t.target_table]
+                    )
+                else:
+                    future = cpu_pool.submit(timed, prepare_frame, t.df, t.target_table, t.cleaning)
+                prepared[future] = t
+            writes: Dict[Future, LoadTask] = {}
+
+            # Запись таблицы начинается сразу, как только она подготовлена
+            for future in as_completed(prepared):
+                task = prepared[future]
+                result = results[task.target_table]
+                try:
+                    df, result.clean_seconds = future.result()
+                except Exception as e:
+                    self._fail(result, 'подготовки', e)
+                    result.duration = time.monotonic() - started
+                    continue
+                result.rows_cleaned = len(df)
+                writes[db_pool.submit(
+                    timed, self.loader.write_or_spool, df, task.target_table, task.source_name, task.checkpoint
+                )] = task
+
+            for future in as_completed(writes):
+                task = writes[future]
+                result = results[task.target_table]
+                try:
+                    (result.rows_loaded, result.rows_spooled), result.load_seconds = future.result()
+                except Exception as e:
+                    self._fail(result, 'записи', e)
+                result.duration = time.monotonic() - started
+
+        self._log_summary(list(results.values()))
+        return [results[t.target_table] for t in tasks]
+
+    def _fail(self, result: LoadResult, stage: str, error: Exception) -> None:
+        result.error = f"{type(error).__name__}: {error}"
+        logger.error(f"❌ Ошибка {stage} {result.target_table} ({result.source_name}): {result.error}")
+
+    def _log_summary(self, results: List[LoadResult]) -> None:
+        for r in results:
+            status = '✅' if r.ok else '❌'
+            spooled = f", {r.rows_spooled} отложено в спул" if r.rows_spooled else ""
+            logger.info(f"{status} {r.target_table}: {r.rows_loaded} строк{spooled} за {r.duration:.1f}с")
+        failed = [r.target_table for r in results if not r.ok]
+        if failed:
+            logger.error(f"❌ Не загружены таблицы: {', '.join(failed)}")
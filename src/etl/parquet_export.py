@@ -0,0 +1,261 @@
+"""
+Инкрементальная выгрузка core.* в Parquet и DuckDB для аналитиков.
+
+Таблицы EXPORT_TABLES выгружаются в датасет с партициями по месяцу
+(<каталог>/<таблица>/month=YYYY-MM/data.parquet). Переписываются только
+изменившиеся месяцы:
+
+1. Если версия таблицы в etl.table_versions (миграция 10) не изменилась с
+   прошлой выгрузки, таблица пропускается без запросов к ней.
+2. Иначе сервер одним запросом считает отпечаток каждого месяца (число
+   строк и сумма hashtext строк). По сети передаются только строки месяцев,
+   чей отпечаток отличается от сохраненного; исчезнувшие месяцы удаляются.
+   При изменении колонок таблица выгружается заново целиком.
+
+Файл DuckDB содержит представления core.<таблица> поверх датасета:
+запросы аналитиков выполняются локально и не нагружают БД.
+"""
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import date
+from decimal import Context, Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from src.core.constants import EXPORT_DUCKDB_FILE, EXPORT_NUMERIC_SCALE, EXPORT_TABLES
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+STATE_FILE = '_export_state.json'
+NO_MONTH = 'none'   # Партиция строк без даты
+
+COLUMNS_SQL = """
+    SELECT column_name, data_type, numeric_precision, numeric_scale
+    FROM information_schema.columns
+    WHERE table_schema = :schema AND table_name = :table
+    ORDER BY ordinal_position
+"""
+
+# Отпечаток месяца: число строк и сумма хешей строк целиком (ловит вставки, изменения и удаления)
+FINGERPRINT_SQL = """
+    SELECT COALESCE(to_char({date_column}, 'YYYY-MM'), '{no_month}') AS month,
+           COUNT(*), COALESCE(SUM(hashtext(t::text)), 0)
+    FROM {table} AS t
+    GROUP BY 1
+"""
+
+MONTH_ROWS_SQL = "SELECT * FROM {table} WHERE {date_column} >= :start AND {date_column} < :stop"
+NO_MONTH_ROWS_SQL = "SELECT * FROM {table} WHERE {date_column} IS NULL"
+
+VERSIONS_SQL = "SELECT table_name, version FROM etl.table_versions"
+
+# Точность Arrow decimal128; numeric(p, s) с большей p выгружается как decimal256
+DECIMAL128_MAX_PRECISION = 38
+DECIMAL256_MAX_PRECISION = 76
+
+
+@dataclass
+class ExportResult:
+    """Итог выгрузки одной таблицы."""
+    table: str
+    written: int = 0         # Переписано месяцев
+    deleted: int = 0         # Удалено месяцев
+    unchanged: int = 0       # Месяцев без изменений
+    rows_written: int = 0
+    skipped: bool = False    # Версия таблицы не изменилась
+
+
+def arrow_type(data_type: str, precision: Optional[int], scale: Optional[int]) -> pa.DataType:
+    """Тип Arrow для колонки Postgres (один и тот же во всех партициях)."""
+    if data_type == 'smallint':
+        return pa.int16()
+    if data_type == 'integer':
+        return pa.int32()
+    if data_type == 'bigint':
+        return pa.int64()
+    if data_type == 'numeric':
+        # Значения приходят как Decimal: float64 их не принимает
+        if not precision:
+            return pa.decimal128(DECIMAL128_MAX_PRECISION, EXPORT_NUMERIC_SCALE)
+        if precision > DECIMAL128_MAX_PRECISION:
+            return pa.decimal256(precision, scale or 0)
+        return pa.decimal128(precision, scale or 0)
+    if data_type in ('real', 'double precision'):
+        return pa.float64()
+    if data_type == 'boolean':
+        return pa.bool_()
+    if data_type == 'date':
+        return pa.date32()
+    if data_type == 'timestamp without time zone':
+        return pa.timestamp('us')
+    if data_type == 'timestamp with time zone':
+        return pa.timestamp('us', tz='UTC')
+    if data_type == 'time without time zone':
+        return pa.time64('us')
+    return pa.string()
+
+
+def arrow_values(values: Sequence[Any], arrow_dtype: pa.DataType) -> Sequence[Any]:
+    """
+    Значения колонки, готовые для pa.array.
+
+    Decimal округляются до scale колонки (у numeric без (p, s) знаков после
+    запятой может быть больше EXPORT_NUMERIC_SCALE), NaN становится null.
+    """
+    if not pa.types.is_decimal(arrow_dtype):
+        return values
+    exponent = Decimal(1).scaleb(-arrow_dtype.scale)
+    context = Context(prec=DECIMAL256_MAX_PRECISION)
+    return [None if v is None or v.is_nan() else v.quantize(exponent, context=context) for v in values]
+
+
+def month_bounds(month: str) -> Tuple[date, date]:
+    """[первый день месяца, первый день следующего) для 'YYYY-MM'."""
+    year, mon = map(int, month.split('-'))
+    return date(year, mon, 1), date(year + mon // 12, mon % 12 + 1, 1)
+
+
+class CoreExporter:
+    """Выгрузка таблиц core в Parquet с партициями по месяцу и представления DuckDB."""
+
+    def __init__(self, engine: Engine, output_dir: Path, tables: Optional[Dict[str, str]] = None):
+        self.engine = engine
+        self.output_dir = Path(output_dir)
+        self.tables = tables or EXPORT_TABLES
+        self.state_path = self.output_dir / STATE_FILE
+
+    def run(self, full: bool = False) -> List[ExportResult]:
+        """Выгружает все таблицы; full - переписать все месяцы."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        state = self._load_state()
+        versions = self._table_versions()
+
+        results = []
+        for table, date_column in self.tables.items():
+            result = self.export_table(table, date_column, state, versions, full)
+            self._save_state(state)
+            results.append(result)
+            if result.skipped:
+                logger.info(f"⏩ {table}: без изменений с прошлой выгрузки")
+            else:
+                logger.info(
+                    f"📦 {table}: переписано месяцев {result.written} ({result.rows_written} строк), "
+                    f"удалено {result.deleted}, без изменений {result.unchanged}"
+                )
+
+        self.write_duckdb()
+        return results
+
+    def export_table(self, table: str, date_column: str, state: Dict, versions: Optional[Dict[str, int]],
+                     full: bool = False) -> ExportResult:
+        result = ExportResult(table)
+        table_state = state.setdefault(table, {'version': None, 'columns': None, 'partitions': {}})
+        version = versions.get(table) if versions is not None else None
+        if not full and version is not None and version == table_state['version']:
+            result.skipped = True
+            return result
+
+        schema_name, table_name = table.split('.')
+        table_dir = self.output_dir / table_name
+        with self.engine.connect() as conn:
+            columns = [tuple(r) for r in conn.execute(text(COLUMNS_SQL), {'schema': schema_name, 'table': table_name})]
+            schema = pa.schema([(name, arrow_type(*spec)) for name, *spec in columns])
+            if full or table_state['columns'] != [list(c) for c in columns]:
+                # Новая схема: старые партиции несовместимы, выгружаем заново
+                shutil.rmtree(table_dir, ignore_errors=True)
+                table_state.update(columns=[list(c) for c in columns], partitions={})
+
+            fingerprints = {
+                month: [rows, int(checksum)]
+                for month, rows, checksum in conn.execute(
+                    text(FINGERPRINT_SQL.format(table=table, date_column=date_column, no_month=NO_MONTH))
+                )
+            }
+            partitions = table_state['partitions']
+            for month, fingerprint in sorted(fingerprints.items()):
+                if partitions.get(month) == fingerprint and (table_dir / f"month={month}").exists():
+                    result.unchanged += 1
+                    continue
+                result.rows_written += self._write_month(conn, table, date_column, month, schema, table_dir)
+                partitions[month] = fingerprint
+                result.written += 1
+
+        for month in set(partitions) - set(fingerprints):
+            shutil.rmtree(table_dir / f"month={month}", ignore_errors=True)
+            del partitions[month]
+            result.deleted += 1
+        table_state['version'] = version
+        return result
+
+    def _write_month(self, conn, table: str, date_column: str, month: str, schema: pa.Schema,
+                     table_dir: Path) -> int:
+        """Переписывает партицию месяца: временный файл и атомарная замена."""
+        if month == NO_MONTH:
+            rows = conn.execute(text(NO_MONTH_ROWS_SQL.format(table=table, date_column=date_column)))
+        else:
+            start, stop = month_bounds(month)
+            rows = conn.execute(
+                text(MONTH_ROWS_SQL.format(table=table, date_column=date_column)), {'start': start, 'stop': stop}
+            )
+        values = list(zip(*rows)) or [[] for _ in schema]
+        data = pa.Table.from_arrays(
+            [pa.array(arrow_values(column, field.type), type=field.type) for column, field in zip(values, schema)],
+            schema=schema
+        )
+
+        path = table_dir / f"month={month}" / 'data.parquet'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.parquet.tmp')
+        pq.write_table(data, tmp_path)
+        os.replace(tmp_path, path)
+        return data.num_rows
+
+    def write_duckdb(self) -> Path:
+        """Файл DuckDB с представлениями core.<таблица> над партициями Parquet."""
+        import duckdb
+
+        path = self.output_dir / EXPORT_DUCKDB_FILE
+        con = duckdb.connect(str(path))
+        try:
+            con.execute("CREATE SCHEMA IF NOT EXISTS core")
+            for table in self.tables:
+                table_name = table.split('.')[1]
+                if not any((self.output_dir / table_name).glob('month=*/*.parquet')):
+                    con.execute(f"DROP VIEW IF EXISTS core.{table_name}")
+                    continue
+                files = (self.output_dir / table_name).resolve().as_posix() + '/month=*/*.parquet'
+                con.execute(
+                    f"CREATE OR REPLACE VIEW core.{table_name} AS SELECT * FROM read_parquet("
+                    f"'{files.replace(chr(39), chr(39) * 2)}', hive_partitioning = true, union_by_name = true)"
+                )
+        finally:
+            con.close()
+        return path
+
+    def _table_versions(self) -> Optional[Dict[str, int]]:
+        try:
+            with self.engine.connect() as conn:
+                return {name: version for name, version in conn.execute(text(VERSIONS_SQL))}
+        except Exception as e:
+            logger.warning(f"⚠️ Версии таблиц недоступны (миграция 10?), проверка по отпечаткам месяцев: {e}")
+            return None
+
+    def _load_state(self) -> Dict:
+        if not self.state_path.exists():
+            return {}
+        with open(self.state_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_state(self, state: Dict) -> None:
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
@@ -0,0 +1,62 @@
+"""
+Годовые партиции исторических таблиц (декларативное RANGE-партиционирование).
+
+Партиции создаются загрузчиком перед вставкой для всех лет, встречающихся
+в данных; строки без даты попадают в DEFAULT партицию. Старые годы можно
+отсоединить (DETACH) и архивировать без переписывания остальных данных.
+"""
+from datetime import date
+from typing import Iterable, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def partition_name(table: str, year: int) -> str:
+    """Имя годовой партиции: sales_hst -> sales_hst_y2024."""
+    return f"{table}_y{year}"
+
+
+def partition_years(values: pd.Series) -> List[int]:
+    """Годы, встречающиеся в колонке даты (без NaT)."""
+    years = pd.to_datetime(values, errors='coerce').dt.year.dropna().unique()
+    return sorted(int(y) for y in years)
+
+
+def upcoming_years(today: Optional[date] = None) -> List[int]:
+    """Текущий и следующий год: их партиции должны существовать до прихода данных."""
+    year = (today or date.today()).year
+    return [year, year + 1]
+
+
+def year_partition_ddl(schema: str, table: str, year: int) -> str:
+    """CREATE TABLE IF NOT EXISTS для годовой партиции."""
+    name = partition_name(table, year)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {schema}.{name} "
+        f"PARTITION OF {schema}.{table} "
+        f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+    )
+
+
+def ensure_year_partitions(conn, schema: str, table: str, years: Iterable[int]) -> None:
+    """Создает отсутствующие годовые партиции (идемпотентно)."""
+    for year in years:
+        conn.execute(text(year_partition_ddl(schema, table, year)))
+
+
+def detach_year_partition(conn, schema: str, table: str, year: int) -> str:
+    """
+    Отсоединяет годовую партицию, превращая ее в обычную таблицу для архивации.
+
+    Returns:
+        Полное имя отсоединенной таблицы
+    """
+    name = partition_name(table, year)
+    conn.execute(text(f"ALTER TABLE {schema}.{table} DETACH PARTITION {schema}.{name}"))
+    logger.info(f"📦 Партиция {schema}.{name} отсоединена")
+    return f"{schema}.{name}"
@@ -0,0 +1,175 @@
+"""
+Инкрементальная статистика справочников: частоты тренеров, админов,
+продуктов, типов и категорий по staging (для references_stats.json).
+
+Частоты хранятся в etl.reference_counts и обновляются одним SQL-выражением
+на пачку новых строк staging (id больше водяного знака в
+etl.reference_watermarks), поэтому обновление стоит O(новых строк) и не
+обращается к Google Sheets.
+
+Считается последняя версия каждой строки листа (source_row_id), как в
+исходном листе: посчитанные значения строки хранятся в etl.reference_rows,
+и новая версия строки вычитает старые значения перед добавлением своих.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from src.core.constants import REFERENCE_STATS_BATCH_SIZE, REFERENCE_STATS_COLUMNS
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Граница пачки новых строк: (последний id, число строк)
+BATCH_BOUNDS_SQL = """
+    SELECT MAX(id), COUNT(*) FROM (
+        SELECT id FROM staging.{table}
+        WHERE id > :last_id
+        ORDER BY id
+        LIMIT :limit
+    ) batch
+"""
+
+# Все CTE видят снимок до выражения: old_values - значения до upsert в saved
+UPDATE_COUNTS_SQL = """
+    WITH latest AS (
+        SELECT DISTINCT ON (source_row_id) source_row_id, {columns}
+        FROM staging.{table}
+        WHERE id > :last_id AND id <= :upper_id AND source_row_id IS NOT NULL
+        ORDER BY source_row_id, id DESC
+    ),
+    new_values AS (
+        SELECT l.source_row_id, v.stat, NULLIF(btrim(v.value), '') AS value
+        FROM latest l
+        CROSS JOIN LATERAL (VALUES {values}) AS v(stat, value)
+    ),
+    old_values AS (
+        SELECT r.stat, r.value
+        FROM etl.reference_rows r
+        JOIN latest l ON r.source_row_id = l.source_row_id
+        WHERE r.source_table = :table AND r.value IS NOT NULL
+    ),
+    saved AS (
+        INSERT INTO etl.reference_rows (source_table, source_row_id, stat, value)
+        SELECT :table, source_row_id, stat, value FROM new_values
+        ON CONFLICT (source_table, source_row_id, stat) DO UPDATE SET value = EXCLUDED.value
+    ),
+    delta AS (
+        SELECT stat, value, SUM(d) AS d FROM (
+            SELECT stat, value, 1 AS d FROM new_values WHERE value IS NOT NULL
+            UNION ALL
+            SELECT stat, value, -1 FROM old_values
+        ) changes
+        GROUP BY stat, value
+        HAVING SUM(d) <> 0
+    )
+    INSERT INTO etl.reference_counts AS c (stat, value, count)
+    SELECT stat, value, d FROM delta
+    ON CONFLICT (stat, value) DO UPDATE SET count = c.count + EXCLUDED.count
+"""
+
+SELECT_COUNTS_SQL = """
+    SELECT stat, value, count FROM etl.reference_counts
+    WHERE count > 0
+    ORDER BY stat, count DESC, value
+"""
+
+
+@dataclass
+class ReferenceStatsResult:
+    """Итоги одного обновления статистики."""
+    rows_processed: int = 0
+    batches: int = 0
+
+
+class ReferenceStats:
+    """Частоты значений справочников по водяным знакам staging.id."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        stats_columns: Mapping[str, Mapping[str, str]] = REFERENCE_STATS_COLUMNS,
+        batch_size: int = REFERENCE_STATS_BATCH_SIZE,
+    ):
+        self.engine = engine
+        self.stats_columns = stats_columns
+        self.batch_size = batch_size
+
+    def run(self, rebuild: bool = False) -> ReferenceStatsResult:
+        """
+        Обновляет etl.reference_counts по новым строкам staging.
+
+        Args:
+            rebuild: Сбросить счетчики и водяные знаки и пересчитать все строки
+        """
+        if rebuild:
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    "TRUNCATE etl.reference_counts, etl.reference_rows, etl.reference_watermarks"
+                ))
+            logger.info("🧹 Статистика справочников сброшена, пересчет с начала")
+
+        result = ReferenceStatsResult()
+        for table, columns in self.stats_columns.items():
+            self._update_table(table, columns, result)
+
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM etl.reference_counts WHERE count <= 0"))
+        logger.info(f"✅ Статистика справочников: {result.rows_processed} новых строк, "
+                    f"{result.batches} пачек")
+        return result
+
+    def counts(self) -> Dict[str, List[Tuple[str, int]]]:
+        """Частоты по статистикам: stat -> [(значение, количество)] по убыванию."""
+        counts: Dict[str, List[Tuple[str, int]]] = {}
+        with self.engine.connect() as conn:
+            for stat, value, count in conn.execute(text(SELECT_COUNTS_SQL)):
+                counts.setdefault(stat, []).append((value, int(count)))
+        return counts
+
+    def _update_table(self, table: str, columns: Mapping[str, str], result: ReferenceStatsResult) -> None:
+        existing = self._columns(table)
+        if existing is None:
+            return
+        columns = {c: stat for c, stat in columns.items() if c in existing}
+        if not columns:
+            return
+        sql = text(UPDATE_COUNTS_SQL.format(
+            table=table,
+            columns=', '.join(columns),
+            values=', '.join(f"('{stat}', CAST(l.{c} AS text))" for c, stat in columns.items()),
+        ))
+
+        while True:
+            with self.engine.begin() as conn:
+                last_id = conn.execute(text(
+                    "SELECT last_id FROM etl.reference_watermarks WHERE source_table = :table"
+                ), {'table': table}).scalar() or 0
+                upper_id, rows = conn.execute(text(BATCH_BOUNDS_SQL.format(table=table)), {
+                    'last_id': last_id, 'limit': self.batch_size,
+                }).fetchone()
+                if upper_id is None:
+                    break
+                conn.execute(sql, {'table': table, 'last_id': last_id, 'upper_id': upper_id})
+                conn.execute(text("""
+                    INSERT INTO etl.reference_watermarks (source_table, last_id)
+                    VALUES (:table, :last_id)
+                    ON CONFLICT (source_table) DO UPDATE
+                    SET last_id = EXCLUDED.last_id, updated_at = NOW()
+                """), {'table': table, 'last_id': upper_id})
+            result.batches += 1
+            result.rows_processed += rows
+            logger.info(f"   📊 {table}: учтено {rows} строк (до id {upper_id})")
+
+    def _columns(self, table: str) -> Optional[set]:
+        with self.engine.connect() as conn:
+            columns = conn.execute(text("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = 'staging' AND table_name = :table
+            """), {'table': table}).scalars().all()
+        if not columns:
+            logger.info(f"ℹ️ staging.{table} еще не создана, пропуск")
+            return None
+        return set(columns)
@@ -0,0 +1,169 @@
+"""
+Очистка и хеширование одной большой таблицы на нескольких ядрах.
+
+DataFrame делится на непрерывные блоки строк, блоки обрабатываются
+(clean_dataframe + add_row_hashes) в пуле процессов и склеиваются в
+исходном порядке. Данные передаются через разделяемую память в формате
+Arrow IPC, а не pickle: исходная таблица записывается в shared memory
+один раз, каждый процесс читает из нее свой срез без копирования, а
+результат возвращает так же — через свой блок shared memory.
+
+Результат совпадает с prepare_frame в одном процессе: строки
+обрабатываются независимо, а формат дат, который pandas угадывает по
+первому значению столбца, определяется по всему столбцу заранее
+(infer_date_formats).
+"""
+import sys
+from concurrent.futures import Executor, wait
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.core.constants import ROW_SHARD_MIN_ROWS
+from src.core.manifest import CleaningPlan
+from src.etl.data_cleaner import clean_dataframe, infer_date_formats
+from src.etl.loader import add_row_hashes
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def shard_count(rows: int, cpu_workers: int) -> int:
+    """Число блоков для таблицы: не больше ядер и не меньше ROW_SHARD_MIN_ROWS строк в блоке."""
+    return max(1, min(cpu_workers, rows // ROW_SHARD_MIN_ROWS))
+
+
+def shard_bounds(rows: int, shards: int) -> List[Tuple[int, int]]:
+    """Границы [start, stop) непрерывных блоков почти равного размера."""
+    step, extra = divmod(rows, shards)
+    bounds, start = [], 0
+    for i in range(shards):
+        stop = start + step + (1 if i < extra else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def _shared_memory(name: Optional[str] = None, size: int = 0, track: bool = True) -> shared_memory.SharedMemory:
+    """
+    Открывает (name) или создает блок shared memory.
+
+    В дочерних процессах блоки не регистрируются в resource tracker:
+    удаляет их родитель, а трекер дочернего процесса иначе удалил бы
+    чужие блоки при своем завершении.
+    """
+    if track:
+        return shared_memory.SharedMemory(name=name, create=name is None, size=size)
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=name is None, size=size, track=False)
+    shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _write_shared(table: pa.Table, track: bool = True) -> Tuple[str, int]:
+    """Записывает таблицу в новый блок shared memory (Arrow IPC stream)."""
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    size = sink.size()
+
+    shm = _shared_memory(size=size, track=track)
+    try:
+        buffer = pa.py_buffer(shm.buf)
+        stream = pa.FixedSizeBufferWriter(buffer)
+        writer = pa.ipc.new_stream(stream, table.schema)
+        writer.write_table(table)
+        writer.close()
+        stream.close()
+        # Пока живы объекты Arrow поверх блока, его нельзя закрыть
+        del writer, stream, buffer
+    finally:
+        shm.close()
+    return shm.name, size
+
+
+def _read_shared(name: str, size: int, start: int = 0, stop: Optional[int] = None,
+                 track: bool = True) -> pd.DataFrame:
+    """Читает срез таблицы из shared memory в DataFrame (данные копируются из блока)."""
+    shm = _shared_memory(name, track=track)
+    try:
+        view = shm.buf[:size]
+        table = pa.ipc.open_stream(pa.py_buffer(view)).read_all()
+        if stop is not None:
+            table = table.slice(start, stop - start)
+        df = table.to_pandas().copy()
+        for field in table.schema:
+            # Пропуски bool-колонки Arrow возвращает как None, а .map в clean_dataframe дает NaN
+            if pa.types.is_boolean(field.type) and table.column(field.name).null_count:
+                df[field.name] = df[field.name].where(df[field.name].notna(), np.nan)
+        # Буферы Arrow ссылаются на блок: освобождаем их до закрытия
+        del table
+        view.release()
+    finally:
+        shm.close()
+    return df
+
+
+def _prepare_shard(
+    name: str, size: int, start: int, stop: int,
+    table_name: str, cleaning: Optional[CleaningPlan], date_formats: Dict[str, str]
+) -> Tuple[str, int]:
+    """Обработка одного блока в дочернем процессе; результат - в новом блоке shared memory."""
+    df = _read_shared(name, size, start, stop, track=False)
+    df = add_row_hashes(clean_dataframe(df, table_name, cleaning, date_formats))
+    return _write_shared(pa.Table.from_pandas(df, preserve_index=False), track=False)
+
+
+def _unlink(name: str) -> None:
+    shm = _shared_memory(name)
+    shm.close()
+    shm.unlink()
+
+
+def prepare_frame_sharded(
+    df: pd.DataFrame,
+    table_name: str,
+    cleaning: Optional[CleaningPlan],
+    cpu_pool: Executor,
+    shards: int,
+) -> pd.DataFrame:
+    """
+    Очистка + хеширование DataFrame блоками строк в пуле процессов cpu_pool.
+
+    Если таблицу нельзя представить в Arrow (смешанные типы в колонке),
+    она обрабатывается в текущем процессе.
+    """
+    from src.etl.parallel_loader import prepare_frame
+
+    date_formats = infer_date_formats(df, cleaning)
+    try:
+        source = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        logger.debug(f"{table_name}: Arrow недоступен ({e}), подготовка в одном процессе")
+        return prepare_frame(df, table_name, cleaning)
+
+    name, size = _write_shared(source)
+    del source
+    futures = [
+        cpu_pool.submit(_prepare_shard, name, size, start, stop, table_name, cleaning, date_formats)
+        for start, stop in shard_bounds(len(df), shards)
+    ]
+    # Дожидаемся всех блоков, даже если один упал: иначе результаты остальных не удалить
+    wait(futures)
+    outputs = [f.result() for f in futures if f.exception() is None]
+    try:
+        for future in futures:
+            if future.exception() is not None:
+                raise future.exception()
+        parts = [_read_shared(out_name, out_size) for out_name, out_size in outputs]
+    finally:
+        for shm_name in [name] + [out_name for out_name, _ in outputs]:
+            _unlink(shm_name)
+
+    result = pd.concat(parts, ignore_index=True)
+    result.index = df.index
+    return result
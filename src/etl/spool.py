@@ -0,0 +1,292 @@
+"""
+Локальный спул загрузок на случай недоступности БД.
+
+Если запись в staging не удалась из-за недоступности БД (is_connectivity_error),
+уже очищенный и хешированный DataFrame сохраняется в spool/ (Parquet) и
+регистрируется в manifest.json. Ошибки самих данных (приведение типов,
+ограничения) в спул не попадают - они пробрасываются как ошибка таблицы.
+Повторная загрузка (replay) идет строго в порядке записи через обычный путь
+DataLoader.write_staging, без обращений к Google Sheets.
+
+Спул общий для всех процессов хоста (--workers N, --daemon, cron): изменения
+манифеста и replay выполняются под межпроцессной блокировкой файла .lock
+(fcntl.flock), поэтому батчи не теряются и не загружаются дважды.
+"""
+import json
+import os
+import shutil
+import socket
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только между потоками процесса
+    fcntl = None
+
+import pandas as pd
+
+from src.core.constants import (
+    CONNECTION_SQLSTATE_CLASS,
+    SERVER_SHUTDOWN_SQLSTATES,
+    SPOOL_DIR_NAME,
+    SPOOL_QUARANTINE_DIR_NAME,
+    TRANSIENT_SQLSTATES,
+)
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+LOCK_FILE = '.lock'
+
+
+@dataclass(frozen=True)
+class SpoolEntry:
+    """Одна отложенная загрузка."""
+    seq: int
+    file: str
+    target_table: str
+    source_name: str
+    rows: int
+    created_at: str
+    error: str
+
+
+def sqlstate(error: BaseException) -> Optional[str]:
+    """SQLSTATE ответа Postgres: psycopg2 (внутри ошибки SQLAlchemy) или asyncpg."""
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) or getattr(error, 'sqlstate', None)
+
+
+def is_connectivity_error(error: BaseException) -> bool:
+    """
+    Ошибка связи с БД (повтор позже может пройти), а не ошибка данных или схемы.
+
+    Только такие ошибки откладывают батч в спул: плохое приведение типа или
+    нарушение ограничения повторится при каждой загрузке. Если сервер ответил
+    кодом ошибки, связь есть - кроме класса 08 и остановки сервера; deadlock,
+    statement_timeout и нехватка места к связи не относятся.
+    """
+    from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError, OperationalError
+
+    if isinstance(error, (DisconnectionError, InterfaceError)):
+        return True
+    code = sqlstate(error)
+    if code is not None:
+        return code.startswith(CONNECTION_SQLSTATE_CLASS) or code in SERVER_SHUTDOWN_SQLSTATES
+    if isinstance(error, DBAPIError):
+        # Ответа сервера нет: не удалось подключиться или соединение оборвалось
+        return error.connection_invalidated or isinstance(error, OperationalError)
+    # Подключение asyncpg: отказ, таймаут, не разрешилось имя хоста
+    return isinstance(error, (ConnectionError, TimeoutError, socket.gaierror))
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Ошибка, которая пройдет при повторе: связь с БД, deadlock, конфликт блокировок, таймаут запроса."""
+    return is_connectivity_error(error) or sqlstate(error) in TRANSIENT_SQLSTATES
+
+
+def default_spool_dir() -> Path:
+    return Path(__file__).parent.parent.parent / SPOOL_DIR_NAME
+
+
+def to_arrow_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Приводит object-колонки со смешанными типами к строкам.
+
+    Parquet требует один тип на колонку; row_hash уже посчитан, а Postgres
+    приведет строковые литералы к типам колонок при вставке.
+    """
+    mixed = [
+        col for col in df.columns
+        if df[col].dtype == object
+        and pd.api.types.infer_dtype(df[col], skipna=True).startswith('mixed')
+    ]
+    if not mixed:
+        return df
+    df = df.copy()
+    for col in mixed:
+        df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return df
+
+
+class LoadSpool:
+    """Каталог Parquet-файлов с манифестом, упорядоченным по seq."""
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory else default_spool_dir()
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory / MANIFEST_FILE
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Монопольный доступ к спулу для потоков и процессов хоста.
+
+        Повторный вход в том же потоке не блокируется: replay_spool держит
+        блокировку, пока remove и quarantine меняют манифест.
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._lock_file = open(self.directory / LOCK_FILE, 'a+')
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    # Закрытие файла снимает flock
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def pending(self) -> List[SpoolEntry]:
+        """Отложенные загрузки в порядке записи."""
+        if not self.manifest_path.exists():
+            return []
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            entries = [SpoolEntry(**e) for e in json.load(f)]
+        return sorted(entries, key=lambda e: e.seq)
+
+    def _write_manifest(self, entries: List[SpoolEntry]) -> None:
+        # Запись через временный файл: манифест не бывает наполовину записан
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump([asdict(e) for e in entries], f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def put(self, df: pd.DataFrame, target_table: str, source_name: str, error: str) -> SpoolEntry:
+        """Сохраняет подготовленный батч и добавляет его в конец манифеста."""
+        with self.locked():
+            entries = self.pending()
+            seq = entries[-1].seq + 1 if entries else 1
+            file_name = f"{seq:06d}_{target_table}.parquet"
+            to_arrow_safe(df).to_parquet(self.directory / file_name, index=False)
+
+            entry = SpoolEntry(
+                seq=seq,
+                file=file_name,
+                target_table=target_table,
+                source_name=source_name,
+                rows=len(df),
+                created_at=datetime.now().isoformat(timespec='seconds'),
+                error=error,
+            )
+            self._write_manifest(entries + [entry])
+        logger.warning(f"💾 {target_table}: {len(df)} строк отложено в спул ({file_name})")
+        return entry
+
+    def has_pending(self, target_table: str) -> bool:
+        return any(e.target_table == target_table for e in self.pending())
+
+    def read(self, entry: SpoolEntry) -> pd.DataFrame:
+        return pd.read_parquet(self.directory / entry.file)
+
+    def remove(self, entry: SpoolEntry) -> None:
+        """Удаляет загруженный батч из манифеста и с диска."""
+        with self.locked():
+            self._write_manifest([e for e in self.pending() if e.seq != entry.seq])
+            (self.directory / entry.file).unlink(missing_ok=True)
+
+    @property
+    def quarantine_dir(self) -> Path:
+        return self.directory / SPOOL_QUARANTINE_DIR_NAME
+
+    def quarantine(self, entry: SpoolEntry, error: str) -> Path:
+        """
+        Убирает из очереди батч, который не загружается из-за данных: файл
+        переносится в quarantine/ (с описанием в quarantine/manifest.json)
+        для ручного разбора, остальные батчи продолжают загружаться.
+        """
+        with self.locked():
+            self.quarantine_dir.mkdir(parents=True, exist_ok=True)
+            target = self.quarantine_dir / entry.file
+            if (self.directory / entry.file).exists():
+                shutil.move(str(self.directory / entry.file), str(target))
+
+            manifest_path = self.quarantine_dir / MANIFEST_FILE
+            quarantined = []
+            if manifest_path.exists():
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    quarantined = json.load(f)
+            quarantined.append(asdict(replace(entry, error=error)))
+            tmp_path = manifest_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(quarantined, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, manifest_path)
+
+            self._write_manifest([e for e in self.pending() if e.seq != entry.seq])
+        return target
+
+
+def replay_spool(loader, spool: LoadSpool) -> int:
+    """
+    Загружает отложенные батчи по порядку через loader.write_staging.
+
+    На ошибке связи с БД или временной ошибке сервера (deadlock, таймаут
+    запроса) останавливается, чтобы более поздние версии строк
+    не обогнали ранние; закоммиченные чанки повторно отсечет ON CONFLICT.
+    Батч, который не загружается из-за самих данных, уходит в карантин,
+    а очередь продолжается (иначе он блокировал бы спул навсегда).
+    Replay целиком идет под блокировкой спула: параллельный процесс
+    дождется его и увидит уже загруженные батчи удаленными.
+
+    Returns:
+        Количество загруженных (новых) строк
+    """
+    if not spool.pending():
+        return 0
+
+    with spool.locked():
+        entries = spool.pending()
+        if not entries:
+            return 0
+        logger.info(f"📤 Загрузка спула: {len(entries)} батчей")
+        inserted = 0
+        for entry in entries:
+            try:
+                df = spool.read(entry)
+                inserted += loader.write_staging(df, entry.target_table, entry.source_name)
+            except Exception as e:
+                if is_transient_error(e):
+                    logger.error(f"❌ Спул остановлен на {entry.file}: {e}")
+                    raise
+                path = spool.quarantine(entry, f"{type(e).__name__}: {e}")
+                logger.error(f"☣️ {entry.file} не загружается ({type(e).__name__}: {e}), перенесен в {path}")
+                continue
+            spool.remove(entry)
+    logger.info(f"✅ Спул загружен: {inserted} новых строк")
+    return inserted
+
+
+def run_replay() -> None:
+    """Точка входа main.py --replay-spool."""
+    from src.config import load_config
+    from src.db import get_db_engine
+    from src.etl.loader import DataLoader
+
+    config = load_config()
+    if not config.get('SUPABASE_DB_URL'):
+        print("❌ Ошибка: Нет подключения к БД")
+        return
+
+    engine = get_db_engine(config)
+    try:
+        spool = LoadSpool()
+        if not spool.pending():
+            logger.info("ℹ️ Спул пуст")
+            return
+        replay_spool(DataLoader(engine, pooler_mode=config.get('DB_POOLER', False)), spool)
+    finally:
+        engine.dispose()
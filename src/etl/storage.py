@@ -0,0 +1,292 @@
+"""
+Бэкенды хранилища staging: Postgres (Supabase) и встроенный DuckDB.
+
+DataLoader и DiffPlanner обращаются к БД через StorageBackend: проверка
+таблицы и ее колонок, сравнение хешей строк со staging, вставка чанка с
+ON CONFLICT DO NOTHING и применение схемы. Бэкенд выбирается по диалекту
+engine (backend_for): postgresql://... - PostgresBackend, duckdb:///<файл> -
+DuckDBBackend, чтобы весь пайплайн можно было запустить и измерить на
+ноутбуке без Postgres.
+
+Остальное состояние (etl.etl_runs, etl.sheet_watermarks, etl.metrics)
+пишется переносимым SQL и работает на обоих бэкендах без изменений.
+"""
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.core.constants import CORE_PARTITIONED_TABLES, DDL_LOCK_TIMEOUT_MS, PARTITIONED_TABLES
+from src.etl.partitions import ensure_year_partitions, partition_years
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA_DIR = Path(__file__).parent.parent / 'db'
+
+# Сравнение хешей кадра со staging без записи. unnest в списке SELECT (а не
+# unnest(a, b) во FROM) - чтобы выражение выполнялось и в Postgres, и в DuckDB
+HASH_DIFF_SQL = """
+    WITH incoming AS (
+        SELECT unnest(CAST(:hashes AS uuid[])) AS row_hash,
+               unnest(CAST(:row_ids AS integer[])) AS source_row_id
+    ), flagged AS (
+        SELECT
+            i.row_hash,
+            i.source_row_id,
+            EXISTS (SELECT 1 FROM staging.{table} s WHERE s.row_hash = i.row_hash) AS present
+        FROM incoming i
+    )
+    SELECT
+        COUNT(DISTINCT row_hash) FILTER (WHERE NOT present),
+        COUNT(*) FILTER (WHERE present),
+        (SELECT COUNT(*) FROM staging.{table} s
+         WHERE s.source_row_id IN (SELECT source_row_id FROM flagged WHERE NOT present))
+    FROM flagged
+"""
+
+# Средний размер строки на диске (по всем партициям)
+ROW_WIDTH_SQL = """
+    SELECT COALESCE(SUM(pg_table_size(p.relid)), 0), COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)
+    FROM pg_partition_tree(CAST(:table AS regclass)) p
+    JOIN pg_class c ON c.oid = p.relid
+"""
+
+PG_COLUMNS_SQL = """
+    SELECT attname FROM pg_attribute
+    WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped
+"""
+
+# Партиционированные таблицы core (до миграции 04 core.sales - обычная таблица)
+CORE_PARTITIONED_SQL = """
+    SELECT c.relname FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'core' AND c.relkind = 'p'
+"""
+
+STAGING_COLUMNS_SQL = """
+    SELECT column_name FROM information_schema.columns
+    WHERE table_schema = 'staging' AND table_name = :table
+"""
+
+# Имя, под которым чанк DataFrame виден в запросе DuckDB (в пределах соединения)
+DUCKDB_CHUNK_VIEW = 'incoming_chunk'
+
+
+def infer_sql_type(series: pd.Series) -> str:
+    """Тип новой колонки по данным после очистки (одинаковый для Postgres и DuckDB)."""
+    kind = pd.api.types.infer_dtype(series, skipna=True)
+    if kind == 'boolean':
+        return 'BOOLEAN'
+    if kind in ('datetime64', 'datetime', 'date'):
+        return 'TIMESTAMP'
+    if kind == 'integer':
+        return 'BIGINT'
+    if kind in ('floating', 'decimal', 'mixed-integer-float'):
+        return 'NUMERIC'
+    return 'TEXT'
+
+
+def conflict_columns(table_name: str) -> List[str]:
+    """Колонки уникального ключа дедупликации таблицы в Postgres."""
+    partition_column = PARTITIONED_TABLES.get(table_name)
+    # В партиционированной таблице уникальный индекс обязан включать ключ партиции
+    return ['row_hash', partition_column] if partition_column else ['row_hash']
+
+
+def insert_on_conflict_do_nothing(conflict_cols: List[str]):
+    """
+    Метод вставки для DataFrame.to_sql: INSERT ... ON CONFLICT (<ключ>) DO NOTHING.
+
+    Дедупликация выполняется сервером по уникальному индексу за один
+    round trip на чанк. Метод возвращает число реально вставленных строк.
+    """
+    def method(pd_table, conn, keys, data_iter) -> int:
+        rows = [dict(zip(keys, row)) for row in data_iter]
+        stmt = pg_insert(pd_table.table).values(rows).on_conflict_do_nothing(
+            index_elements=conflict_cols
+        )
+        return conn.execute(stmt).rowcount
+    return method
+
+
+class StorageBackend(ABC):
+    """Операции загрузчика и планировщика, которые зависят от БД."""
+
+    name = ''
+    schema_file = ''
+    # Встроенная БД в файле: без pooler mode и записи через asyncpg
+    embedded = False
+
+    def conflict_columns(self, table_name: str) -> List[str]:
+        """Колонки уникального ключа дедупликации (цель ON CONFLICT)."""
+        return ['row_hash']
+
+    @abstractmethod
+    def table_exists(self, conn, table_name: str) -> bool:
+        """Есть ли таблица staging.<table_name>."""
+
+    @abstractmethod
+    def table_columns(self, conn, table_name: str) -> Set[str]:
+        """Колонки таблицы staging.<table_name>."""
+
+    @abstractmethod
+    def create_table(self, conn, df: pd.DataFrame, table_name: str) -> None:
+        """Создает таблицу staging по DataFrame с уникальным индексом дедупликации."""
+
+    @abstractmethod
+    def insert_rows(self, conn, df: pd.DataFrame, table_name: str) -> int:
+        """Вставляет чанк с ON CONFLICT DO NOTHING; возвращает число новых строк."""
+
+    def add_columns(self, conn, statements: List[str]) -> None:
+        """Выполняет ALTER TABLE ... ADD COLUMN для новых колонок листа."""
+        for statement in statements:
+            conn.execute(text(statement))
+
+    def ensure_partitions(self, conn, df: pd.DataFrame, table_name: str) -> None:
+        """Создает недостающие партиции под данные (если таблица партиционирована)."""
+
+    def ensure_core_partitions(self, conn, years: List[int]) -> None:
+        """Создает годовые партиции партиционированных таблиц core (перед записью в core)."""
+
+    def begin_read_only(self, conn) -> None:
+        """Переводит транзакцию планировщика в режим только чтения (если поддерживается)."""
+
+    def diff_hashes(self, conn, table_name: str, hashes: List[str], row_ids: List) -> Tuple[int, int, int]:
+        """
+        Сравнивает хеши кадра со staging на стороне БД.
+
+        Returns:
+            (новых уникальных row_hash, уже есть в staging, вытесняемых версий строк)
+        """
+        row = conn.execute(
+            text(HASH_DIFF_SQL.format(table=table_name)),
+            {'hashes': hashes, 'row_ids': row_ids}
+        ).fetchone()
+        return int(row[0]), int(row[1]), int(row[2])
+
+    def table_size(self, conn, table_name: str) -> Tuple[int, int]:
+        """(байт на диске, строк); (0, 0) - размер неизвестен, оценка по кадру."""
+        return 0, 0
+
+    def apply_schema(self, engine) -> Path:
+        """Применяет схему бэкенда (идемпотентно). Возвращает путь к файлу схемы."""
+        schema_path = SCHEMA_DIR / self.schema_file
+        with engine.begin() as conn:
+            conn.execute(text(schema_path.read_text(encoding='utf-8')))
+        return schema_path
+
+
+class PostgresBackend(StorageBackend):
+    """Postgres / Supabase: годовые партиции исторических таблиц и блокировки DDL."""
+
+    name = 'postgres'
+    schema_file = 'final_schema.sql'
+
+    def conflict_columns(self, table_name: str) -> List[str]:
+        return conflict_columns(table_name)
+
+    def table_exists(self, conn, table_name: str) -> bool:
+        return conn.execute(text(f"SELECT to_regclass('staging.{table_name}')")).scalar() is not None
+
+    def table_columns(self, conn, table_name: str) -> Set[str]:
+        return {r[0] for r in conn.execute(text(PG_COLUMNS_SQL), {'table': f"staging.{table_name}"})}
+
+    def create_table(self, conn, df: pd.DataFrame, table_name: str) -> None:
+        df.head(0).to_sql(table_name, conn, schema='staging', if_exists='fail', index=False)
+        conn.execute(text(f"ALTER TABLE staging.{table_name} ALTER COLUMN row_hash TYPE uuid USING row_hash::uuid"))
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX uq_staging_{table_name}_row_hash "
+            f"ON staging.{table_name}({', '.join(self.conflict_columns(table_name))}) NULLS NOT DISTINCT"
+        ))
+
+    def insert_rows(self, conn, df: pd.DataFrame, table_name: str) -> int:
+        return df.to_sql(
+            table_name,
+            conn,
+            schema='staging',
+            if_exists='append',
+            index=False,
+            method=insert_on_conflict_do_nothing(self.conflict_columns(table_name))
+        ) or 0
+
+    def add_columns(self, conn, statements: List[str]) -> None:
+        # Не ждем долго ACCESS EXCLUSIVE блокировку за чужими запросами
+        conn.execute(text(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT_MS}ms'"))
+        super().add_columns(conn, statements)
+
+    def ensure_partitions(self, conn, df: pd.DataFrame, table_name: str) -> None:
+        partition_column = PARTITIONED_TABLES.get(table_name)
+        if partition_column and partition_column in df.columns:
+            ensure_year_partitions(conn, 'staging', table_name, partition_years(df[partition_column]))
+
+    def ensure_core_partitions(self, conn, years: List[int]) -> None:
+        partitioned = set(conn.execute(text(CORE_PARTITIONED_SQL)).scalars())
+        for table_name in CORE_PARTITIONED_TABLES:
+            if table_name not in partitioned:
+                logger.warning(f"⚠️ core.{table_name} не партиционирована (миграция 04 не применена), партиции пропущены")
+                continue
+            ensure_year_partitions(conn, 'core', table_name, years)
+
+    def begin_read_only(self, conn) -> None:
+        conn.execute(text("SET TRANSACTION READ ONLY"))
+
+    def table_size(self, conn, table_name: str) -> Tuple[int, int]:
+        table_bytes, table_rows = conn.execute(text(ROW_WIDTH_SQL), {'table': f"staging.{table_name}"}).fetchone()
+        return int(table_bytes), int(table_rows)
+
+
+class DuckDBBackend(StorageBackend):
+    """
+    Встроенный DuckDB в одном файле (duckdb:///planeta_local.duckdb).
+
+    Схема - src/db/final_schema_duckdb.sql: те же схемы и таблицы, без
+    партиций, поэтому ключ дедупликации всех таблиц - row_hash. Чанк
+    вставляется одним INSERT ... SELECT из DataFrame, зарегистрированного в
+    DuckDB без копирования (векторная вставка вместо многострочного VALUES).
+    """
+
+    name = 'duckdb'
+    schema_file = 'final_schema_duckdb.sql'
+    embedded = True
+
+    def table_exists(self, conn, table_name: str) -> bool:
+        return bool(self.table_columns(conn, table_name))
+
+    def table_columns(self, conn, table_name: str) -> Set[str]:
+        return {r[0] for r in conn.execute(text(STAGING_COLUMNS_SQL), {'table': table_name})}
+
+    def create_table(self, conn, df: pd.DataFrame, table_name: str) -> None:
+        columns = ', '.join(
+            f'"{col}" {"UUID" if col == "row_hash" else infer_sql_type(df[col])}' for col in df.columns
+        )
+        conn.execute(text(f"CREATE TABLE staging.{table_name} ({columns})"))
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX uq_staging_{table_name}_row_hash ON staging.{table_name}(row_hash)"
+        ))
+
+    def insert_rows(self, conn, df: pd.DataFrame, table_name: str) -> int:
+        from src.etl.spool import to_arrow_safe
+
+        columns = ', '.join(f'"{col}"' for col in df.columns)
+        # Соединение DuckDB той же транзакции SQLAlchemy (чанк и контрольная точка коммитятся вместе)
+        duckdb_conn = conn.connection.driver_connection
+        # Смешанные object-колонки - строками: DuckDB приведет их к типам колонок при вставке
+        duckdb_conn.register(DUCKDB_CHUNK_VIEW, to_arrow_safe(df))
+        try:
+            return duckdb_conn.execute(
+                f"INSERT INTO staging.{table_name} ({columns}) "
+                f"SELECT {columns} FROM {DUCKDB_CHUNK_VIEW} ON CONFLICT (row_hash) DO NOTHING"
+            ).fetchone()[0]
+        finally:
+            duckdb_conn.unregister(DUCKDB_CHUNK_VIEW)
+
+
+def backend_for(engine) -> StorageBackend:
+    """Бэкенд хранилища по диалекту engine."""
+    if engine.dialect.name == 'duckdb':
+        return DuckDBBackend()
+    return PostgresBackend()
@@ -1,63 +1,217 @@
-"""Centralized logging configuration for the project."""
+"""Centralized logging configuration for the project.
+
+All loggers share one QueueHandler; a single background QueueListener thread
+writes records to the console and to one run-scoped log file
+(logs/etl_<YYYYmmdd_HHMMSS>.log). Logging calls therefore only enqueue a
+record and never block the pipeline on I/O.
+
+Environment:
+    ETL_LOG_FORMAT=json  - write structured JSON lines instead of plain text
+"""
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.core.constants import (
+    LOG_FORMAT,
+    LOG_DATE_FORMAT,
+    LOG_FILE_PREFIX,
+    LOG_RATE_LIMIT_COUNT,
+    LOG_RATE_LIMIT_WINDOW,
+)
+
+# Standard LogRecord attributes; anything else came in via `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limits WARNING records per call site (file + line).
+
+    At most LOG_RATE_LIMIT_COUNT records pass per LOG_RATE_LIMIT_WINDOW seconds;
+    the first record of the next window reports how many were suppressed.
+    Per-row warnings in large loads therefore cannot flood the queue.
+    """
+
+    def __init__(self, count: int = LOG_RATE_LIMIT_COUNT, window: float = LOG_RATE_LIMIT_WINDOW):
+        super().__init__()
+        self.count = count
+        self.window = window
+        self._sites: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.WARNING:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            # [window_start, passed, suppressed]
+            state = self._sites.setdefault(key, [now, 0, 0])
+            if now - state[0] >= self.window:
+                suppressed = state[2]
+                state[:] = [now, 0, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} (ещё {suppressed} похожих предупреждений подавлено)"
+            if state[1] >= self.count:
+                state[2] += 1
+                return False
+            state[1] += 1
+            return True
+
+
+class _ProcessAwareQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that falls back to direct stderr output in forked children.
+
+    Worker processes of a pool inherit the handler, but not the listener
+    thread, so records put into the queue there would never be written.
+    """
+
+    def __init__(self, log_queue: queue.Queue, formatter: logging.Formatter):
+        super().__init__(log_queue)
+        self._owner_pid = os.getpid()
+        self._fallback = logging.StreamHandler(sys.stderr)
+        self._fallback.setFormatter(formatter)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if os.getpid() != self._owner_pid:
+            self._fallback.emit(record)
+        else:
+            super().emit(record)
+
+
+_queue_handler: Optional[logging.Handler] = None
+_console_handler: Optional[logging.Handler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_run_log_file: Optional[Path] = None
+_setup_lock = threading.Lock()
+
+
+def _build_formatter() -> logging.Formatter:
+    if os.environ.get('ETL_LOG_FORMAT', '').lower() == 'json':
+        return JsonFormatter()
+    return logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+
+
+def _start_listener(log_to_file: bool, level: int) -> logging.Handler:
+    """Creates the shared queue handler and starts the background writer thread."""
+    global _queue_handler, _console_handler, _listener, _run_log_file
+
+    formatter = _build_formatter()
+    handlers = []
+
+    _console_handler = logging.StreamHandler(sys.stdout)
+    _console_handler.setLevel(level)
+    _console_handler.setFormatter(formatter)
+    handlers.append(_console_handler)
+
+    if log_to_file:
+        log_dir = Path(__file__).parent.parent / "logs"
+        log_dir.mkdir(exist_ok=True)
+
+        _run_log_file = log_dir / f"{LOG_FILE_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+        file_handler = logging.FileHandler(_run_log_file, encoding='utf-8', delay=True)
+        file_handler.setLevel(logging.DEBUG)  # File gets all levels
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    # Unbounded queue: put() never blocks the caller
+    log_queue: queue.Queue = queue.Queue(-1)
+    _queue_handler = _ProcessAwareQueueHandler(log_queue, formatter)
+    _queue_handler.addFilter(RateLimitFilter())
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _queue_handler
+
+
+def shutdown_logging() -> None:
+    """Flushes queued records and stops the writer thread."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_run_log_file() -> Optional[Path]:
+    """Path of the current run log file (None if file logging is off)."""
+    return _run_log_file
 
 
 def setup_logger(name: str = "etl", level: int = logging.INFO, log_to_file: bool = True) -> logging.Logger:
     """
-    Configures and returns a logger with console and optional file handlers.
-    
+    Configures and returns a logger attached to the shared logging queue.
+
     Args:
         name: Logger name (usually module or pipeline name)
-        level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-        log_to_file: Whether to write logs to file
-    
+        level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL); the shared
+            console handler is lowered to the most verbose level requested
+        log_to_file: Whether the run log file is written (only the first call decides)
+
     Returns:
         Configured logger instance
     """
     logger = logging.getLogger(name)
-    
+
     # Avoid duplicate handlers if logger already configured
     if logger.handlers:
         return logger
-    
+
+    with _setup_lock:
+        handler = _queue_handler or _start_listener(log_to_file, level)
+        # The logger's own level still filters records of other loggers
+        if _console_handler is not None and level < _console_handler.level:
+            _console_handler.setLevel(level)
+
     logger.setLevel(level)
-    
-    # Format
-    formatter = logging.Formatter(
-        fmt='%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # File handler (optional)
-    if log_to_file:
-        log_dir = Path(__file__).parent.parent / "logs"
-        log_dir.mkdir(exist_ok=True)
-        
-        log_file = log_dir / f"{name}_{datetime.now().strftime('%Y%m%d')}.log"
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)  # File gets all levels
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
+    logger.addHandler(handler)
+    logger.propagate = False
+
     return logger
 
 
 def get_logger(name: str) -> logging.Logger:
     """
     Get or create a logger for a specific module.
-    
+
     Args:
         name: Logger name (usually __name__)
-    
+
     Returns:
         Logger instance
     """
@@ -0,0 +1,73 @@
+"""
+Разрешение клиентов: staging.clients_* -> core.clients и client_id
+в продажах и тренировках (см. src/etl/entity_resolution.py).
+
+Режим: инкрементальный (только новые строки staging). Без миграции 06
+шаг пропускается с предупреждением, чтобы --scope all не падал на
+неподготовленной БД.
+"""
+from typing import List, Optional
+
+from src.config import load_config
+from src.db import get_db_engine
+from src.etl.entity_resolution import ClientResolver, ResolutionStats
+from src.etl.partitions import upcoming_years
+from src.etl.storage import backend_for
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def sync_clients(engine) -> Optional[ResolutionStats]:
+    """
+    Шаг staging -> core на готовом engine.
+
+    Returns:
+        Итоги разрешения или None, если таблицы разрешения не созданы
+    """
+    # Партиции core.sales текущего и следующего года, чтобы новые продажи
+    # не попадали в DEFAULT партицию
+    with engine.begin() as conn:
+        backend_for(engine).ensure_core_partitions(conn, upcoming_years())
+
+    resolver = ClientResolver(engine)
+    missing = resolver.missing_tables()
+    if missing:
+        logger.warning(
+            f"⚠️ Нет {', '.join(missing)} (миграция 06 не применена), разрешение клиентов пропущено"
+        )
+        return None
+    logger.info("👤 Разрешение клиентов...")
+    return resolver.run()
+
+
+class ClientsSyncTask:
+    """Разрешение клиентов как задача планировщика --daemon (интерфейс run/last_errors пайплайна)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.last_errors: List[str] = []
+
+    def run(self, source_names: Optional[List[str]] = None) -> list:
+        sync_clients(self.engine)
+        # Строк в staging не загружается - результатов чтения нет
+        return []
+
+
+def run_clients_sync(resume: bool = False):
+    config = load_config()
+    db_url = config.get('SUPABASE_DB_URL')
+
+    if not db_url:
+        print("❌ Ошибка: Нет подключения к БД")
+        return
+
+    engine = get_db_engine(config)
+    try:
+        sync_clients(engine)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    run_clients_sync()
@@ -1,29 +1,13 @@
-import json
-from typing import Dict
-
 from src.core.etl_pipeline import ETLPipeline
 from src.config import load_config
-import os
-import sqlalchemy
+from src.db import get_db_engine
 
 class HistoricalSyncPipeline(ETLPipeline):
-    def get_source_mapping(self) -> Dict[str, str]:
-        return {
-            'historical_sales': 'sales_hst',
-            'historical_expenses': 'expenses_hst',
-            'historical_trainings': 'trainings_hst',
-            'clients_data': 'clients_hst'
-        }
-    
-    def get_column_mappings(self) -> Dict[str, Dict[str, str]]:
-        # Загружаем маппинг из файла
-        mapping_path = os.path.join(os.path.dirname(__file__), '../config/column_mappings.json')
-        if os.path.exists(mapping_path):
-            with open(mapping_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+    # Источники и таблицы описаны в sources.json; маппинг колонок из
+    # config/column_mappings.json компилируется в манифест один раз
+    pipeline_name = 'historical'
 
-def run_historical_sync():
+def run_historical_sync(resume: bool = False):
     config = load_config()
     db_url = config.get('SUPABASE_DB_URL')
     
@@ -31,10 +15,10 @@ def run_historical_sync():
         print("❌ Ошибка: Нет подключения к БД")
         return
         
-    engine = sqlalchemy.create_engine(db_url)
+    engine = get_db_engine(config)
     
     pipeline = HistoricalSyncPipeline(config, engine)
-    pipeline.run()
+    pipeline.run(resume=resume)
 
 if __name__ == "__main__":
     run_historical_sync()
@@ -11,7 +11,7 @@ from src.logger import get_logger
 logger = get_logger(__name__)
 
 
-def run_references_sync():
+def run_references_sync(resume: bool = False):
     logger.info("Запуск синхронизации справочников...")
     # TODO: Реализовать логику
     pass
@@ -1,7 +1,54 @@
 """Модуль для работы с Google Sheets API (только чтение)."""
 import gspread
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
 from oauth2client.service_account import ServiceAccountCredentials
 import os
+import re
+import requests
+
+from src.core.constants import SHEETS_READ_TIMEOUT
+from src.core.rate_limiter import (
+    RETRYABLE_STATUS_CODES,
+    RetryableError,
+    get_sheets_rate_limiter,
+)
+
+
+class RateLimitedHTTPClient(HTTPClient):
+    """
+    HTTP-клиент gspread, пропускающий каждый запрос через общий RateLimiter.
+
+    Все обращения к API (метаданные таблицы, поиск листа, чтение значений)
+    расходуют общую квоту, поэтому ограничение стоит на уровне HTTP.
+    """
+
+    def request(self, *args, **kwargs):
+        def do_request():
+            try:
+                return super(RateLimitedHTTPClient, self).request(*args, **kwargs)
+            except APIError as e:
+                status = e.response.status_code
+                if status in RETRYABLE_STATUS_CODES:
+                    raise RetryableError(status, _parse_retry_after(e.response)) from e
+                raise
+            except (requests.ConnectionError, requests.Timeout) as e:
+                raise RetryableError(503) from e
+
+        try:
+            return get_sheets_rate_limiter().call(do_request)
+        except RetryableError as e:
+            # Повторы исчерпаны: отдаем исходную ошибку gspread/requests
+            raise e.__cause__
+
+
+def _parse_retry_after(response):
+    """Читает заголовок Retry-After (в секундах), если он есть."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
 
 
 def get_sheets_client(config):
@@ -33,7 +80,8 @@ def get_sheets_client(config):
     
     try:
         creds = ServiceAccountCredentials.from_json_keyfile_name(creds_file, scope)
-        client = gspread.authorize(creds)
+        client = gspread.authorize(creds, http_client=RateLimitedHTTPClient)
+        client.set_timeout(SHEETS_READ_TIMEOUT)
         return client
     except Exception as e:
         raise Exception(f"Error connecting to Google Sheets: {e}")
@@ -99,3 +147,51 @@ def read_sheet_data(gc, spreadsheet_id, sheet_identifier, range_str=None, use_gi
         return data
     except Exception as e:
         raise Exception(f"Ошибка при чтении данных: {e}")
+
+
+_A1_RANGE_RE = re.compile(r'^([A-Z]+)(\d+)?:([A-Z]+)(\d+)?$')
+
+
+def parse_a1_range(range_str):
+    """
+    Разбирает диапазон A1 вида "A1:R" / "B4:W100".
+
+    Returns:
+        tuple: (start_col, start_row, end_col, end_row); end_row = None для открытых диапазонов
+
+    Raises:
+        ValueError: Если диапазон не в поддерживаемом формате
+    """
+    match = _A1_RANGE_RE.match(range_str.strip().upper()) if range_str else None
+    if not match:
+        raise ValueError(f"Неподдерживаемый диапазон: {range_str!r}")
+
+    start_col, start_row, end_col, end_row = match.groups()
+    return (
+        start_col,
+        int(start_row) if start_row else 1,
+        end_col,
+        int(end_row) if end_row else None,
+    )
+
+
+def read_sheet_ranges(gc, spreadsheet_id, sheet_identifier, ranges, use_gid=False):
+    """
+    Читает несколько диапазонов одного листа за один запрос values:batchGet.
+    
+    Args:
+        gc: Авторизованный gspread клиент
+        spreadsheet_id (str): ID таблицы
+        sheet_identifier (str): Название листа или gid
+        ranges (list): Диапазоны в нотации A1 (без имени листа)
+        use_gid (bool): True - использовать gid, False - использовать название
+    
+    Returns:
+        list: Список данных (список списков) для каждого диапазона
+    """
+    try:
+        spreadsheet = gc.open_by_key(spreadsheet_id)
+        worksheet = get_worksheet(spreadsheet, sheet_identifier, use_gid)
+        return [list(values) for values in worksheet.batch_get(ranges)]
+    except Exception as e:
+        raise Exception(f"Ошибка при чтении данных: {e}")
@@ -0,0 +1,155 @@
+"""
+Компакция и обслуживание staging таблиц.
+
+Список таблиц берется из манифеста (src/sources.json): target_table
+источников пайплайнов current и historical.
+
+1. Текущие таблицы (пайплайн current): оставляет последнюю загруженную версию каждой
+   строки листа (source_row_id), старые версии удаляет. Дубликатов по row_hash
+   не бывает - их исключает уникальный индекс staging.
+2. Удаление идет пачками на стороне БД (DELETE ... WHERE id IN (SELECT ... LIMIT n)),
+   каждая пачка - отдельная короткая транзакция, без долгих блокировок.
+3. Затронутые таблицы обрабатываются VACUUM (ANALYZE) (или только ANALYZE).
+4. Печатает размеры таблиц и индексов до/после и освобожденные байты.
+
+Использование:
+    python -m src.utils.compact_staging [--dry-run] [--batch-size N] [--analyze-only]
+"""
+import argparse
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+
+from src.config import load_config
+from src.core.constants import COMPACTION_BATCH_SIZE
+from src.core.manifest import Manifest, load_manifest
+from src.db import get_db_engine
+
+# Старые версии строки листа: все, кроме последней загруженной
+SUPERSEDED_SQL = """
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (PARTITION BY source_row_id ORDER BY id DESC) AS rn
+        FROM staging.{table}
+        WHERE source_row_id IS NOT NULL
+    ) v
+    WHERE rn > 1
+"""
+
+COUNT_SUPERSEDED_SQL = "SELECT COUNT(*) FROM (" + SUPERSEDED_SQL + ") s"
+
+# Одна пачка: id выбираются и удаляются сервером, в Python ничего не грузится
+DELETE_SUPERSEDED_SQL = "DELETE FROM staging.{table} WHERE id IN (" + SUPERSEDED_SQL + "LIMIT :batch_size)"
+
+# Для партиционированных таблиц суммируем по всем партициям
+SIZES_SQL = """
+    SELECT
+        COALESCE(SUM(pg_table_size(relid)), 0),
+        COALESCE(SUM(pg_indexes_size(relid)), 0)
+    FROM pg_partition_tree(CAST(:table AS regclass))
+"""
+
+
+def format_bytes(n: int) -> str:
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def pipeline_tables(manifest: Manifest, pipeline: str) -> List[str]:
+    """Таблицы staging источников пайплайна (без повторов, в порядке манифеста)."""
+    return list(dict.fromkeys(manifest.source_mapping(pipeline).values()))
+
+
+def table_sizes(conn, table: str) -> Tuple[int, int]:
+    """Размер данных (с TOAST) и индексов таблицы в байтах."""
+    row = conn.execute(text(SIZES_SQL), {'table': f"staging.{table}"}).fetchone()
+    return int(row[0]), int(row[1])
+
+
+def delete_in_batches(engine, table: str, batch_size: int) -> int:
+    """Удаляет старые версии пачками, пока они есть; каждая пачка - отдельная транзакция."""
+    statement = text(DELETE_SUPERSEDED_SQL.format(table=table))
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            batch = conn.execute(statement, {'batch_size': batch_size}).rowcount
+        deleted += batch
+        if batch < batch_size:
+            return deleted
+
+
+def compact_table(engine, table: str, current: bool, batch_size: int, dry_run: bool) -> Dict[str, int]:
+    """Находит и удаляет устаревшие версии строк одной таблицы (только current)."""
+    stats = {'superseded': 0, 'deleted': 0}
+    if not current:
+        return stats
+    with engine.connect() as conn:
+        stats['superseded'] = conn.execute(text(COUNT_SUPERSEDED_SQL.format(table=table))).scalar()
+    if stats['superseded'] and not dry_run:
+        stats['deleted'] = delete_in_batches(engine, table, batch_size)
+    return stats
+
+
+def compact_staging(batch_size: int = COMPACTION_BATCH_SIZE, dry_run: bool = False, analyze_only: bool = False):
+    print("🧹 Компакция staging таблиц...")
+
+    config = load_config()
+    if not config.get('SUPABASE_DB_URL'):
+        print("❌ Ошибка: SUPABASE_DB_URL не найден.")
+        return
+
+    engine = get_db_engine(config)
+    # VACUUM нельзя выполнять внутри транзакции
+    maintenance_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+
+    manifest = load_manifest()
+    current_tables = pipeline_tables(manifest, 'current')
+    tables = current_tables + pipeline_tables(manifest, 'historical')
+
+    total_before = total_after = 0
+    try:
+        for table in tables:
+            with engine.connect() as conn:
+                if conn.execute(text(f"SELECT to_regclass('staging.{table}')")).scalar() is None:
+                    print(f"   ⚠️ staging.{table}: таблица не найдена")
+                    continue
+                data_before, index_before = table_sizes(conn, table)
+
+            stats = compact_table(engine, table, table in current_tables, batch_size, dry_run)
+
+            if stats['deleted']:
+                command = 'ANALYZE' if analyze_only else 'VACUUM (ANALYZE)'
+                with maintenance_engine.connect() as conn:
+                    conn.execute(text(f"{command} staging.{table}"))
+
+            with engine.connect() as conn:
+                data_after, index_after = table_sizes(conn, table)
+
+            total_before += data_before + index_before
+            total_after += data_after + index_after
+
+            result = f"к удалению {stats['superseded']}" if dry_run else f"удалено {stats['deleted']}"
+            print(f"   ✅ staging.{table}: старых версий {stats['superseded']}, {result}")
+            print(f"      данные {format_bytes(data_before)} -> {format_bytes(data_after)}, "
+                  f"индексы {format_bytes(index_before)} -> {format_bytes(index_after)}")
+    finally:
+        engine.dispose()
+
+    print(f"\n📊 Итого: {format_bytes(total_before)} -> {format_bytes(total_after)}, "
+          f"освобождено {format_bytes(total_before - total_after)}")
+    if not analyze_only and not dry_run:
+        print("   ℹ️ VACUUM делает место доступным для повторного использования; "
+              "файлы сжимаются только при освобождении страниц в конце таблицы.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Staging compaction and retention')
+    parser.add_argument('--batch-size', type=int, default=COMPACTION_BATCH_SIZE,
+                        help='Rows deleted per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+    parser.add_argument('--analyze-only', action='store_true', help='Run ANALYZE instead of VACUUM (ANALYZE)')
+    args = parser.parse_args()
+
+    compact_staging(args.batch_size, args.dry_run, args.analyze_only)
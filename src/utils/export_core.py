@@ -0,0 +1,48 @@
+"""
+Выгрузка core.sales, core.trainings, core.expenses и core.clients в Parquet
+(партиции по месяцу) и DuckDB для локальной аналитики (см. src/etl/parquet_export.py).
+
+Переписываются только месяцы, изменившиеся с прошлой выгрузки.
+
+Использование:
+    python -m src.utils.export_core [--output export] [--full]
+
+В ноутбуке:
+    import duckdb
+    con = duckdb.connect('export/planeta.duckdb', read_only=True)
+    con.sql("SELECT month, SUM(amount) FROM core.sales GROUP BY 1 ORDER BY 1")
+"""
+import argparse
+from pathlib import Path
+
+from src.config import load_config
+from src.core.constants import EXPORT_DIR, EXPORT_DUCKDB_FILE
+from src.db import get_db_engine
+from src.etl.parquet_export import CoreExporter
+
+
+def export_core(output_dir=EXPORT_DIR, full=False):
+    print(f"🚀 Выгрузка core.* в {output_dir}/ ...")
+
+    config = load_config()
+    engine = get_db_engine(config)
+    try:
+        results = CoreExporter(engine, Path(output_dir)).run(full)
+    finally:
+        engine.dispose()
+
+    for r in results:
+        if r.skipped:
+            print(f"   {r.table:<16} без изменений")
+        else:
+            print(f"   {r.table:<16} переписано месяцев: {r.written} ({r.rows_written} строк), "
+                  f"удалено: {r.deleted}, без изменений: {r.unchanged}")
+    print(f"\n✅ DuckDB: {Path(output_dir) / EXPORT_DUCKDB_FILE}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incremental Parquet/DuckDB export of core tables')
+    parser.add_argument('--output', default=EXPORT_DIR, help=f'Export directory (default {EXPORT_DIR})')
+    parser.add_argument('--full', action='store_true', help='Rewrite every month partition')
+    args = parser.parse_args()
+    export_core(args.output, args.full)
@@ -1,133 +1,69 @@
+"""
+Статистика справочников (references_stats.json) по данным staging.
 
+Частоты считаются инкрементально (см. src/etl/reference_stats.py):
+обновление обрабатывает только новые строки staging.sales_hst /
+trainings_hst и не читает Google Sheets. Нужна миграция 08.
+
+Использование:
+    python -m src.utils.generate_references [--rebuild] [--output references_stats.json]
+"""
+import argparse
 import json
-import pandas as pd
-from collections import Counter
 
 from src.config import load_config
-from src.sheets import get_sheets_client, read_sheet_data
-
-def normalize_name(name):
-    if not name:
-        return None
-    return str(name).strip()
-
-def generate_references():
-    print("🚀 Запуск генерации справочников из исторических данных...")
-    
-    config = load_config()
-    gc = get_sheets_client(config)
-    
-    # 1. Читаем Продажи (historical_sales)
-    print("\n📊 Чтение исторических продаж...")
-    sales_config = config['SOURCES'].get('historical_sales')
-    if not sales_config:
-        print("❌ Конфигурация historical_sales не найдена")
-        return
+from src.db import get_db_engine
+from src.etl.reference_stats import ReferenceStats
 
-    # Берем первый лист (обычно он один)
-    sheet_id = sales_config['sheet_identifiers'][0]
-    data_sales = read_sheet_data(
-        gc, 
-        sales_config['spreadsheet_id'], 
-        sheet_id, 
-        sales_config['ranges'][sheet_id], 
-        sales_config['use_gid']
-    )
-    
-    df_sales = pd.DataFrame(data_sales[1:], columns=data_sales[0])
-    print(f"   Прочитано {len(df_sales)} строк продаж")
+OUTPUT_FILE = 'references_stats.json'
 
-    # 2. Читаем Тренировки (historical_trainings)
-    print("\n🏋️‍♂️ Чтение исторических тренировок...")
-    trainings_config = config['SOURCES'].get('historical_trainings')
-    if not trainings_config:
-        print("❌ Конфигурация historical_trainings не найдена")
-        return
 
-    sheet_id_tr = trainings_config['sheet_identifiers'][0]
-    data_trainings = read_sheet_data(
-        gc, 
-        trainings_config['spreadsheet_id'], 
-        sheet_id_tr, 
-        trainings_config['ranges'][sheet_id_tr], 
-        trainings_config['use_gid']
-    )
-    
-    df_trainings = pd.DataFrame(data_trainings[1:], columns=data_trainings[0])
-    print(f"   Прочитано {len(df_trainings)} строк тренировок")
+def format_counts(counts):
+    """Формирует вывод вида "Значение (Кол-во)"."""
+    return [f"{value} ({count})" for value, count in counts]
 
-    # --- АНАЛИЗ ДАННЫХ ---
-    
-    # --- АНАЛИЗ ДАННЫХ ---
-    
-    # Используем Counter для подсчета частоты
-    stats = {
-        "employees": {
-            "trainers": Counter(),
-            "admins": Counter()
-        },
-        "products": Counter(),
-        "types": Counter(),
-        "categories": Counter()
-    }
-    
-    # 1. Сотрудники
-    if 'Тренер' in df_sales.columns:
-        trainers = df_sales['Тренер'].dropna().apply(normalize_name).tolist()
-        stats['employees']['trainers'].update(trainers)
-        
-    if 'Админ' in df_sales.columns:
-        admins = df_sales['Админ'].dropna().apply(normalize_name).tolist()
-        stats['employees']['admins'].update(admins)
-        
-    if 'Сотрудник' in df_trainings.columns:
-        trainers_tr = df_trainings['Сотрудник'].dropna().apply(normalize_name).tolist()
-        stats['employees']['trainers'].update(trainers_tr)
 
-    # 2. Продукты
-    if 'Продукт' in df_sales.columns:
-        products = df_sales['Продукт'].dropna().apply(normalize_name).tolist()
-        stats['products'].update(products)
-        
-    # 3. Типы и Категории
-    if 'Тип' in df_sales.columns:
-        stats['types'].update(df_sales['Тип'].dropna().apply(normalize_name).tolist())
-    if 'Категория' in df_sales.columns:
-        stats['categories'].update(df_sales['Категория'].dropna().apply(normalize_name).tolist())
-        
-    if 'Тип' in df_trainings.columns:
-        stats['types'].update(df_trainings['Тип'].dropna().apply(normalize_name).tolist())
-    if 'Категория' in df_trainings.columns:
-        stats['categories'].update(df_trainings['Категория'].dropna().apply(normalize_name).tolist())
+def generate_references(rebuild=False, output_file=OUTPUT_FILE):
+    print("🚀 Обновление статистики справочников по staging...")
 
-    # --- СОХРАНЕНИЕ ---
-    
-    # Формируем красивый вывод: "Значение (Кол-во)"
-    def format_counter(counter):
-        return [f"{k} ({v})" for k, v in counter.most_common()]
+    config = load_config()
+    engine = get_db_engine(config)
+    try:
+        stats = ReferenceStats(engine)
+        result = stats.run(rebuild)
+        counts = stats.counts()
+    finally:
+        engine.dispose()
+    print(f"   Новых строк staging: {result.rows_processed}")
 
     output = {
         "employees": {
-            "trainers_by_count": format_counter(stats['employees']['trainers']),
-            "admins_by_count": format_counter(stats['employees']['admins'])
+            "trainers_by_count": format_counts(counts.get('trainers', [])),
+            "admins_by_count": format_counts(counts.get('admins', []))
         },
-        "products_by_count": format_counter(stats['products']),
-        "types_by_count": format_counter(stats['types']),
-        "categories_by_count": format_counter(stats['categories'])
+        "products_by_count": format_counts(counts.get('products', [])),
+        "types_by_count": format_counts(counts.get('types', [])),
+        "categories_by_count": format_counts(counts.get('categories', []))
     }
-    
-    output_file = 'references_stats.json'
+
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(output, f, ensure_ascii=False, indent=2)
-        
+
     print(f"\n✅ Статистика справочников сохранена в '{output_file}'")
     print("\n🏆 Топ-5 Тренеров:")
     for item in output['employees']['trainers_by_count'][:5]:
         print(f"   - {item}")
-        
+
     print("\n🏆 Топ-5 Продуктов:")
     for item in output['products_by_count'][:5]:
         print(f"   - {item}")
 
+
 if __name__ == '__main__':
-    generate_references()
+    parser = argparse.ArgumentParser(description='Статистика справочников по staging')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Сбросить счетчики и пересчитать по всем строкам staging')
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f'Файл статистики (по умолчанию {OUTPUT_FILE})')
+    args = parser.parse_args()
+    generate_references(args.rebuild, args.output)
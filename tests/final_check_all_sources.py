@@ -1,13 +1,17 @@
 """
 Финальная проверка всех источников данных перед согласованием схемы БД.
 Читает данные и создает детальный отчет.
+
+Сетка листов берется одним запросом метаданных на таблицу, значения всех
+листов таблицы - одним запросом batchGet (см. src/core/fetch_planner.py).
 """
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from src.config import load_config
-from src.sheets import get_sheets_client, read_sheet_data
+from src.core.fetch_planner import FetchPlanner, FetchRequest
+from src.sheets import get_sheets_client
 import json
 
 
@@ -27,6 +31,42 @@ def final_data_check():
     total_sources = len(sources)
     successful = 0
     failed = 0
+
+    configured = {
+        name: cfg for name, cfg in sources.items()
+        if cfg.get('spreadsheet_id') not in ["SPREADSHEET_ID_HERE", "ПРОВЕРЬТЕ_ДОСТУП"]
+    }
+
+    # Один запрос метаданных и один batchGet на таблицу вместо чтения каждого листа
+    planner = FetchPlanner(gc)
+    sheet_data = {}
+    by_spreadsheet = {}
+    for source_name, source_config in configured.items():
+        for sheet_id in source_config.get('sheet_identifiers', []):
+            by_spreadsheet.setdefault(source_config['spreadsheet_id'], []).append((source_name, sheet_id))
+
+    for spreadsheet_id, sheets in by_spreadsheet.items():
+        try:
+            planner.load([spreadsheet_id])
+            requests = [
+                FetchRequest(sheet_id, configured[name].get('ranges', {}).get(sheet_id),
+                             configured[name].get('use_gid', False))
+                for name, sheet_id in sheets
+            ]
+            for key, data in zip(sheets, planner.read_batch(spreadsheet_id, requests)):
+                sheet_data[key] = data
+        except Exception as e:
+            # Ошибка всей таблицы (например, лист не найден) - читаем листы по одному
+            print(f"⚠️  {spreadsheet_id}: пакетное чтение не удалось ({e}), читаем по листам")
+            for name, sheet_id in sheets:
+                try:
+                    sheet_data[(name, sheet_id)] = planner.read(
+                        spreadsheet_id, sheet_id,
+                        configured[name].get('ranges', {}).get(sheet_id),
+                        configured[name].get('use_gid', False)
+                    )
+                except Exception as sheet_error:
+                    sheet_data[(name, sheet_id)] = sheet_error
     
     for i, (source_name, source_config) in enumerate(sources.items(), 1):
         print(f"\n[{i}/{total_sources}] {source_name}")
@@ -38,7 +78,7 @@ def final_data_check():
         use_gid = source_config.get('use_gid', False)
         hint = source_config.get('_hint', '')
         
-        if spreadsheet_id in ["SPREADSHEET_ID_HERE", "ПРОВЕРЬТЕ_ДОСТУП"]:
+        if source_name not in configured:
             print(f"⚠️  Пропускаем - не настроен spreadsheet_id")
             failed += 1
             continue
@@ -49,43 +89,40 @@ def final_data_check():
             'sheets': {}
         }
         
-        try:
-            for sheet_id in sheet_identifiers:
-                range_str = ranges.get(sheet_id)
-                
-                try:
-                    data = read_sheet_data(gc, spreadsheet_id, sheet_id, range_str, use_gid)
-                    
-                    if not data:
-                        print(f"   ⚠️  {hint or sheet_id}: диапазон пустой")
-                        continue
-                    
-                    rows = len(data)
-                    cols = len(data[0]) if data else 0
-                    headers = data[0] if data else []
-                    
-                    print(f"   ✅ {hint or sheet_id}: {rows} строк × {cols} колонок")
-                    print(f"      Range: {range_str}")
-                    print(f"      Колонки: {', '.join(headers[:5])}...")
-                    
-                    source_result['sheets'][sheet_id] = {
-                        'rows': rows,
-                        'columns': cols,
-                        'headers': headers,
-                        'range': range_str
-                    }
-                    
-                    successful += 1
-                    
-                except Exception as e:
-                    print(f"   ❌ Ошибка: {e}")
-                    failed += 1
+        for sheet_id in sheet_identifiers:
+            range_str = ranges.get(sheet_id)
+            data = sheet_data.get((source_name, sheet_id), [])
             
-            results[source_name] = source_result
+            if isinstance(data, Exception):
+                print(f"   ❌ Ошибка: {data}")
+                failed += 1
+                continue
             
-        except Exception as e:
-            print(f"   ❌ Критическая ошибка: {e}")
-            failed += 1
+            if not data:
+                print(f"   ⚠️  {hint or sheet_id}: диапазон пустой")
+                continue
+            
+            rows = len(data)
+            cols = len(data[0]) if data else 0
+            headers = data[0] if data else []
+            grid = planner.grid(spreadsheet_id, sheet_id, use_gid)
+            
+            print(f"   ✅ {hint or sheet_id}: {rows} строк × {cols} колонок")
+            print(f"      Range: {range_str} (сетка листа: {grid.row_count} × {grid.column_count})")
+            print(f"      Колонки: {', '.join(headers[:5])}...")
+            
+            source_result['sheets'][sheet_id] = {
+                'rows': rows,
+                'columns': cols,
+                'headers': headers,
+                'range': range_str,
+                'grid_rows': grid.row_count,
+                'grid_columns': grid.column_count
+            }
+            
+            successful += 1
+        
+        results[source_name] = source_result
     
     # Сохраняем отчет
     output_path = 'tests/final_sources_report.json'
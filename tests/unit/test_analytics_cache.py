@@ -0,0 +1,142 @@
+"""Кеш аналитического API: LRU, TTL, сброс по версиям таблиц и ETag."""
+import threading
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from src.api import cache as cache_module
+from src.api.analytics import AnalyticsService, Query, make_handler
+from src.api.cache import CacheEntry, ResponseCache
+
+
+def entry(etag='"v1"', tables=('core.sales',), created_at=0.0):
+    return CacheEntry(etag, b'{}', 'application/json', tables, created_at)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.put('a', entry())
+    cache.put('b', entry())
+    assert cache.get('a', '"v1"') is not None   # a становится самым свежим
+    cache.put('c', entry())
+
+    assert cache.get('b', '"v1"') is None
+    assert cache.get('a', '"v1"') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = ResponseCache(ttl_seconds=60)
+    cache.put('a', entry(created_at=0.0))
+    clock[0] = 61.0
+    assert cache.get('a', '"v1"') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_other_etag_is_a_miss(clock):
+    cache = ResponseCache()
+    cache.put('a', entry('"v1"'))
+    assert cache.get('a', '"v2"') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_invalidate_drops_only_dependent_entries(clock):
+    cache = ResponseCache()
+    cache.put('sales', entry(tables=('core.sales',)))
+    cache.put('trainings', entry(tables=('core.trainings',)))
+    assert cache.invalidate(['core.sales']) == 1
+    assert cache.get('trainings', '"v1"') is not None
+
+
+class FakeEngine:
+    """Версии таблиц и одна строка отчета; считает запросы к отчетам."""
+
+    def __init__(self, versions):
+        self.versions = versions
+        self.report_queries = 0
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    def execute(self, statement, params=None):
+        if 'etl.table_versions' in str(statement):
+            return list(self.versions.items())
+        self.report_queries += 1
+        return FakeReportResult()
+
+
+class FakeReportResult:
+    def keys(self):
+        return ['month', 'total_revenue']
+
+    def __iter__(self):
+        return iter([('2025-01-01', 100)])
+
+
+def test_etag_changes_only_with_report_tables():
+    engine = FakeEngine({'core.sales': 1, 'core.trainings': 1})
+    service = AnalyticsService(engine)
+    service.refresh_versions()
+    revenue, trainings = Query('revenue'), Query('trainings')
+    revenue_tag, trainings_tag = service.etag(revenue), service.etag(trainings)
+    service.fetch(revenue, revenue_tag)
+
+    engine.versions = {'core.sales': 2, 'core.trainings': 1}
+    service.refresh_versions()
+    assert service.etag(revenue) != revenue_tag
+    assert service.etag(trainings) == trainings_tag
+    assert service.cache.stats()['entries'] == 0
+
+
+def test_etag_is_none_without_versions():
+    service = AnalyticsService(FakeEngine({}))
+    assert service.etag(Query('revenue')) is None
+
+
+@pytest.fixture
+def api():
+    engine = FakeEngine({'core.sales': 1})
+    service = AnalyticsService(engine)
+    service.refresh_versions()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(service))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield engine, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, etag=None):
+    request = urllib.request.Request(url, headers={'If-None-Match': etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers.get('ETag'), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get('ETag'), e.read()
+
+
+def test_if_none_match_is_served_without_database(api):
+    engine, base = api
+    status, etag, body = get(f"{base}/api/monthly_revenue")
+    assert status == 200 and etag and b'total_revenue' in body
+
+    assert get(f"{base}/api/monthly_revenue", etag)[:2] == (304, etag)
+    # Без ETag ответ берется из кеша процесса
+    assert get(f"{base}/api/monthly_revenue")[0] == 200
+    assert engine.report_queries == 1
+
+
+def test_bad_parameters_return_400(api):
+    _, base = api
+    assert get(f"{base}/api/revenue?period=decade")[0] == 400
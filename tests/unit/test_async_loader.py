@@ -0,0 +1,50 @@
+"""Асинхронный конвейер: недоступная при открытии пула БД уводит данные в спул."""
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.etl.async_loader import AsyncDataLoader, AsyncLoadPipeline, SourceItem
+from src.etl.loader import DataLoader
+from src.etl.parallel_loader import LoadTask
+from src.etl.spool import LoadSpool
+
+
+class UnreachableLoader(AsyncDataLoader):
+    """asyncpg.create_pool на недоступном хосте падает с ConnectionRefusedError."""
+
+    opened = 0
+
+    async def open(self) -> None:
+        self.opened += 1
+        raise ConnectionRefusedError(111, 'Connect call failed')
+
+
+@pytest.fixture
+def sync_loader(tmp_path):
+    engine = create_engine(f"duckdb:///{tmp_path / 'etl.duckdb'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE SCHEMA staging"))
+    yield DataLoader(engine, spool=LoadSpool(tmp_path / 'spool'))
+    engine.dispose()
+
+
+def test_pool_failure_spools_each_table(sync_loader):
+    frames = {
+        'sales_cur': pd.DataFrame({'data': ['01.01.2025', '02.01.2025'], 'summa': ['1', '2']}),
+        'trainings_cur': pd.DataFrame({'data': ['03.01.2025'], 'summa': ['3']}),
+    }
+    loader = UnreachableLoader('postgresql://etl@127.0.0.1:1/etl', sync_loader)
+
+    def read_task(item):
+        return LoadTask(item.source_name, item.target_table, frames[item.target_table].copy())
+
+    pipeline = AsyncLoadPipeline(loader, read_task, cpu_workers=1, db_workers=2)
+    results = pipeline.run([SourceItem(table, table) for table in frames])
+
+    assert {r.target_table: (r.ok, r.rows_loaded, r.rows_spooled) for r in results} == {
+        'sales_cur': (True, 0, 2),
+        'trainings_cur': (True, 0, 1),
+    }
+    assert loader.opened == 2
+    assert loader.pool is None
+    assert sorted(e.target_table for e in sync_loader.spool.pending()) == ['sales_cur', 'trainings_cur']
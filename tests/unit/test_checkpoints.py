@@ -0,0 +1,41 @@
+"""Контрольные точки: с какой строки продолжать загрузку после падения."""
+from src.core.checkpoints import TableCheckpoint
+
+
+def make_checkpoint(rows_committed=0, boundary_hash=None):
+    return TableCheckpoint(1, 'sales_cur', 'sales', rows_committed, boundary_hash)
+
+
+def test_fresh_checkpoint_starts_from_zero():
+    assert make_checkpoint().resume_offset(['a', 'b', 'c']) == 0
+
+
+def test_resume_after_committed_chunk():
+    checkpoint = make_checkpoint(2, 'b')
+    assert checkpoint.resume_offset(['a', 'b', 'c', 'd']) == 2
+    assert checkpoint.rows_committed == 2
+
+
+def test_fully_committed_table_resumes_at_end():
+    assert make_checkpoint(3, 'c').resume_offset(['a', 'b', 'c']) == 3
+
+
+def test_changed_boundary_row_resets_checkpoint():
+    checkpoint = make_checkpoint(2, 'b')
+    assert checkpoint.resume_offset(['a', 'x', 'c']) == 0
+    assert checkpoint.rows_committed == 0
+    assert checkpoint.boundary_hash is None
+
+
+def test_shrunk_frame_resets_checkpoint():
+    checkpoint = make_checkpoint(5, 'e')
+    assert checkpoint.resume_offset(['a', 'b']) == 0
+    assert checkpoint.rows_committed == 0
+
+
+def test_advance_updates_state_in_memory():
+    checkpoint = make_checkpoint()
+    checkpoint.advance(1000, 'h', completed=False)
+    assert (checkpoint.rows_committed, checkpoint.boundary_hash, checkpoint.completed) == (1000, 'h', False)
+    checkpoint.advance(1500, 'z', completed=True)
+    assert checkpoint.completed
@@ -0,0 +1,85 @@
+"""Нормализация телефонов и имен и ключи блокировки клиентов."""
+import hashlib
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from src.etl.entity_resolution import (
+    NAME_KEY,
+    ClientResolver,
+    PHONE_KEY,
+    client_keys,
+    key_hashes,
+    mention_keys,
+    normalize_names,
+    normalize_phones,
+    prepare_clients,
+)
+from src.pipelines.clients_sync import sync_clients
+
+
+def test_normalize_phones():
+    phones = pd.Series([
+        '+7 (912) 345-67-89',
+        '89123456789',
+        '9123456789',
+        '8 912 345 67 89, 8 900 000 00 00',
+        '12345',
+        None,
+    ])
+    assert normalize_phones(phones).tolist() == [
+        '79123456789', '79123456789', '79123456789', '79123456789', None, None,
+    ]
+
+
+def test_normalize_names_ignores_case_order_and_punctuation():
+    names = pd.Series(['Иванова Алёна', 'алена  ИВАНОВА!', 'Маша 2', '---', None])
+    assert normalize_names(names).tolist() == [
+        'алена иванова', 'алена иванова', 'маша', None, None,
+    ]
+
+
+def test_key_hashes_are_md5_of_kind_and_value():
+    hashes = key_hashes(PHONE_KEY, pd.Series(['79123456789', None]))
+    assert hashes.tolist() == [hashlib.md5(b'phone:79123456789').hexdigest(), None]
+
+
+def test_mention_key_prefers_phone_in_text():
+    mentions = mention_keys(pd.Series(['Маша 8-912-345-67-89', 'Маша Иванова']))
+    assert mentions[0] == key_hashes(PHONE_KEY, pd.Series(['79123456789']))[0]
+    assert mentions[1] == key_hashes(NAME_KEY, pd.Series(['иванова маша']))[0]
+
+
+def test_prepare_clients_builds_natural_key_and_merges_repeats():
+    df = pd.DataFrame({
+        'mobilnyy': ['8 912 345 67 89', '+79123456789', None],
+        'imya_rebenka': ['Маша Иванова', 'маша иванова', 'Петя'],
+        'data_rozhdeniya_rebenka': ['2019-05-01', None, None],
+        'instruktor': [None, ' Ольга ', None],
+        'klient': ['Иванова Анна', None, 'Петров'],
+        'imya_vzroslogo': ['Анна', None, None],
+        'familiya_vzroslogo': ['Иванова', None, None],
+    })
+    clients = prepare_clients(df)
+
+    # Строка без телефона пропущена, повторы одного клиента слиты
+    assert clients['client_id'].tolist() == ['79123456789_иванова_маша']
+    client = clients.iloc[0]
+    assert client['assigned_trainer'] == 'Ольга'
+    assert str(client['child_birthdate']) == '2019-05-01'
+
+    keys = client_keys(clients)
+    # klient и имя взрослого дают один ключ имени
+    assert sorted(keys['key_kind']) == [NAME_KEY, PHONE_KEY]
+
+
+def test_resolution_is_skipped_without_migration(tmp_path):
+    engine = create_engine(f"duckdb:///{tmp_path / 'etl.duckdb'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE SCHEMA core"))
+        conn.execute(text("CREATE TABLE core.client_keys (key_hash UUID)"))
+    try:
+        assert ClientResolver(engine).missing_tables() == ['etl.resolution_watermarks', 'etl.client_link_pending']
+        assert sync_clients(engine) is None
+    finally:
+        engine.dispose()
@@ -0,0 +1,43 @@
+"""Сужение диапазонов до сетки листа и отбрасывание пустых строк."""
+import pandas as pd
+import pytest
+
+from src.core.fetch_planner import SheetGrid, clamp_range, drop_blank_rows
+
+GRID = SheetGrid(sheet_id=0, title='Продажи 2025', row_count=500, column_count=12)
+
+
+@pytest.mark.parametrize('range_str, expected', [
+    (None, "'Продажи 2025'!A1:L500"),
+    ('A1:R', "'Продажи 2025'!A1:L500"),
+    ('B4:W', "'Продажи 2025'!B4:L500"),
+    ('A1:C10', "'Продажи 2025'!A1:C10"),
+    ('A1:C900', "'Продажи 2025'!A1:C500"),
+])
+def test_clamp_range_to_grid(range_str, expected):
+    assert clamp_range(GRID, range_str) == expected
+
+
+@pytest.mark.parametrize('range_str', ['A600:B', 'M1:Z'])
+def test_range_outside_grid_reads_nothing(range_str):
+    assert clamp_range(GRID, range_str) is None
+
+
+def test_named_range_is_passed_through():
+    assert clamp_range(GRID, 'Итоги') == "'Продажи 2025'!Итоги"
+
+
+def test_drop_blank_rows_ignores_row_ids():
+    df = pd.DataFrame({
+        'data': ['01.01', '', None, '02.01', '   '],
+        'summa': ['1', None, '', None, ''],
+        'source_row_id': [2, 3, 4, 5, 6],
+    })
+    result = drop_blank_rows(df)
+    assert result['source_row_id'].tolist() == [2, 5]
+    assert result.index.tolist() == [0, 1]
+
+
+def test_drop_blank_rows_keeps_frame_without_blanks():
+    df = pd.DataFrame({'data': ['01.01'], 'source_row_id': [2]})
+    assert drop_blank_rows(df) is df
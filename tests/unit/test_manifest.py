@@ -0,0 +1,74 @@
+"""Валидация и компиляция манифеста источников (sources.json)."""
+import pytest
+
+from src.core.manifest import ManifestError, compile_manifest
+
+VALID_SOURCE = {
+    'spreadsheet_id': 'abc',
+    'sheet_identifiers': ['0'],
+    'ranges': {'0': 'A1:K'},
+    'target_table': 'sales_cur',
+    'pipeline': 'current',
+}
+
+
+def compile_errors(sources, column_mappings=None):
+    with pytest.raises(ManifestError) as error:
+        compile_manifest(sources, column_mappings or {})
+    return str(error.value)
+
+
+def test_valid_source_compiles():
+    manifest = compile_manifest({'_comment': 'пропускается', 'sales': VALID_SOURCE}, {})
+    spec = manifest.get('sales')
+    assert manifest.source_mapping('current') == {'sales': 'sales_cur'}
+    assert spec.mode == 'full'
+    assert spec.ranges == (('0', 'A1:K'),)
+
+
+def test_column_mappings_are_merged_with_source_mapping():
+    source = dict(VALID_SOURCE, column_mapping={'summa': 'amount'})
+    manifest = compile_manifest({'sales': source}, {'sales_cur': {'data': 'sale_date', 'summa': 'total'}})
+    # Маппинг источника важнее общего config/column_mappings.json
+    assert manifest.column_mappings('current') == {'sales_cur': {'data': 'sale_date', 'summa': 'amount'}}
+
+
+def test_all_errors_of_source_are_reported_together():
+    message = compile_errors({'bad': {
+        'spreadsheet_id': '',
+        'sheet_identifiers': ['0'],
+        'ranges': {'0': 'a1:k', '5': 'A1:B'},
+        'mode': 'sometimes',
+        'pipeline': 'current',
+        'target_table': 'Sales-Cur',
+        'cleaning': {'colour_columns': []},
+        'interval_minutes': 0,
+    }})
+    for fragment in (
+        'bad: spreadsheet_id',
+        "некорректный A1-диапазон 'a1:k'",
+        'диапазон для неизвестного листа 5',
+        'bad: mode',
+        "некорректное имя таблицы 'Sales-Cur'",
+        'неизвестные ключи cleaning: colour_columns',
+        'bad: interval_minutes',
+    ):
+        assert fragment in message
+
+
+def test_pipeline_requires_target_table():
+    source = {k: v for k, v in VALID_SOURCE.items() if k != 'target_table'}
+    assert 'для источника с pipeline нужен target_table' in compile_errors({'sales': source})
+
+
+def test_duplicate_target_table_in_pipeline():
+    message = compile_errors({'sales': VALID_SOURCE, 'sales_copy': VALID_SOURCE})
+    assert 'sales_copy: таблица sales_cur уже загружается из sales' in message
+
+
+def test_same_table_in_different_pipelines_is_allowed():
+    manifest = compile_manifest({
+        'sales': VALID_SOURCE,
+        'sales_hst': dict(VALID_SOURCE, pipeline='historical'),
+    }, {})
+    assert len(manifest.sources) == 2
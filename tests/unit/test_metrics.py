@@ -0,0 +1,53 @@
+"""Реестр метрик: формат Prometheus и прирост за запуск."""
+from src.core.metrics import MetricsRegistry
+
+
+def test_render_prometheus_text_format():
+    registry = MetricsRegistry(buckets=(0.5, 1.0))
+    registry.inc('etl_rows_fetched_total', 10, source='sales')
+    registry.inc('etl_rows_fetched_total', 5, source='sales')
+    registry.observe('etl_stage_duration_seconds', 0.3, stage='fetch', source='sales')
+    registry.observe('etl_stage_duration_seconds', 2.0, stage='fetch', source='sales')
+    registry.set('etl_last_success_timestamp_seconds', 100, table='sales "cur"')
+
+    lines = registry.render().splitlines()
+    assert '# TYPE etl_rows_fetched_total counter' in lines
+    assert 'etl_rows_fetched_total{source="sales"} 15' in lines
+    assert '# TYPE etl_stage_duration_seconds histogram' in lines
+    assert 'etl_stage_duration_seconds_bucket{source="sales",stage="fetch",le="0.5"} 1' in lines
+    assert 'etl_stage_duration_seconds_bucket{source="sales",stage="fetch",le="1"} 1' in lines
+    assert 'etl_stage_duration_seconds_bucket{source="sales",stage="fetch",le="+Inf"} 2' in lines
+    assert 'etl_stage_duration_seconds_sum{source="sales",stage="fetch"} 2.3' in lines
+    assert 'etl_stage_duration_seconds_count{source="sales",stage="fetch"} 2' in lines
+    assert 'etl_last_success_timestamp_seconds{table="sales \\"cur\\""} 100' in lines
+    assert any(line.startswith('etl_table_freshness_seconds{table=') for line in lines)
+    # Метрики без отсчетов не выводятся
+    assert not any('etl_rows_spooled_total' in line for line in lines)
+
+
+def test_collectors_are_rendered():
+    registry = MetricsRegistry()
+    registry.collector(lambda: [('etl_sheets_requests_total', (), 7)])
+    assert 'etl_sheets_requests_total 7' in registry.render().splitlines()
+
+
+def test_run_samples_are_increments_since_snapshot():
+    registry = MetricsRegistry(buckets=(1.0,))
+    registry.inc('etl_rows_inserted_total', 100, source='sales')
+    registry.inc('etl_rows_inserted_total', 3, source='clients')
+    registry.observe('etl_stage_duration_seconds', 0.5, stage='load', source='sales')
+    registry.set('etl_last_success_timestamp_seconds', 100, table='sales_cur')
+    registry.set('etl_last_success_timestamp_seconds', 100, table='clients_cur')
+    since = registry.snapshot()
+
+    registry.inc('etl_rows_inserted_total', 20, source='sales')
+    registry.observe('etl_stage_duration_seconds', 1.5, stage='load', source='sales')
+    registry.set('etl_last_success_timestamp_seconds', 200, table='sales_cur')
+
+    samples = {(name, labels): value for name, labels, value in registry.run_samples(since)}
+    assert samples == {
+        ('etl_rows_inserted_total', (('source', 'sales'),)): 20,
+        ('etl_stage_duration_seconds_sum', (('source', 'sales'), ('stage', 'load'))): 1.5,
+        ('etl_stage_duration_seconds_count', (('source', 'sales'), ('stage', 'load'))): 1,
+        ('etl_last_success_timestamp_seconds', (('table', 'sales_cur'),)): 200,
+    }
@@ -0,0 +1,33 @@
+"""Типы Arrow колонок core при выгрузке в Parquet."""
+from decimal import Decimal
+
+import pyarrow as pa
+import pytest
+
+from src.etl.parquet_export import arrow_type, arrow_values, month_bounds
+
+
+@pytest.mark.parametrize('precision, scale, expected', [
+    (10, 2, pa.decimal128(10, 2)),
+    (12, None, pa.decimal128(12, 0)),
+    (50, 5, pa.decimal256(50, 5)),
+    (None, None, pa.decimal128(38, 10)),
+])
+def test_numeric_maps_to_decimal(precision, scale, expected):
+    assert arrow_type('numeric', precision, scale) == expected
+
+
+def test_numeric_values_convert_without_loss_errors():
+    column_type = arrow_type('numeric', None, None)
+    values = [Decimal('1.5'), None, Decimal('NaN'), Decimal('0.123456789012')]
+    array = pa.array(arrow_values(values, column_type), type=column_type)
+    assert array.to_pylist() == [Decimal('1.5000000000'), None, None, Decimal('0.1234567890')]
+
+
+def test_non_decimal_values_pass_through():
+    values = [1, 2, None]
+    assert arrow_values(values, pa.int32()) is values
+
+
+def test_month_bounds_wrap_year():
+    assert [d.isoformat() for d in month_bounds('2025-12')] == ['2025-12-01', '2026-01-01']
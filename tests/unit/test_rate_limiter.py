@@ -0,0 +1,67 @@
+"""Token bucket ограничителя запросов к Sheets (время подменяется)."""
+import pytest
+
+from src.core import rate_limiter
+from src.core.rate_limiter import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(rate_limiter.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_burst_is_served_without_waiting(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert clock.sleeps == []
+
+
+def test_empty_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=1)
+    bucket.acquire()
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_refill_is_capped_by_burst(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 3600
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_throttling_halves_rate_down_to_floor(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=5, min_rate_fraction=0.2)
+    bucket.on_throttled()
+    assert bucket.rate == pytest.approx(0.5)
+    assert bucket.tokens == 0.0
+    for _ in range(10):
+        bucket.on_throttled()
+    assert bucket.rate == pytest.approx(bucket.min_rate)
+
+
+def test_success_restores_rate_gradually(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=5)
+    bucket.on_throttled()
+    bucket.on_success()
+    assert bucket.rate == pytest.approx(0.55)
+    for _ in range(100):
+        bucket.on_success()
+    assert bucket.rate == pytest.approx(bucket.max_rate)
@@ -0,0 +1,94 @@
+"""Инкрементальная статистика справочников: SQL пачки и продвижение водяного знака."""
+from contextlib import contextmanager
+
+from src.etl.reference_stats import ReferenceStats
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+    def scalars(self):
+        return FakeResult([(row[0],) for row in self.rows])
+
+    def all(self):
+        return [row[0] for row in self.rows]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeStaging:
+    """staging.<table> из id строк и водяные знаки в памяти; SQL только записывается."""
+
+    def __init__(self, columns, ids):
+        self.columns = columns
+        self.ids = ids
+        self.watermarks = {}
+        self.delta_calls = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        params = params or {}
+        if 'information_schema.columns' in sql:
+            return FakeResult([(c,) for c in self.columns])
+        if 'SELECT last_id FROM etl.reference_watermarks' in sql:
+            return FakeResult([(self.watermarks.get(params['table']),)])
+        if 'SELECT MAX(id), COUNT(*)' in sql:
+            batch = [i for i in self.ids if i > params['last_id']][:params['limit']]
+            return FakeResult([(max(batch) if batch else None, len(batch))])
+        if 'INSERT INTO etl.reference_counts' in sql:
+            self.delta_calls.append((sql, params))
+            return FakeResult([])
+        if 'INSERT INTO etl.reference_watermarks' in sql:
+            self.watermarks[params['table']] = params['last_id']
+        return FakeResult([])
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    begin = connect
+
+
+def run_stats(staging, batch_size=2):
+    stats = ReferenceStats(
+        staging,
+        stats_columns={'sales_cur': {'trener': 'trainers', 'produkt': 'products'}},
+        batch_size=batch_size,
+    )
+    return stats.run()
+
+
+def test_delta_sql_covers_only_existing_columns():
+    staging = FakeStaging(['id', 'source_row_id', 'trener'], [1, 2, 3])
+    run_stats(staging)
+
+    sql, params = staging.delta_calls[0]
+    assert "('trainers', CAST(l.trener AS text))" in sql
+    assert 'produkt' not in sql
+    assert 'DISTINCT ON (source_row_id) source_row_id, trener' in sql
+    assert params == {'table': 'sales_cur', 'last_id': 0, 'upper_id': 2}
+
+
+def test_batches_advance_watermark_until_caught_up():
+    staging = FakeStaging(['id', 'source_row_id', 'trener', 'produkt'], [1, 2, 3, 5, 8])
+    result = run_stats(staging)
+
+    assert [(p['last_id'], p['upper_id']) for _, p in staging.delta_calls] == [(0, 2), (2, 5), (5, 8)]
+    assert (result.batches, result.rows_processed) == (3, 5)
+    assert staging.watermarks == {'sales_cur': 8}
+
+    # Повторный запуск без новых строк ничего не пересчитывает
+    staging.delta_calls.clear()
+    assert run_stats(staging).rows_processed == 0
+    assert staging.delta_calls == []
+
+
+def test_missing_table_is_skipped():
+    staging = FakeStaging([], [1, 2])
+    assert run_stats(staging).batches == 0
+    assert staging.delta_calls == []
@@ -0,0 +1,40 @@
+"""Очистка блоками строк в пуле процессов совпадает с однопроцессной."""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bench_row_shards import make_trainings
+from src.etl.parallel_loader import prepare_frame
+from src.etl.row_shards import prepare_frame_sharded, shard_bounds, shard_count
+
+
+@pytest.fixture(scope='module')
+def cpu_pool():
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+def test_shard_bounds_cover_all_rows():
+    assert shard_bounds(10, 3) == [(0, 4), (4, 7), (7, 10)]
+    assert shard_bounds(2, 4) == [(0, 1), (1, 2), (2, 2), (2, 2)]
+
+
+def test_small_table_is_not_sharded():
+    assert shard_count(100, cpu_workers=8) == 1
+
+
+@pytest.mark.parametrize('shards', [1, 3])
+def test_sharded_result_equals_single_process(cpu_pool, shards):
+    df = make_trainings(3000, np.random.default_rng(7))
+    expected = prepare_frame(df.copy(), 'trainings_hst')
+    result = prepare_frame_sharded(df.copy(), 'trainings_hst', None, cpu_pool, shards)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_mixed_types_fall_back_to_single_process(cpu_pool):
+    df = pd.DataFrame({'source_row_id': [2, 3], 'data': ['01.01.2025', '02.01.2025'], 'summa': [1, 'много']})
+    expected = prepare_frame(df.copy(), 'sales_cur')
+    result = prepare_frame_sharded(df.copy(), 'sales_cur', None, cpu_pool, 2)
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,198 @@
+"""Локальный спул загрузок: порядок батчей, карантин при replay и общий спул процессов."""
+import multiprocessing
+import socket
+
+import pandas as pd
+import pytest
+from sqlalchemy.exc import DataError, DisconnectionError, InterfaceError, OperationalError
+
+from src.etl.spool import LoadSpool, is_connectivity_error, replay_spool
+
+
+def frame(rows):
+    return pd.DataFrame({'row_hash': [f"h{i}" for i in range(rows)], 'summa': range(rows)})
+
+
+class FakeLoader:
+    """write_staging по сценарию: таблица -> исключение, иначе запоминает порядок."""
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.loaded = []
+
+    def write_staging(self, df, target_table, source_name):
+        if target_table in self.failures:
+            raise self.failures[target_table]
+        self.loaded.append((target_table, len(df)))
+        return len(df)
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return LoadSpool(tmp_path / 'spool')
+
+
+def test_entries_keep_write_order(spool):
+    spool.put(frame(1), 'sales_cur', 'sales', 'down')
+    spool.put(frame(2), 'trainings_cur', 'trainings', 'down')
+    spool.put(frame(3), 'sales_cur', 'sales', 'down')
+
+    entries = spool.pending()
+    assert [(e.seq, e.target_table, e.rows) for e in entries] == [
+        (1, 'sales_cur', 1), (2, 'trainings_cur', 2), (3, 'sales_cur', 3),
+    ]
+    assert spool.has_pending('trainings_cur')
+    assert spool.read(entries[1])['summa'].tolist() == [0, 1]
+
+
+def test_remove_deletes_file_and_entry(spool):
+    first = spool.put(frame(1), 'sales_cur', 'sales', 'down')
+    second = spool.put(frame(1), 'trainings_cur', 'trainings', 'down')
+    spool.remove(first)
+    assert not (spool.directory / first.file).exists()
+    assert spool.pending() == [second]
+
+
+def test_replay_loads_in_order_and_empties_spool(spool):
+    spool.put(frame(1), 'sales_cur', 'sales', 'down')
+    spool.put(frame(2), 'trainings_cur', 'trainings', 'down')
+    loader = FakeLoader()
+
+    assert replay_spool(loader, spool) == 3
+    assert loader.loaded == [('sales_cur', 1), ('trainings_cur', 2)]
+    assert spool.pending() == []
+
+
+def test_replay_quarantines_bad_batch_and_continues(spool):
+    bad = spool.put(frame(1), 'sales_cur', 'sales', 'down')
+    spool.put(frame(2), 'trainings_cur', 'trainings', 'down')
+    loader = FakeLoader({'sales_cur': ValueError('invalid input syntax for type date')})
+
+    assert replay_spool(loader, spool) == 2
+    assert loader.loaded == [('trainings_cur', 2)]
+    assert spool.pending() == []
+    assert (spool.quarantine_dir / bad.file).exists()
+    assert 'ValueError' in (spool.quarantine_dir / 'manifest.json').read_text(encoding='utf-8')
+
+
+def test_replay_stops_on_connection_loss(spool):
+    spool.put(frame(1), 'sales_cur', 'sales', 'down')
+    spool.put(frame(2), 'trainings_cur', 'trainings', 'down')
+    lost = OperationalError('INSERT', {}, Exception('server closed the connection unexpectedly'))
+    loader = FakeLoader({'sales_cur': lost})
+
+    with pytest.raises(OperationalError):
+        replay_spool(loader, spool)
+    # Более поздние батчи не обгоняют ранние
+    assert loader.loaded == []
+    assert [e.target_table for e in spool.pending()] == ['sales_cur', 'trainings_cur']
+
+
+class PgError(Exception):
+    """Ошибка psycopg2 с кодом ответа сервера."""
+
+    def __init__(self, message, pgcode=None):
+        super().__init__(message)
+        self.pgcode = pgcode
+
+
+def db_error(cls, message, pgcode=None, invalidated=False):
+    return cls('INSERT', {}, PgError(message, pgcode), connection_invalidated=invalidated)
+
+
+@pytest.mark.parametrize('error', [
+    db_error(OperationalError, 'could not connect to server: Connection refused'),
+    db_error(OperationalError, 'server closed the connection unexpectedly', invalidated=True),
+    db_error(OperationalError, 'terminating connection due to administrator command', '57P01'),
+    db_error(OperationalError, 'connection failure', '08006'),
+    db_error(InterfaceError, 'connection already closed'),
+    DisconnectionError('connection invalidated'),
+    ConnectionRefusedError(111, 'Connect call failed'),
+    TimeoutError(),
+    socket.gaierror(-2, 'Name or service not known'),
+])
+def test_connection_errors_are_spooled(error):
+    assert is_connectivity_error(error)
+
+
+@pytest.mark.parametrize('error', [
+    db_error(OperationalError, 'deadlock detected', '40P01'),
+    db_error(OperationalError, 'canceling statement due to statement timeout', '57014'),
+    db_error(OperationalError, 'could not extend file: No space left on device', '53100'),
+    db_error(DataError, 'invalid input syntax for type date', '22007'),
+    OSError(28, 'No space left on device'),
+    ValueError('invalid literal'),
+])
+def test_server_and_data_errors_are_not_spooled(error):
+    assert not is_connectivity_error(error)
+
+
+def test_replay_keeps_batch_on_deadlock(spool):
+    spool.put(frame(1), 'sales_cur', 'sales', 'down')
+    loader = FakeLoader({'sales_cur': db_error(OperationalError, 'deadlock detected', '40P01')})
+
+    with pytest.raises(OperationalError):
+        replay_spool(loader, spool)
+    assert [e.target_table for e in spool.pending()] == ['sales_cur']
+    assert not spool.quarantine_dir.exists()
+
+
+BATCHES_PER_PROCESS = 15
+
+
+def put_batches(directory, table):
+    spool = LoadSpool(directory)
+    for _ in range(BATCHES_PER_PROCESS):
+        spool.put(frame(2), table, table, 'down')
+
+
+class FileLoader:
+    """Пишет загруженные батчи в общий файл (видно повторные загрузки из разных процессов)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def write_staging(self, df, target_table, source_name):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(f"{target_table}:{df['row_hash'].iloc[0]}\n")
+        return len(df)
+
+
+def replay_batches(directory, log_path):
+    replay_spool(FileLoader(log_path), LoadSpool(directory))
+
+
+def run_processes(target, args_list):
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=target, args=args) for args in args_list]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+
+def test_processes_share_spool_without_losing_batches(tmp_path):
+    directory = tmp_path / 'spool'
+    run_processes(put_batches, [(directory, 'sales_cur'), (directory, 'trainings_cur')])
+
+    entries = LoadSpool(directory).pending()
+    assert len(entries) == 2 * BATCHES_PER_PROCESS
+    assert len({e.seq for e in entries}) == len(entries)
+    assert all((directory / e.file).exists() for e in entries)
+    for table in ('sales_cur', 'trainings_cur'):
+        assert sum(e.target_table == table for e in entries) == BATCHES_PER_PROCESS
+
+
+def test_concurrent_replays_load_each_batch_once(tmp_path):
+    directory = tmp_path / 'spool'
+    spool = LoadSpool(directory)
+    for i in range(BATCHES_PER_PROCESS):
+        spool.put(pd.DataFrame({'row_hash': [f"b{i}"]}), 'sales_cur', 'sales', 'down')
+    log_path = tmp_path / 'loaded.log'
+
+    run_processes(replay_batches, [(directory, log_path), (directory, log_path)])
+
+    loaded = log_path.read_text(encoding='utf-8').splitlines()
+    assert loaded == [f"sales_cur:b{i}" for i in range(BATCHES_PER_PROCESS)]
+    assert spool.pending() == []
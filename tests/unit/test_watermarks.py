@@ -0,0 +1,156 @@
+"""Водяные знаки append-only листов и нумерация source_row_id."""
+import pytest
+
+from src.core.sheets_processor import SheetsProcessor
+from src.core.watermarks import build_watermark, hash_rows
+
+HEADER = ['Дата', 'Сумма']
+
+
+class FakeWatermarkStore:
+    def __init__(self):
+        self.watermarks = {}
+
+    def get(self, spreadsheet_id, sheet_id):
+        return self.watermarks.get((spreadsheet_id, sheet_id))
+
+    def save(self, watermark):
+        self.watermarks[(watermark.spreadsheet_id, watermark.sheet_id)] = watermark
+
+
+class FakePlanner:
+    """Листы в памяти; read_ranges отдает заголовок и строки начиная с номера строки диапазона."""
+
+    def __init__(self, sheets):
+        self.sheets = sheets
+        self.full_reads = 0
+        self.failing = set()
+
+    def _sheet(self, sheet_id):
+        if sheet_id in self.failing:
+            raise ConnectionError('Sheets API недоступен')
+        return self.sheets[sheet_id]
+
+    def read(self, spreadsheet_id, sheet_id, range_name, use_gid):
+        self.full_reads += 1
+        return [list(row) for row in self._sheet(sheet_id)]
+
+    def read_ranges(self, spreadsheet_id, sheet_id, ranges, use_gid):
+        data = self._sheet(sheet_id)
+        first_row = int(''.join(c for c in ranges[1].split(':')[0] if c.isdigit()))
+        return [[list(data[0])], [list(row) for row in data[first_row - 1:]]]
+
+
+@pytest.fixture
+def sheets():
+    return {
+        '1': [HEADER, ['01.01', '1'], ['02.01', '2']],
+        '2': [HEADER, ['03.01', '3']],
+    }
+
+
+@pytest.fixture
+def processor(sheets):
+    processor = SheetsProcessor({}, FakeWatermarkStore())
+    processor._planner = FakePlanner(sheets)
+    return processor
+
+
+SOURCE = {
+    'spreadsheet_id': 'S',
+    'sheet_identifiers': ['1', '2'],
+    'ranges': {'1': 'A1:B', '2': 'A1:B'},
+    'mode': 'append_only',
+    'tail_rows': 2,
+}
+
+
+def records(df):
+    return [(row['data'], row['source_row_id']) for row in df.to_dict('records')]
+
+
+def full_read(processor):
+    return processor.read_and_transform(dict(SOURCE, mode='full'), 'sales_hst')
+
+
+def test_hash_rows_is_deterministic_and_order_sensitive():
+    rows = [['01.01', '1'], ['02.01', '2']]
+    assert hash_rows(rows) == hash_rows([list(r) for r in rows])
+    assert hash_rows(rows) != hash_rows(rows[::-1])
+
+
+def test_build_watermark_hashes_only_tail():
+    rows = [['a'], ['b'], ['c']]
+    watermark = build_watermark('S', 1, rows, tail_rows=2, rows_before=10)
+    assert watermark.sheet_id == '1'
+    assert watermark.rows_processed == 13
+    assert watermark.tail_size == 2
+    assert watermark.tail_hash == hash_rows([['b'], ['c']])
+
+
+def test_first_append_only_read_matches_full_read(processor):
+    assert records(processor.read_and_transform(SOURCE, 'sales_hst')) == records(full_read(processor))
+
+
+def test_no_new_rows_returns_empty_frame(processor):
+    processor.read_and_transform(SOURCE, 'sales_hst')
+    processor.commit_watermarks('sales_hst')
+
+    df = processor.read_and_transform(SOURCE, 'sales_hst')
+    assert df is not None and df.empty
+    assert 'source_row_id' in df.columns
+
+
+def test_incremental_rows_keep_full_read_numbering(processor, sheets):
+    processor.read_and_transform(SOURCE, 'sales_hst')
+    processor.commit_watermarks('sales_hst')
+    sheets['1'].append(['05.01', '5'])
+    sheets['2'].append(['04.01', '4'])
+    reads_before = processor.planner.full_reads
+
+    incremental = records(processor.read_and_transform(SOURCE, 'sales_hst'))
+    assert processor.planner.full_reads == reads_before
+    assert incremental == [('05.01', 4), ('04.01', 6)]
+    assert set(incremental) <= set(records(full_read(processor)))
+
+
+def test_edited_tail_falls_back_to_full_read(processor, sheets):
+    processor.read_and_transform(SOURCE, 'sales_hst')
+    processor.commit_watermarks('sales_hst')
+    sheets['1'][2] = ['02.01', '200']
+    reads_before = processor.planner.full_reads
+
+    df = processor.read_and_transform(SOURCE, 'sales_hst')
+    assert processor.planner.full_reads == reads_before + 1
+    assert records(df) == [('01.01', 2), ('02.01', 3)]
+
+
+THREE_SHEETS = dict(SOURCE, sheet_identifiers=['1', '2', '3'], ranges={})
+
+
+@pytest.mark.parametrize('mode', ['append_only', 'full'])
+def test_failed_middle_sheet_fails_whole_source(processor, sheets, mode):
+    sheets['3'] = [HEADER, ['06.01', '6']]
+    processor.planner.failing.add('2')
+
+    assert processor.read_and_transform(dict(THREE_SHEETS, mode=mode), 'sales_hst') is None
+    processor.commit_watermarks('sales_hst')
+    assert processor.watermark_store.watermarks == {}
+
+
+def test_sheet_recovers_with_stable_numbering(processor, sheets):
+    sheets['3'] = [HEADER, ['06.01', '6']]
+    processor.planner.failing.add('2')
+    processor.read_and_transform(THREE_SHEETS, 'sales_hst')
+    processor.planner.failing.clear()
+
+    df = processor.read_and_transform(THREE_SHEETS, 'sales_hst')
+    assert records(df) == records(processor.read_and_transform(dict(THREE_SHEETS, mode='full'), 'sales_hst'))
+    assert records(df)[-1] == ('06.01', 5)
+
+
+@pytest.mark.parametrize('mode', ['append_only', 'full'])
+def test_empty_sheet_is_not_a_failure(processor, sheets, mode):
+    sheets['2'] = []
+    df = processor.read_and_transform(dict(SOURCE, mode=mode), 'sales_hst')
+    assert records(df) == [('01.01', 2), ('02.01', 3)]